@@ -0,0 +1 @@
+"""Benchmarks del motor de búsqueda RAG (no requieren Firestore ni Vertex AI)."""
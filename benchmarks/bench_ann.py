@@ -0,0 +1,112 @@
+"""Recall@k vs. latencia del índice IVF frente al scorer exacto.
+
+Uso:
+    python -m benchmarks.bench_ann --chunks 200000 --dim 768 --nprobe 1 2 4 8 16 32
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from my_agent_utem.tools.rag_ann import IVFIndex
+from my_agent_utem.tools.rag_index import ChunkIndex, normalize_rows
+
+
+def synthetic_matrix(n_rows: int, dim: int, n_topics: int, seed: int = 0) -> np.ndarray:
+    """Vectores agrupados en ``n_topics`` temas, parecido a chunks de informes similares."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim), dtype=np.float32)
+    labels = rng.integers(0, n_topics, size=n_rows)
+    noise = rng.standard_normal((n_rows, dim), dtype=np.float32) * 0.8
+    return normalize_rows(topics[labels] + noise)
+
+
+def synthetic_queries(matrix: np.ndarray, n_queries: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    base = matrix[rng.integers(0, matrix.shape[0], size=n_queries)]
+    noise = rng.standard_normal(base.shape, dtype=np.float32) * 0.05
+    return normalize_rows(base + noise)
+
+
+def _timed_search(index: ChunkIndex, queries: np.ndarray, k: int, nprobe: int = None):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        rows, _, _ = index.search(q, k, -1.0, nprobe=nprobe)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(rows)
+    return results, np.asarray(latencies)
+
+
+def run(chunks: int, dim: int, topics: int, queries: int, k: int,
+        n_lists: int, nprobes: List[int]) -> Dict[str, Any]:
+    matrix = synthetic_matrix(chunks, dim, topics)
+    query_matrix = synthetic_queries(matrix, queries)
+    ids = np.arange(chunks).astype(str).astype(object)
+    index = ChunkIndex(matrix, ids, ids, np.zeros(chunks, dtype=np.int32), [""] * chunks)
+
+    exact, exact_lat = _timed_search(index, query_matrix, k)
+
+    start = time.perf_counter()
+    index.ann = IVFIndex.build(matrix, n_lists=n_lists)
+    build_s = time.perf_counter() - start
+
+    rows = []
+    for nprobe in nprobes:
+        approx, lat = _timed_search(index, query_matrix, k, nprobe=nprobe)
+        recall = np.mean([
+            len(set(a.tolist()) & set(e.tolist())) / max(len(e), 1)
+            for a, e in zip(approx, exact)
+        ])
+        rows.append({
+            "nprobe": nprobe,
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(lat, 50)), 3),
+            "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        })
+
+    return {
+        "chunks": chunks,
+        "dim": dim,
+        "k": k,
+        "n_lists": index.ann.n_lists,
+        "ivf_build_s": round(build_s, 2),
+        "exact": {
+            "p50_ms": round(float(np.percentile(exact_lat, 50)), 3),
+            "p95_ms": round(float(np.percentile(exact_lat, 95)), 3),
+        },
+        "ivf": rows,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=35)
+    parser.add_argument("--n-lists", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--json", help="Ruta donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    result = run(args.chunks, args.dim, args.topics, args.queries, args.k, args.n_lists, args.nprobe)
+
+    print(f"Exacto: p50={result['exact']['p50_ms']} ms  p95={result['exact']['p95_ms']} ms")
+    print(f"IVF: {result['n_lists']} listas (build {result['ivf_build_s']} s)")
+    for row in result["ivf"]:
+        print(
+            f"  nprobe={row['nprobe']:>4}  recall@{args.k}={row[f'recall@{args.k}']:.3f}  "
+            f"p50={row['p50_ms']} ms  p95={row['p95_ms']} ms"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Throughput de search_documents (síncrono) frente a search_documents_async bajo concurrencia.
+
+Simula la latencia de red del embedding y de Firestore con clientes falsos en
+memoria, de modo que no se necesitan credenciales de GCP. La herramienta
+síncrona bloquea el event loop (como ocurre con un FunctionTool síncrono en
+ADK); la asíncrona solapa la espera de red entre solicitudes concurrentes.
+
+Uso:
+    python -m benchmarks.bench_async --chunks 20000 --concurrency 1 8 32 --embed-ms 80
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.bench_ann import synthetic_matrix
+from my_agent_utem.tools import query_rag
+from my_agent_utem.tools.rag_index import ChunkIndex
+from my_agent_utem.tools.rag_refresh import CacheSnapshot
+
+
+class _Embedding:
+    def __init__(self, values):
+        self.values = values
+
+
+class FakeEmbeddingModel:
+    """Devuelve vectores aleatorios tras ``latency`` segundos (bloqueante o no)."""
+
+    def __init__(self, dim: int, latency: float, seed: int = 0):
+        self.dim = dim
+        self.latency = latency
+        self._rng = np.random.default_rng(seed)
+
+    def _vectors(self, n: int) -> List[_Embedding]:
+        return [_Embedding(self._rng.standard_normal(self.dim).tolist()) for _ in range(n)]
+
+    def get_embeddings(self, texts):
+        time.sleep(self.latency)
+        return self._vectors(len(texts))
+
+    async def get_embeddings_async(self, texts):
+        await asyncio.sleep(self.latency)
+        return self._vectors(len(texts))
+
+
+def install_fakes(chunks: int, dim: int, docs: int, embed_latency: float) -> None:
+    """Carga un índice sintético y un modelo falso en los globals de query_rag."""
+    matrix = synthetic_matrix(chunks, dim, max(docs, 1))
+    doc_ids = np.asarray([f"doc{i % docs}" for i in range(chunks)], dtype=object)
+    chunk_ids = np.arange(chunks).astype(str).astype(object)
+    texts = [f"fragmento {i} del documento {i % docs}" for i in range(chunks)]
+    index = ChunkIndex(matrix, doc_ids, chunk_ids, np.arange(chunks, dtype=np.int32), texts)
+    index.build_lexical()
+
+    now = time.time()
+    query_rag._initialized = True
+    query_rag._embedding_model = FakeEmbeddingModel(dim, embed_latency)
+    query_rag._embedding_model_name = "fake"
+    query_rag._embedding_cache.clear()
+    query_rag._snapshot = CacheSnapshot(
+        {f"doc{i}": {"doc_name": f"Documento {i}", "_firestore_id": f"doc{i}"} for i in range(docs)},
+        index,
+        now,
+    )
+    query_rag.SYNC_MODE = "ttl"
+    query_rag.ACCESS_METRICS_MODE = "off"
+
+
+async def _run_sync(queries: List[str]) -> None:
+    async def call(query: str) -> None:
+        query_rag.search_documents(query)
+    await asyncio.gather(*(call(q) for q in queries))
+
+
+async def _run_async(queries: List[str]) -> None:
+    await asyncio.gather(*(query_rag.search_documents_async(q) for q in queries))
+
+
+def run(chunks: int, dim: int, docs: int, embed_ms: float,
+        concurrency: List[int], rounds: int) -> Dict[str, Any]:
+    install_fakes(chunks, dim, docs, embed_ms / 1000)
+    rows: List[Dict[str, Any]] = []
+    counter = 0
+    for level in concurrency:
+        row: Dict[str, Any] = {"concurrency": level}
+        for label, runner in (("sync", _run_sync), ("async", _run_async)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                # Consultas únicas para que la cache de embeddings no oculte la latencia
+                queries = [f"consulta {counter + i}" for i in range(level)]
+                counter += level
+                asyncio.run(runner(queries))
+            elapsed = time.perf_counter() - start
+            row[f"{label}_qps"] = round(level * rounds / elapsed, 1)
+        row["speedup"] = round(row["async_qps"] / row["sync_qps"], 2)
+        rows.append(row)
+    return {"chunks": chunks, "dim": dim, "embed_ms": embed_ms, "rounds": rounds, "results": rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--embed-ms", type=float, default=80.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", help="Ruta donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    result = run(args.chunks, args.dim, args.docs, args.embed_ms, args.concurrency, args.rounds)
+    for row in result["results"]:
+        print(
+            f"concurrencia={row['concurrency']:>4}  sync={row['sync_qps']:>8} qps  "
+            f"async={row['async_qps']:>8} qps  x{row['speedup']}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Memoria, latencia y recall@k del almacenamiento float16/int8 frente a float32.
+
+Uso:
+    python -m benchmarks.bench_quantization --chunks 200000 --dim 768 --k 35
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.bench_ann import synthetic_matrix, synthetic_queries
+from my_agent_utem.tools.rag_index import ChunkIndex, STORAGE_TYPES
+
+
+def run(chunks: int, dim: int, topics: int, queries: int, k: int,
+        threshold: float, rescore_factor: int) -> Dict[str, Any]:
+    matrix = synthetic_matrix(chunks, dim, topics)
+    query_matrix = synthetic_queries(matrix, queries)
+    ids = np.arange(chunks).astype(str).astype(object)
+    index = ChunkIndex(matrix, ids, ids, np.zeros(chunks, dtype=np.int32), [""] * chunks)
+
+    exact = [index.search(q, k, threshold)[0] for q in query_matrix]
+
+    rows: List[Dict[str, Any]] = []
+    for storage in STORAGE_TYPES:
+        index.quantize(storage, rescore_factor)
+        latencies, recalls = [], []
+        for q, expected in zip(query_matrix, exact):
+            start = time.perf_counter()
+            found, _, _ = index.search(q, k, threshold)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(set(found.tolist()) & set(expected.tolist())) / max(len(expected), 1))
+        rows.append({
+            "storage": storage,
+            "resident_mb": round(index.resident_bytes / 1e6, 1),
+            f"recall@{k}": round(float(np.mean(recalls)), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        })
+
+    return {"chunks": chunks, "dim": dim, "k": k, "threshold": threshold,
+            "rescore_factor": rescore_factor, "results": rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=35)
+    parser.add_argument("--threshold", type=float, default=-1.0)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--json", help="Ruta donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    result = run(args.chunks, args.dim, args.topics, args.queries, args.k,
+                 args.threshold, args.rescore_factor)
+    for row in result["results"]:
+        print(
+            f"{row['storage']:>8}: {row['resident_mb']:>8} MB  recall@{args.k}={row[f'recall@{args.k}']:.4f}  "
+            f"p50={row['p50_ms']} ms  p95={row['p95_ms']} ms"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
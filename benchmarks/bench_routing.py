@@ -0,0 +1,117 @@
+"""Recall@k vs. latencia de la búsqueda en dos etapas (centroides por documento) frente al scorer exacto.
+
+El corpus es ``SyntheticCorpus``: cada documento tiene un tema y cada
+consulta sale de un chunk, así que "doc_recall" mide cuántas veces el
+documento de origen queda entre los ``fanout`` elegidos. Varios documentos
+comparten tema (``--topics``), que es lo que hace difícil la primera etapa.
+
+Uso:
+    python -m benchmarks.bench_routing --chunks 200000 --docs 400 --fanout 1 2 4 8 16 32
+    python -m benchmarks.bench_routing --per-doc 1 4 --json bench-routing.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic_corpus import SyntheticCorpus
+from my_agent_utem.tools.embedding_service import HashEmbeddingBackend
+from my_agent_utem.tools.rag_index import ChunkIndex
+from my_agent_utem.tools.rag_router import DocumentRouter
+
+
+def _timed_search(index: ChunkIndex, queries: np.ndarray, k: int, fanout: int = 0):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        rows, _, _ = index.search(q, k, -1.0, fanout=fanout)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(rows)
+    return results, np.asarray(latencies)
+
+
+def run(chunks: int, docs: int, dim: int, topics: int, queries: int, k: int,
+        fanouts: List[int], per_docs: List[int]) -> Dict[str, Any]:
+    corpus = SyntheticCorpus(chunks, n_docs=docs, dim=dim, n_topics=topics)
+    index = corpus.chunk_index_direct(with_texts=False)
+    query_specs = corpus.queries(queries)
+    query_matrix = np.asarray(HashEmbeddingBackend(dim).embed([q["query"] for q in query_specs]), dtype=np.float32)
+    names = {doc["doc_name"]: doc_id for doc_id, doc in corpus.docs.items()}
+    source_docs = [names[q["document_name"]] for q in query_specs]
+
+    exact, exact_lat = _timed_search(index, query_matrix, k)
+
+    rows = []
+    build = {}
+    for per_doc in per_docs:
+        start = time.perf_counter()
+        index.router = DocumentRouter.build(index.matrix, index.doc_ids, per_doc=per_doc)
+        build[per_doc] = round(time.perf_counter() - start, 3)
+        for fanout in fanouts:
+            routed, lat = _timed_search(index, query_matrix, k, fanout=fanout)
+            recall = np.mean([
+                len(set(a.tolist()) & set(e.tolist())) / max(len(e), 1)
+                for a, e in zip(routed, exact)
+            ])
+            doc_recall = np.mean([
+                source in set(index.router.doc_names[index.router.route(q, fanout)])
+                for q, source in zip(query_matrix, source_docs)
+            ])
+            rows.append({
+                "per_doc": per_doc,
+                "fanout": fanout,
+                f"recall@{k}": round(float(recall), 4),
+                "doc_recall": round(float(doc_recall), 4),
+                "chunks_scored_pct": round(100.0 * min(fanout, corpus.n_docs) / corpus.n_docs, 2),
+                "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                "p95_ms": round(float(np.percentile(lat, 95)), 3),
+            })
+
+    return {
+        "chunks": chunks,
+        "documents": corpus.n_docs,
+        "topics": topics,
+        "dim": dim,
+        "k": k,
+        "router_build_s": build,
+        "exact": {
+            "p50_ms": round(float(np.percentile(exact_lat, 50)), 3),
+            "p95_ms": round(float(np.percentile(exact_lat, 95)), 3),
+        },
+        "routed": rows,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--docs", type=int, default=0, help="0 = un documento cada 100 chunks")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--topics", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=35)
+    parser.add_argument("--fanout", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--per-doc", type=int, nargs="+", default=[1], help="Centroides por documento")
+    parser.add_argument("--json", help="Ruta donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    result = run(args.chunks, args.docs, args.dim, args.topics, args.queries, args.k, args.fanout, args.per_doc)
+
+    print(f"{result['chunks']} chunks en {result['documents']} documentos ({result['topics']} temas)")
+    print(f"Exacto: p50={result['exact']['p50_ms']} ms  p95={result['exact']['p95_ms']} ms")
+    for row in result["routed"]:
+        print(
+            f"  per_doc={row['per_doc']}  fanout={row['fanout']:>4}  "
+            f"recall@{args.k}={row[f'recall@{args.k}']:.3f}  doc_recall={row['doc_recall']:.3f}  "
+            f"chunks={row['chunks_scored_pct']}%  p50={row['p50_ms']} ms  p95={row['p95_ms']} ms"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Suite offline de search_documents: latencia p50/p95/p99, QPS bajo concurrencia y RSS máximo.
+
+Cada caso (tamaño de corpus × configuración de búsqueda) corre en un proceso
+propio, con la configuración aplicada por variables de entorno antes de
+importar query_rag, para que el RSS máximo sea el de ese caso. El corpus es
+sintético (``SyntheticCorpus``) y se sirve desde el Firestore en memoria
+(``FakeFirestore``) o desde el emulador de Firestore; las consultas se
+embeben con ``HashEmbeddingBackend``, sin credenciales de GCP.
+
+Hasta ``--firestore-warm-max`` chunks el índice se construye leyendo el
+corpus desde Firestore, como en producción; sobre ese tamaño se arranca
+desde un snapshot en disco (leer 1M de embeddings como listas de Python no
+cabe en memoria). El embedder por hashing da similitudes menores que Vertex,
+por eso el umbral por defecto es 0.15.
+
+Uso:
+    python -m benchmarks.bench_search --sizes 1000 100000 --json bench-search.json
+    python -m benchmarks.bench_search --sizes 1000000 --dim 256 --configs vector-ivf hybrid-int8
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.bench_search --firestore emulator --sizes 1000
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Configuraciones de búsqueda: variables de entorno de query_rag y argumentos de search_documents
+CONFIGS: Dict[str, Dict[str, Any]] = {
+    "hybrid": {"env": {}, "search": {"mode": "hybrid"}},
+    "vector": {"env": {}, "search": {"mode": "vector"}},
+    "lexical": {"env": {}, "search": {"mode": "lexical"}},
+    "hybrid-full": {"env": {}, "search": {"mode": "hybrid", "response_mode": "full"}},
+    "hybrid-document": {"env": {}, "search": {"mode": "hybrid"}, "document_filter": True},
+    "hybrid-int8": {"env": {"RAG_INDEX_STORAGE": "int8"}, "search": {"mode": "hybrid"}},
+    "vector-ivf": {"env": {"RAG_ANN_ENGINE": "ivf", "RAG_ANN_MIN_CHUNKS": "0"}, "search": {"mode": "vector"}},
+    "vector-routed": {"env": {"RAG_DOC_FANOUT": "8"}, "search": {"mode": "vector"}},
+    "hybrid-routed": {"env": {"RAG_DOC_FANOUT": "8"}, "search": {"mode": "hybrid"}},
+}
+
+# Sin cache de respuestas ni listener: cada consulta recorre la búsqueda completa
+BASE_ENV = {
+    "RAG_SYNC_MODE": "ttl",
+    "RAG_EMBED_BACKEND": "hash",
+    "RAG_RESULT_CACHE_MB": "0",
+    "RAG_RESPONSE_TIMINGS": "1",
+}
+
+WARMUP_QUERIES = 10
+
+
+class SlowBackend:
+    """Envuelve un backend de embeddings agregando ``latency_ms`` por request (latencia de red simulada)."""
+
+    def __init__(self, inner: Any, latency_ms: float):
+        self.inner = inner
+        self.name = inner.name
+        self.latency = latency_ms / 1000.0
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return self.inner.embed(texts)
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    if not samples_ms:
+        return {}
+    values = np.asarray(samples_ms)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak * 1024 / 1e6
+
+
+def _search_kwargs(config: Dict[str, Any], query: Dict[str, str], threshold: float) -> Dict[str, Any]:
+    kwargs = {**config["search"], "similarity_threshold": threshold}
+    if config.get("document_filter"):
+        kwargs["document_name"] = query["document_name"]
+    return kwargs
+
+
+def _make_db(case: Dict[str, Any]) -> Any:
+    if case["firestore"] == "emulator":
+        from google.cloud import firestore
+        return firestore.Client(project=case["project"])
+    from benchmarks.fake_firestore import FakeFirestore
+    return FakeFirestore(case["firestore_ms"])
+
+
+async def _throughput(query_rag, case: Dict[str, Any], config: Dict[str, Any], query_sets: List[List[Dict[str, str]]]):
+    if case["firestore"] == "emulator":
+        from google.cloud import firestore
+        query_rag.configure_clients(async_db=firestore.AsyncClient(project=case["project"]))
+
+    levels = []
+    for level, queries in zip(case["concurrency"], query_sets):
+        pending = iter(queries)
+        latencies: List[float] = []
+
+        async def worker() -> None:
+            for query in pending:
+                start = time.perf_counter()
+                await query_rag.search_documents_async(query["query"], **_search_kwargs(config, query, case["threshold"]))
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(level)))
+        elapsed = time.perf_counter() - start
+        levels.append({
+            "concurrency": level,
+            "qps": round(len(latencies) / elapsed, 1),
+            "latency_ms": percentiles(latencies),
+        })
+    return levels
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Corre un caso en el proceso actual (llamar desde un proceso nuevo: configura query_rag por entorno)."""
+    config = CONFIGS[case["config"]]
+    snapshot_dir = tempfile.mkdtemp(prefix="rag-bench-")
+    env = {**BASE_ENV, **config["env"], "RAG_HASH_EMBED_DIM": str(case["dim"])}
+    if case["warm_start"] == "snapshot" or env.get("RAG_INDEX_STORAGE", "float32") != "float32":
+        env["RAG_INDEX_SNAPSHOT_DIR"] = snapshot_dir
+    os.environ.update(env)
+
+    from benchmarks.fake_firestore import FakeFirestore, FakeAsyncFirestore
+    from benchmarks.synthetic_corpus import SyntheticCorpus
+    from my_agent_utem.tools import query_rag
+    from my_agent_utem.tools.embedding_service import HashEmbeddingBackend
+    from my_agent_utem.tools.rag_index import save_snapshot
+
+    start = time.perf_counter()
+    corpus = SyntheticCorpus(case["size"], dim=case["dim"], seed=case["seed"])
+    db = _make_db(case)
+    fake = isinstance(db, FakeFirestore)
+    corpus.populate(db, query_rag.COLLECTION_NAME, with_embeddings=case["warm_start"] == "firestore", as_arrays=fake)
+    seed_s = time.perf_counter() - start
+
+    backend = HashEmbeddingBackend(case["dim"])
+    if case["embed_ms"]:
+        backend = SlowBackend(backend, case["embed_ms"])
+    query_rag.configure_clients(db=db, async_db=FakeAsyncFirestore(db) if fake else None, embedding_backend=backend)
+
+    rss_before_index = current_rss_mb()
+    start = time.perf_counter()
+    if case["warm_start"] == "snapshot":
+        index = corpus.chunk_index_direct(with_texts=query_rag.LEXICAL_ENABLED)
+        query_rag._attach_ann(index)
+        query_rag._attach_lexical(index)
+        query_rag._release_texts(index)
+        docs = {doc_id: {**meta, "_firestore_id": doc_id} for doc_id, meta in corpus.docs.items()}
+        save_snapshot(index, snapshot_dir, docs, extra={"embedding_model": backend.name})
+        del index
+    index = query_rag.get_chunk_index()
+    index_build_s = time.perf_counter() - start
+
+    n_queries = case["queries"]
+    queries = corpus.queries(WARMUP_QUERIES + n_queries * (1 + len(case["concurrency"])), seed=case["seed"] + 1)
+    for query in queries[:WARMUP_QUERIES]:
+        query_rag.search_documents(query["query"], **_search_kwargs(config, query, case["threshold"]))
+    queries = queries[WARMUP_QUERIES:]
+
+    latencies: List[float] = []
+    results, errors = 0, 0
+    stage_ms: Dict[str, List[float]] = {}
+    for query in queries[:n_queries]:
+        start = time.perf_counter()
+        response = query_rag.search_documents(query["query"], **_search_kwargs(config, query, case["threshold"]))
+        latencies.append((time.perf_counter() - start) * 1000)
+        for stage, ms in response.get("timings_ms", {}).items():
+            stage_ms.setdefault(stage, []).append(ms)
+        if response.get("ok"):
+            results += response.get("chunks_used", len(response.get("contexts", [])))
+        else:
+            errors += 1
+
+    query_sets = [queries[n_queries * (i + 1):n_queries * (i + 2)] for i in range(len(case["concurrency"]))]
+    throughput = asyncio.run(_throughput(query_rag, case, config, query_sets))
+    query_rag.flush_access_metrics()
+
+    return {
+        "size": case["size"],
+        "config": case["config"],
+        "documents": corpus.n_docs,
+        "dim": case["dim"],
+        "warm_start": case["warm_start"],
+        "seed_s": round(seed_s, 3),
+        "index_build_s": round(index_build_s, 3),
+        "index_rows": len(index),
+        "index_resident_mb": round(index.resident_bytes / 1e6, 1),
+        "rss_before_index_mb": round(rss_before_index, 1),
+        "rss_after_index_mb": round(current_rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "latency_ms": percentiles(latencies),
+        "stage_ms_mean": {stage: round(float(np.mean(values)), 3) for stage, values in stage_ms.items()},
+        "qps_sequential": round(len(latencies) / (sum(latencies) / 1000), 1) if latencies else 0.0,
+        "avg_chunks_returned": round(results / max(len(latencies) - errors, 1), 1),
+        "errors": errors,
+        "throughput": throughput,
+        "firestore_rpcs": db.rpcs if fake else None,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        warm_start = args.warm_start
+        if warm_start == "auto":
+            warm_start = "firestore" if size <= args.firestore_warm_max else "snapshot"
+        for name in args.configs:
+            case = {
+                "size": size, "config": name, "dim": args.dim, "seed": args.seed, "queries": args.queries,
+                "concurrency": args.concurrency, "threshold": args.similarity_threshold,
+                "warm_start": warm_start, "firestore": args.firestore, "firestore_ms": args.firestore_ms,
+                "embed_ms": args.embed_ms, "project": args.project,
+            }
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                try:
+                    row = pool.submit(run_case, case).result()
+                except Exception as e:
+                    row = {"size": size, "config": name, "error": f"{type(e).__name__}: {e}"}
+            results.append(row)
+            _print_row(row)
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+
+def _print_row(row: Dict[str, Any]) -> None:
+    if "error" in row:
+        print(f"{row['size']:>8} {row['config']:<16} ERROR {row['error']}")
+        return
+    lat = row["latency_ms"]
+    qps = "  ".join(f"c{t['concurrency']}={t['qps']}" for t in row["throughput"])
+    print(
+        f"{row['size']:>8} {row['config']:<16} build={row['index_build_s']:>7.2f}s  "
+        f"p50={lat['p50']:>7.2f}  p95={lat['p95']:>7.2f}  p99={lat['p99']:>7.2f} ms  "
+        f"qps: {qps}  peak_rss={row['peak_rss_mb']:.0f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--configs", nargs="+", choices=sorted(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--similarity-threshold", type=float, default=0.15)
+    parser.add_argument("--warm-start", choices=("auto", "firestore", "snapshot"), default="auto")
+    parser.add_argument("--firestore-warm-max", type=int, default=200_000)
+    parser.add_argument("--firestore", choices=("memory", "emulator"), default="memory")
+    parser.add_argument("--firestore-ms", type=float, default=0.0, help="Latencia simulada por RPC del Firestore en memoria")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="Latencia simulada por request de embeddings")
+    parser.add_argument("--project", default="rag-bench", help="Proyecto usado con el emulador")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Ruta donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    if args.firestore == "emulator" and not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        parser.error("--firestore emulator requiere FIRESTORE_EMULATOR_HOST")
+
+    result = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""Firestore en memoria con la API que usan query_rag y el pipeline de ingesta.
+
+Cubre colecciones y subcolecciones, ``select``/``stream``, ``collection_group``,
+``get_all`` con ``field_paths``, ``batch`` y ``bulk_writer`` (con ``Increment``
+y ``SERVER_TIMESTAMP``). ``rpc_latency_ms`` simula el viaje de red de cada
+llamada. Los campos ``np.ndarray`` se guardan tal cual y se entregan como
+listas, igual que un vector leído desde Firestore, para que el corpus
+sintético no ocupe la memoria de millones de floats de Python.
+
+``FakeAsyncFirestore`` expone el mismo almacenamiento con la API de
+``firestore.AsyncClient``. No implementa ``on_snapshot``: usar ``RAG_SYNC_MODE=ttl``.
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+class NotFound(Exception):
+    """Actualización de un documento que no existe (como ``google.api_core.exceptions.NotFound``)."""
+
+
+def _read_value(value: Any) -> Any:
+    return value.tolist() if isinstance(value, np.ndarray) else value
+
+
+def _write_value(current: Any, value: Any) -> Any:
+    """Aplica los transforms de Firestore reconociéndolos por tipo, sin importar google.cloud."""
+    kind = type(value).__name__
+    if kind == "Increment":
+        return (current or 0) + value.value
+    if kind == "Sentinel":  # SERVER_TIMESTAMP
+        return datetime.now(timezone.utc)
+    return value
+
+
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict[str, Any]], fields: Optional[Iterable[str]] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        if data is not None and fields is not None:
+            data = {f: data[f] for f in fields if f in data}
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        if self._data is None:
+            return None
+        return {k: _read_value(v) for k, v in self._data.items()}
+
+    def get(self, field: str) -> Any:
+        if self._data is None or field not in self._data:
+            raise KeyError(field)
+        return _read_value(self._data[field])
+
+
+class DocumentReference:
+    def __init__(self, client: "FakeFirestore", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> "CollectionReference":
+        return CollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name: str) -> "CollectionReference":
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths: Optional[Iterable[str]] = None) -> DocumentSnapshot:
+        self._client._rpc()
+        return DocumentSnapshot(self, self._client._read(self.path), field_paths)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._client._set(self.path, data, merge)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        self._client._update(self.path, data)
+
+    def delete(self) -> None:
+        self._client._delete(self.path)
+
+
+class Query:
+    def __init__(self, client: "FakeFirestore", paths: List[str], fields: Optional[List[str]] = None):
+        self._client = client
+        self._paths = paths
+        self._fields = fields
+
+    def select(self, field_paths: Iterable[str]) -> "Query":
+        return Query(self._client, self._paths, list(field_paths))
+
+    def stream(self) -> Iterator[DocumentSnapshot]:
+        self._client._rpc()
+        for collection_path in self._paths:
+            for doc_id, data in self._client._documents(collection_path):
+                ref = DocumentReference(self._client, f"{collection_path}/{doc_id}")
+                yield DocumentSnapshot(ref, data, self._fields)
+
+
+class CollectionReference(Query):
+    def __init__(self, client: "FakeFirestore", path: str):
+        super().__init__(client, [path])
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> Optional[DocumentReference]:
+        if "/" not in self.path:
+            return None
+        return DocumentReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def document(self, doc_id: str) -> DocumentReference:
+        return DocumentReference(self._client, f"{self.path}/{doc_id}")
+
+
+class WriteBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._writes: List[tuple] = []
+
+    def set(self, ref: DocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append((self._client._set, ref.path, data, merge))
+
+    def update(self, ref: DocumentReference, data: Dict[str, Any]) -> None:
+        self._writes.append((self._client._update, ref.path, data))
+
+    def delete(self, ref: DocumentReference) -> None:
+        self._writes.append((self._client._delete, ref.path))
+
+    def commit(self) -> None:
+        self._client._rpc()
+        writes, self._writes = self._writes, []
+        for op, *args in writes:
+            op(*args)
+
+
+class BulkWriteFailure:
+    """Escritura fallida entregada a ``on_write_error`` (como la de google-cloud-firestore)."""
+
+    def __init__(self, operation: "BulkWriterOperation", code: int, message: str):
+        self.operation = operation
+        self.code = code
+        self.message = message
+
+    @property
+    def attempts(self) -> int:
+        return self.operation.attempts
+
+
+class BulkWriterOperation:
+    def __init__(self, reference: DocumentReference, write: tuple):
+        self.reference = reference
+        self.write = write
+        self.attempts = 0
+
+
+class BulkWriter(WriteBatch):
+    """Las escrituras se aplican en cada ``flush`` (y cada 500 operaciones).
+
+    Como en Firestore, cada escritura es independiente: una que falla no
+    afecta a las demás y se informa a ``on_write_error`` (``True`` = reintentar).
+    Sin ese callback el error se propaga desde ``flush``.
+    """
+
+    def __init__(self, client: "FakeFirestore"):
+        super().__init__(client)
+        self._on_result = None
+        self._on_error = None
+
+    def on_write_result(self, callback) -> None:
+        self._on_result = callback
+
+    def on_write_error(self, callback) -> None:
+        self._on_error = callback
+
+    def _queue(self, ref: DocumentReference, write: tuple) -> None:
+        self._writes.append(BulkWriterOperation(ref, write))
+        if len(self._writes) >= 500:
+            self.commit()
+
+    def set(self, ref: DocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._queue(ref, (self._client._set, ref.path, data, merge))
+
+    def update(self, ref: DocumentReference, data: Dict[str, Any]) -> None:
+        self._queue(ref, (self._client._update, ref.path, data))
+
+    def delete(self, ref: DocumentReference) -> None:
+        self._queue(ref, (self._client._delete, ref.path))
+
+    def commit(self) -> None:
+        self._client._rpc()
+        operations, self._writes = self._writes, []
+        for operation in operations:
+            while True:
+                operation.attempts += 1
+                op, *args = operation.write
+                try:
+                    op(*args)
+                except Exception as e:
+                    if self._on_error is None:
+                        raise
+                    code = 5 if isinstance(e, NotFound) else 14  # NOT_FOUND / UNAVAILABLE
+                    if self._on_error(BulkWriteFailure(operation, code, str(e)), self):
+                        continue
+                else:
+                    if self._on_result is not None:
+                        self._on_result(operation.reference, None, self)
+                break
+
+    def flush(self) -> None:
+        if self._writes:
+            self.commit()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class FakeFirestore:
+    """Cliente síncrono: ``collections[ruta_colección][doc_id] = campos``."""
+
+    def __init__(self, rpc_latency_ms: float = 0.0):
+        self.rpc_latency = rpc_latency_ms / 1000.0
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.rpcs = 0
+        self._lock = threading.Lock()
+
+    def collection(self, path: str) -> CollectionReference:
+        return CollectionReference(self, path)
+
+    def document(self, path: str) -> DocumentReference:
+        return DocumentReference(self, path)
+
+    def collection_group(self, collection_id: str) -> Query:
+        with self._lock:
+            paths = sorted(p for p in self.collections if p.rsplit("/", 1)[-1] == collection_id)
+        return Query(self, paths)
+
+    def get_all(self, references: Iterable[DocumentReference], field_paths: Optional[Iterable[str]] = None) -> Iterator[DocumentSnapshot]:
+        self._rpc()
+        fields = list(field_paths) if field_paths is not None else None
+        for ref in references:
+            yield DocumentSnapshot(ref, self._read(ref.path), fields)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def bulk_writer(self) -> BulkWriter:
+        return BulkWriter(self)
+
+    def count(self) -> int:
+        """Documentos almacenados en todas las colecciones."""
+        with self._lock:
+            return sum(len(docs) for docs in self.collections.values())
+
+    # --- almacenamiento ---
+
+    def _rpc(self) -> None:
+        self.rpcs += 1
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency)
+
+    async def _rpc_async(self) -> None:
+        self.rpcs += 1
+        if self.rpc_latency:
+            await asyncio.sleep(self.rpc_latency)
+
+    def _split(self, path: str) -> tuple:
+        collection_path, doc_id = path.rsplit("/", 1)
+        return collection_path, doc_id
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        collection_path, doc_id = self._split(path)
+        with self._lock:
+            data = self.collections.get(collection_path, {}).get(doc_id)
+            return dict(data) if data is not None else None
+
+    def _documents(self, collection_path: str) -> List[tuple]:
+        with self._lock:
+            return sorted(self.collections.get(collection_path, {}).items())
+
+    def _set(self, path: str, data: Dict[str, Any], merge: bool = False) -> None:
+        collection_path, doc_id = self._split(path)
+        with self._lock:
+            docs = self.collections.setdefault(collection_path, {})
+            current = docs.get(doc_id, {}) if merge else {}
+            docs[doc_id] = {**current, **{k: _write_value(current.get(k), v) for k, v in data.items()}}
+
+    def _update(self, path: str, data: Dict[str, Any]) -> None:
+        collection_path, doc_id = self._split(path)
+        with self._lock:
+            current = self.collections.get(collection_path, {}).get(doc_id)
+            if current is None:
+                raise NotFound(path)
+            for key, value in data.items():
+                current[key] = _write_value(current.get(key), value)
+
+    def _delete(self, path: str) -> None:
+        collection_path, doc_id = self._split(path)
+        with self._lock:
+            self.collections.get(collection_path, {}).pop(doc_id, None)
+
+
+class _AsyncQuery:
+    def __init__(self, query: Query):
+        self._query = query
+
+    def select(self, field_paths: Iterable[str]) -> "_AsyncQuery":
+        return _AsyncQuery(self._query.select(field_paths))
+
+    async def stream(self):
+        await self._query._client._rpc_async()
+        for collection_path in self._query._paths:
+            for doc_id, data in self._query._client._documents(collection_path):
+                ref = DocumentReference(self._query._client, f"{collection_path}/{doc_id}")
+                yield DocumentSnapshot(ref, data, self._query._fields)
+
+
+class _AsyncCollection(_AsyncQuery):
+    def __init__(self, client: "FakeFirestore", path: str):
+        super().__init__(CollectionReference(client, path))
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id: str) -> "_AsyncDocument":
+        return _AsyncDocument(self._client, f"{self.path}/{doc_id}")
+
+
+class _AsyncDocument(DocumentReference):
+    def collection(self, name: str) -> _AsyncCollection:
+        return _AsyncCollection(self._client, f"{self.path}/{name}")
+
+    async def get(self, field_paths: Optional[Iterable[str]] = None) -> DocumentSnapshot:
+        await self._client._rpc_async()
+        return DocumentSnapshot(self, self._client._read(self.path), field_paths)
+
+
+class _AsyncBatch(WriteBatch):
+    async def commit(self) -> None:
+        await self._client._rpc_async()
+        writes, self._writes = self._writes, []
+        for op, *args in writes:
+            op(*args)
+
+
+class FakeAsyncFirestore:
+    """Vista ``AsyncClient`` de un ``FakeFirestore``; la latencia simulada no bloquea el event loop."""
+
+    def __init__(self, client: FakeFirestore):
+        self._client = client
+
+    def collection(self, path: str) -> _AsyncCollection:
+        return _AsyncCollection(self._client, path)
+
+    def collection_group(self, collection_id: str) -> _AsyncQuery:
+        return _AsyncQuery(self._client.collection_group(collection_id))
+
+    async def get_all(self, references: Iterable[DocumentReference], field_paths: Optional[Iterable[str]] = None):
+        await self._client._rpc_async()
+        fields = list(field_paths) if field_paths is not None else None
+        for ref in references:
+            yield DocumentSnapshot(ref, self._client._read(ref.path), fields)
+
+    def batch(self) -> _AsyncBatch:
+        return _AsyncBatch(self._client)
@@ -0,0 +1,194 @@
+"""Corpus sintético con el esquema de ``rag_vectores2`` para benchmarks offline.
+
+Los chunks son secuencias de pseudo-palabras: la mitad sale del vocabulario
+del tema de su documento y la otra mitad de todo el vocabulario, sesgada
+hacia palabras frecuentes, de modo que BM25 y los vectores tienen estructura
+parecida a un corpus real.
+Los embeddings se calculan con el mismo hashing de unigramas que
+``HashEmbeddingBackend`` pero vectorizado (sin bigramas), así las consultas
+embebidas con ese backend caen cerca de los chunks que comparten términos y
+se pueden generar millones de filas en segundos.
+"""
+from __future__ import annotations
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from my_agent_utem.tools.rag_index import ChunkIndex, normalize_rows
+
+SYLLABLES = (
+    "ba", "be", "ca", "ci", "co", "da", "de", "do", "fa", "fi", "ga", "go", "la", "le", "li",
+    "lo", "ma", "me", "mi", "mo", "na", "ne", "no", "pa", "pe", "po", "ra", "re", "ri", "ro",
+    "sa", "se", "si", "so", "ta", "te", "ti", "to", "va", "ve", "za", "cion", "dad", "mento",
+)
+FACULTIES = (
+    "Facultad de Ingeniería", "Facultad de Administración y Economía", "Facultad de Ciencias Naturales",
+    "Facultad de Humanidades", "Facultad de Construcción y Ordenamiento Territorial",
+)
+CAREERS = ("Ingeniería Civil en Computación", "Bibliotecología", "Arquitectura", "Química Industrial", "Trabajo Social")
+DOC_KINDS = ("Reglamento", "Resolución", "Plan de Desarrollo", "Informe", "Programa")
+TOPIC_WORDS = 150
+WORDS_PER_CHUNK = 48
+EMBED_BLOCK_ROWS = 50000
+WRITE_BATCH = 500
+
+
+def make_vocabulary(size: int, rng: np.random.Generator) -> List[str]:
+    """Pseudo-palabras únicas de 2 a 4 sílabas."""
+    words: Dict[str, None] = {}
+    while len(words) < size:
+        n = size - len(words)
+        lengths = rng.integers(2, 5, n)
+        picks = rng.integers(0, len(SYLLABLES), (n, 4))
+        for length, row in zip(lengths, picks):
+            words["".join(SYLLABLES[s] for s in row[:length])] = None
+    return list(words)[:size]
+
+
+def hash_features(words: List[str], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Dimensión y signo de cada palabra, con el mismo hash que ``HashEmbeddingBackend``."""
+    dims = np.empty(len(words), dtype=np.int64)
+    signs = np.empty(len(words), dtype=np.float32)
+    for i, word in enumerate(words):
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        dims[i] = h % dim
+        signs[i] = 1.0 if h >> 63 else -1.0
+    return dims, signs
+
+
+class SyntheticCorpus:
+    """``n_chunks`` chunks repartidos en ``n_docs`` documentos contiguos (determinista por ``seed``)."""
+
+    def __init__(
+        self,
+        n_chunks: int,
+        n_docs: int = 0,
+        dim: int = 768,
+        vocab_size: int = 20000,
+        n_topics: int = 64,
+        words_per_chunk: int = WORDS_PER_CHUNK,
+        seed: int = 0,
+    ):
+        rng = np.random.default_rng(seed)
+        self.n_chunks = n_chunks
+        self.n_docs = n_docs or max(1, n_chunks // 100)
+        self.dim = dim
+        self.seed = seed
+        self.vocab = make_vocabulary(vocab_size, rng)
+        self._dims, self._signs = hash_features(self.vocab, dim)
+
+        self.topic_words = rng.integers(0, vocab_size, (n_topics, TOPIC_WORDS))
+        self.doc_topic = rng.integers(0, n_topics, self.n_docs)
+        self.chunk_doc = (np.arange(n_chunks, dtype=np.int64) * self.n_docs // max(n_chunks, 1)).astype(np.int32)
+        first_row = np.searchsorted(self.chunk_doc, np.arange(self.n_docs))
+        self.chunk_index = (np.arange(n_chunks) - first_row[self.chunk_doc]).astype(np.int32)
+
+        half = words_per_chunk // 2
+        self.tokens = np.empty((n_chunks, words_per_chunk), dtype=np.int32)
+        for start in range(0, n_chunks, EMBED_BLOCK_ROWS):
+            end = min(start + EMBED_BLOCK_ROWS, n_chunks)
+            topics = self.doc_topic[self.chunk_doc[start:end]]
+            picks = rng.integers(0, TOPIC_WORDS, (end - start, half))
+            self.tokens[start:end, :half] = self.topic_words[topics[:, None], picks]
+            self.tokens[start:end, half:] = vocab_size * rng.random((end - start, words_per_chunk - half)) ** 2
+        rng.permuted(self.tokens, axis=1, out=self.tokens)
+
+        counts = np.bincount(self.chunk_doc, minlength=self.n_docs)
+        base = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        for d in range(self.n_docs):
+            doc_id = self.doc_id(d)
+            created = base + timedelta(days=int(rng.integers(0, 3650)))
+            kind = DOC_KINDS[d % len(DOC_KINDS)]
+            topic_word = self.vocab[self.topic_words[self.doc_topic[d], 0]]
+            self.docs[doc_id] = {
+                "doc_id": doc_id,
+                "doc_name": f"{kind} {topic_word} {d:06d}.pdf",
+                "file_type": "pdf" if d % 4 else "docx",
+                "faculty": FACULTIES[d % len(FACULTIES)],
+                "career": CAREERS[d % len(CAREERS)],
+                "year": created.year,
+                "total_chunks": int(counts[d]),
+                "created_at": created,
+                "updated_at": created,
+                "indexed_at": created,
+            }
+
+    @staticmethod
+    def doc_id(doc: int) -> str:
+        return f"doc-{doc:06d}"
+
+    def chunk_id(self, row: int) -> str:
+        return f"{self.doc_id(int(self.chunk_doc[row]))}-c{int(self.chunk_index[row]):05d}"
+
+    def text(self, row: int) -> str:
+        return " ".join(self.vocab[t] for t in self.tokens[row])
+
+    def embeddings(self, start: int = 0, end: int = 0) -> np.ndarray:
+        """Embeddings normalizados de las filas ``start:end`` (por defecto todas)."""
+        end = end or self.n_chunks
+        out = np.zeros((end - start, self.dim), dtype=np.float32)
+        for block in range(start, end, EMBED_BLOCK_ROWS):
+            tokens = self.tokens[block:min(block + EMBED_BLOCK_ROWS, end)]
+            rows = np.repeat(np.arange(tokens.shape[0]) + (block - start), tokens.shape[1])
+            np.add.at(out, (rows, self._dims[tokens.ravel()]), self._signs[tokens.ravel()])
+        return normalize_rows(out)
+
+    def chunk_index_direct(self, with_texts: bool = True) -> ChunkIndex:
+        """``ChunkIndex`` armado desde los arreglos, sin pasar por Firestore."""
+        return ChunkIndex(
+            self.embeddings(),
+            np.asarray([self.doc_id(int(d)) for d in self.chunk_doc], dtype=object),
+            np.asarray([self.chunk_id(r) for r in range(self.n_chunks)], dtype=object),
+            self.chunk_index.copy(),
+            [self.text(r) for r in range(self.n_chunks)] if with_texts else None,
+        )
+
+    def queries(self, n: int, seed: int = 1) -> List[Dict[str, str]]:
+        """Consultas de 3 a 6 términos de un chunk al azar, con el nombre de su documento."""
+        rng = np.random.default_rng(seed)
+        queries = []
+        for row in rng.integers(0, self.n_chunks, n):
+            words = rng.choice(self.tokens[row], size=int(rng.integers(3, 7)), replace=False)
+            doc = self.docs[self.doc_id(int(self.chunk_doc[row]))]
+            queries.append({"query": " ".join(self.vocab[w] for w in words), "document_name": doc["doc_name"]})
+        return queries
+
+    def chunk_documents(self, with_embeddings: bool = True, as_arrays: bool = True) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """(doc_id, chunk_id, campos) de cada chunk; ``as_arrays`` deja el embedding como fila numpy."""
+        for start in range(0, self.n_chunks, EMBED_BLOCK_ROWS):
+            end = min(start + EMBED_BLOCK_ROWS, self.n_chunks)
+            vectors = self.embeddings(start, end) if with_embeddings else None
+            for row in range(start, end):
+                doc_id, chunk_id = self.doc_id(int(self.chunk_doc[row])), self.chunk_id(row)
+                fields = {
+                    "chunk_id": chunk_id,
+                    "chunk_index": int(self.chunk_index[row]),
+                    "text": self.text(row),
+                    "access_count": 0,
+                }
+                if vectors is not None:
+                    vector = vectors[row - start]
+                    fields["embedding"] = vector if as_arrays else vector.tolist()
+                yield doc_id, chunk_id, fields
+
+    def populate(self, db: Any, collection_name: str, with_embeddings: bool = True, as_arrays: bool = True) -> None:
+        """Escribe documentos y chunks con ``db.batch()`` (fake en memoria o emulador)."""
+        collection = db.collection(collection_name)
+        batch, pending = db.batch(), 0
+        for doc_id, chunk_id, fields in self.chunk_documents(with_embeddings, as_arrays):
+            batch.set(collection.document(doc_id).collection("chunks").document(chunk_id), fields)
+            pending += 1
+            if pending >= WRITE_BATCH:
+                batch.commit()
+                batch, pending = db.batch(), 0
+        for doc_id, metadata in self.docs.items():
+            batch.set(collection.document(doc_id), metadata)
+            pending += 1
+            if pending >= WRITE_BATCH:
+                batch.commit()
+                batch, pending = db.batch(), 0
+        if pending:
+            batch.commit()
@@ -41,6 +41,7 @@ env_vars = {
     "FIRESTORE_PROJECT_ID": "muruna-utem-project",
     "DATABASE_ID": "(default)",
     "GCS_RAG_BUCKET": "db_agent_utem",
+    "RAG_INDEX_SNAPSHOT_DIR": "/tmp/rag_index",
 }
 
 remote_app = agent_engines.create(
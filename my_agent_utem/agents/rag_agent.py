@@ -1,5 +1,5 @@
 from google.adk.agents import LlmAgent
-from ..tools.query_rag import search_rag_tool, list_documents_tool
+from ..tools.query_rag import search_rag_tool, list_documents_tool, activities_tool
 from ..prompts import PROMPT_RAG_AGENT
 
 agente_busqueda_documental = LlmAgent(
@@ -9,9 +9,10 @@ agente_busqueda_documental = LlmAgent(
     Úsalo cuando necesites:
     - Buscar información en documentos PDF/DOCX indexados
     - Listar documentos disponibles en la base de conocimiento
+    - Consultar actividades PDC logradas / no logradas / no aplica ya extraídas
     - Extraer contexto relevante sobre informes PDC, carreras, actividades, etc.
     
     Este agente NO analiza ni interpreta datos, solo los recupera.""",
     instruction=PROMPT_RAG_AGENT,
-    tools=[search_rag_tool, list_documents_tool]
+    tools=[search_rag_tool, list_documents_tool, activities_tool]
 )
@@ -1,7 +1,7 @@
 from google.adk.agents import LlmAgent
 from my_agent_utem.tools.generate_pdf_report import generate_pdf_report_tool
 from my_agent_utem.tools.upload_to_storage import upload_pdf_to_storage_tool
-from my_agent_utem.tools.query_rag import search_rag_tool, list_documents_tool
+from my_agent_utem.tools.query_rag import search_rag_tool, search_rag_batch_tool, list_documents_tool, activities_tool
 from my_agent_utem.prompts import PROMPT_AGENT_REPORTES
 
 
@@ -15,7 +15,8 @@ agente_reportes_institucionales = LlmAgent(
     
     Capacidades:
     - Recibir texto extraido de documentos adjuntos (el frontend hace la extraccion)
-    - Buscar en documentos indexados con search_rag_tool
+    - Buscar en documentos indexados con search_rag_tool (o varias consultas a la vez con search_rag_batch_tool)
+    - Obtener las actividades L/NL/NA de un informe indexado con activities_tool
     - Generar reportes PDF con generate_pdf_report_tool
     - Subir a Cloud Storage con upload_pdf_to_storage_tool
     """,
@@ -23,7 +24,9 @@ agente_reportes_institucionales = LlmAgent(
         generate_pdf_report_tool,
         upload_pdf_to_storage_tool,
         search_rag_tool,
-        list_documents_tool
+        search_rag_batch_tool,
+        list_documents_tool,
+        activities_tool
     ],
     instruction=PROMPT_AGENT_REPORTES
 )
@@ -0,0 +1,4 @@
+"""Ingesta de documentos PDF/DOCX a la colección RAG (rag_vectores2)."""
+from .pipeline import IngestionPipeline, ingest_paths
+
+__all__ = ["IngestionPipeline", "ingest_paths"]
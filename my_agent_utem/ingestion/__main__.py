@@ -0,0 +1,73 @@
+"""CLI de ingesta.
+
+Uso:
+    python -m my_agent_utem.ingestion informes/*.pdf informes/*.docx \\
+        --gcs-prefix gs://bucket/pdc_2025 --faculty "Facultad de Ingeniería" --year 2025
+"""
+from __future__ import annotations
+import argparse
+import glob
+import json
+import logging
+import os
+
+from .chunking import DEFAULT_CHUNK_CHARS, DEFAULT_OVERLAP_CHARS
+from .parsers import SUPPORTED_TYPES
+from .pipeline import IngestionPipeline
+
+
+def _expand(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for ext in SUPPORTED_TYPES:
+                paths.extend(glob.glob(os.path.join(item, "**", f"*{ext}"), recursive=True))
+        else:
+            paths.extend(glob.glob(item) or [item])
+    return sorted(set(paths))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingesta de documentos PDF/DOCX a Firestore (rag_vectores2)")
+    parser.add_argument("inputs", nargs="+", help="Archivos, patrones glob o directorios")
+    parser.add_argument("--gcs-prefix", help="Prefijo gs:// donde están publicados los archivos (para gcs_uri)")
+    parser.add_argument("--faculty", help="Facultad de todos los documentos")
+    parser.add_argument("--career", help="Carrera de todos los documentos")
+    parser.add_argument("--year", type=int, help="Año de todos los documentos")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Procesos de parseo (0 = núcleos)")
+    parser.add_argument("--embed-workers", type=int, default=4, help="Requests de embeddings en vuelo")
+    parser.add_argument("--chunk-chars", type=int, default=DEFAULT_CHUNK_CHARS)
+    parser.add_argument("--overlap-chars", type=int, default=DEFAULT_OVERLAP_CHARS)
+    parser.add_argument("--full", action="store_true", help="Re-embeber todos los chunks aunque su hash no cambie")
+    parser.add_argument("--json", help="Ruta donde guardar las estadísticas en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    extra = {k: v for k, v in {"faculty": args.faculty, "career": args.career, "year": args.year}.items() if v}
+    pipeline = IngestionPipeline(
+        parse_workers=args.parse_workers,
+        embed_workers=args.embed_workers,
+        chunk_chars=args.chunk_chars,
+        overlap_chars=args.overlap_chars,
+        gcs_prefix=args.gcs_prefix,
+        extra_metadata=extra,
+        full=args.full,
+    )
+    stats = pipeline.run(_expand(args.inputs))
+    print(
+        f"✓ {stats['documents']} documentos, {stats['chunks']} chunks en {stats['elapsed_s']} s "
+        f"({stats['docs_per_s']} docs/s, {stats['chunks_per_s']} chunks/s); "
+        f"{len(stats['failed'])} con error"
+    )
+    print(
+        f"  chunks: {stats['chunks_embedded']} embebidos, {stats['chunks_unchanged']} sin cambios, "
+        f"{stats['chunks_reindexed']} desplazados, {stats['chunks_deleted']} eliminados"
+    )
+    print(f"  actividades: {stats['activities']} extraídas, {stats['activities_written']} escritas")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stats, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Extracción de las actividades de los informes PDC (dimensión, texto, fecha, estado L/NL/NA y anexos).
+
+Los parsers entregan las filas de las tablas DOCX como ``celda | celda | ...``
+y el texto de los PDF línea a línea. En una fila de tabla el estado es una
+celda corta ("Logrado", "NL", "En proceso"), la fecha otra y el texto la
+celda más larga. En una línea suelta de PDF se exige además una fecha, un
+anexo o un código L/NL/NA para no confundir prosa ("se ha logrado...") con una
+actividad; si la línea es corta o parte en minúscula se completa con las
+líneas anteriores.
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..tools.rag_activities import (
+    DIMENSION_TITLES, ROMAN_NUMERALS, STATUS_LABELS, classify_status, find_statuses, fold,
+)
+
+MAX_ACTIVITY_CHARS = 600
+MAX_STATUS_CELL_CHARS = 40
+MIN_ACTIVITY_CHARS = 8
+# Líneas previas que pueden completar una actividad de PDF partida en varias líneas
+CONTEXT_LINES = 3
+
+_MONTHS = "enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre"
+_DATE_RE = re.compile(
+    rf"\b\d{{1,2}}[/.-]\d{{1,2}}[/.-](?:\d{{4}}|\d{{2}})\b"
+    rf"|\b\d{{1,2}}[/-]\d{{4}}\b"
+    rf"|\b(?:\d{{1,2}}\s+de\s+)?(?:{_MONTHS})(?:\s+de)?\s+\d{{4}}\b"
+    rf"|\b(?:primer|segundo|1er|2do)\s+semestre(?:\s+de)?\s+\d{{4}}\b",
+)
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+_ANNEX_RE = re.compile(r"\banexos?\s*(?:n\s*[°º.]?\s*)?(\d+(?:\s*(?:,|y|-|/)\s*\d+)*)")
+_DIMENSION_RE = re.compile(r"^dimension\s*(?:n\s*[°º.]?\s*)?([ivx]+|\d)\b\s*[:.\-–]?\s*(.*)$")
+_CODE_RE = re.compile(r"(?<![\w/])(NL|NA|L)(?![\w/])")
+
+
+def _lines(text: str) -> Iterator[str]:
+    for line in (text or "").splitlines():
+        line = " ".join(line.split())
+        if line:
+            yield line
+
+
+def _dimension_header(line: str) -> Optional[Tuple[str, str]]:
+    """(dimN, título) si la línea (o su primera celda) abre una dimensión."""
+    first = line.split("|", 1)[0].strip()
+    if len(first) > 200:
+        return None
+    match = _DIMENSION_RE.match(fold(first).replace("º", "°"))
+    if not match:
+        return None
+    token = match.group(1)
+    number = int(token) if token.isdigit() else ROMAN_NUMERALS.get(token)
+    key = f"dim{number}"
+    if key not in DIMENSION_TITLES:
+        return None
+    title = first[match.start(2):].strip(" :.-–")
+    return key, first if title else DIMENSION_TITLES[key]
+
+
+def _annexes(text: str) -> List[str]:
+    """"ANEXO 3, 4 y 5" → ["ANEXO 3", "ANEXO 4", "ANEXO 5"] (sin repetidos, en orden)."""
+    found: List[str] = []
+    for match in _ANNEX_RE.finditer(fold(text)):
+        for number in re.findall(r"\d+", match.group(1)):
+            label = f"ANEXO {int(number)}"
+            if label not in found:
+                found.append(label)
+    return found
+
+
+def _date(text: str, allow_year: bool = False) -> Optional[str]:
+    match = _DATE_RE.search(fold(text))
+    if match is None and allow_year:
+        match = _YEAR_RE.search(text)
+    return text[match.start():match.end()].strip() if match else None
+
+
+def _clean(text: str) -> str:
+    text = re.sub(r"\s+", " ", text).strip(" |;,:-–.")
+    return text[:MAX_ACTIVITY_CHARS]
+
+
+def _row_record(cells: List[str]) -> Optional[Dict[str, Any]]:
+    """Actividad de una fila de tabla: celda de estado corta, fecha, anexos y la celda más larga como texto."""
+    status_at, status = None, None
+    for i, cell in enumerate(cells):
+        if cell and len(cell) <= MAX_STATUS_CELL_CHARS:
+            status = classify_status(cell)
+            if status is not None:
+                status_at = i
+                break
+    if status_at is None:
+        return None
+
+    date, date_at = None, None
+    for i, cell in enumerate(cells):
+        if i != status_at and cell and len(cell) <= MAX_STATUS_CELL_CHARS:
+            date = _date(cell, allow_year=len(cell) <= 12)
+            if date:
+                date_at = i
+                break
+
+    annexes = _annexes(" ".join(c for i, c in enumerate(cells) if i != status_at))
+    annex_only = {i for i, c in enumerate(cells) if _annexes(c) and len(_ANNEX_RE.sub("", fold(c)).strip(" ,.;-")) < 5}
+    candidates = [
+        (i, c) for i, c in enumerate(cells)
+        if c and i not in (status_at, date_at) and i not in annex_only
+    ]
+    if not candidates:
+        return None
+    text_at, text = max(candidates, key=lambda item: len(item[1]))
+    if len(text) < MIN_ACTIVITY_CHARS:
+        return None
+    plan = [c for i, c in candidates if i > status_at and i != text_at]
+    return {
+        "text": _clean(text),
+        "date": date,
+        "status": status,
+        "status_raw": cells[status_at],
+        "annexes": annexes,
+        "plan_mejora": _clean(" ".join(plan)) if plan and status == "NL" else None,
+    }
+
+
+def _line_record(line: str, previous: List[str]) -> Optional[Dict[str, Any]]:
+    """Actividad de una línea de texto corrido (PDF)."""
+    statuses = find_statuses(line)
+    codes = [(m.group(1), m.start(), m.end()) for m in _CODE_RE.finditer(line)]
+    found = {code for code, _, _ in statuses} | {code for code, _, _ in codes}
+    if len(found) != 1:
+        return None
+    status = found.pop()
+
+    date = _date(line)
+    annexes = _annexes(line)
+    if not codes and not date and not annexes:
+        return None
+
+    spans = [(start, end) for _, start, end in statuses + codes]
+    folded = fold(line)
+    spans += [m.span() for m in _DATE_RE.finditer(folded)] + [m.span() for m in _ANNEX_RE.finditer(folded)]
+    text, cursor = [], 0
+    for start, end in sorted(spans):
+        if start > cursor:
+            text.append(line[cursor:start])
+        cursor = max(cursor, end)
+    text.append(line[cursor:])
+    text = _clean(" ".join(text))
+    if previous and len(text) < 15:
+        text = _clean(" ".join(previous + [text]))
+    elif previous and text[:1].islower():
+        # Continuación de la línea anterior ("... metodología A+S en" / "cursos de primer año")
+        text = _clean(f"{previous[-1]} {text}")
+    if len(text) < MIN_ACTIVITY_CHARS:
+        return None
+    raw = line[spans[0][0]:spans[0][1]] if spans else STATUS_LABELS[status]
+    return {
+        "text": text,
+        "date": date,
+        "status": status,
+        "status_raw": raw,
+        "annexes": annexes,
+        "plan_mejora": None,
+    }
+
+
+def extract_activities(text: str) -> List[Dict[str, Any]]:
+    """Actividades del texto de un informe, en orden de aparición y sin repetidos.
+
+    Cada una trae ``order``, ``dimension`` (``dimN`` o None), ``dimension_title``,
+    ``text``, ``date``, ``status`` (L/NL/NA), ``status_raw``, ``annexes`` y
+    ``plan_mejora``.
+    """
+    activities: List[Dict[str, Any]] = []
+    seen = set()
+    dimension, dimension_title = None, None
+    previous: List[str] = []
+
+    for line in _lines(text):
+        header = _dimension_header(line)
+        if header is not None:
+            dimension, dimension_title = header
+            previous = []
+            if "|" not in line:
+                continue
+
+        if "|" in line:
+            record = _row_record([c.strip() for c in line.split("|")])
+        else:
+            record = _line_record(line, previous)
+            previous = (previous + [line])[-CONTEXT_LINES:] if record is None else []
+        if record is None:
+            continue
+
+        key = (dimension, fold(record["text"]), record["status"])
+        if key in seen:
+            continue
+        seen.add(key)
+        record.update(order=len(activities), dimension=dimension, dimension_title=dimension_title)
+        activities.append(record)
+    return activities
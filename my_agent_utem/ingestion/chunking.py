@@ -0,0 +1,67 @@
+"""Chunking por párrafos con solapamiento, como generador."""
+from __future__ import annotations
+import re
+import zlib
+from typing import Iterator
+
+DEFAULT_CHUNK_CHARS = 1500
+DEFAULT_OVERLAP_CHARS = 200
+# En promedio uno de cada ANCHOR_MODULUS párrafos permite cerrar un chunk
+ANCHOR_MODULUS = 3
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def _pieces(text: str, max_chars: int) -> Iterator[str]:
+    """Párrafos del texto; los que exceden ``max_chars`` se cortan por oraciones (o en duro)."""
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            for start in range(0, len(sentence), max_chars):
+                yield sentence[start:start + max_chars]
+
+
+def _is_anchor(piece: str) -> bool:
+    """Párrafo ancla según su contenido: los cortes no dependen de lo que haya antes."""
+    return zlib.crc32(piece.encode("utf-8")) % ANCHOR_MODULUS == 0
+
+
+def iter_chunks(
+    text: str,
+    chunk_chars: int = DEFAULT_CHUNK_CHARS,
+    overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+) -> Iterator[str]:
+    """Agrupa párrafos hasta ``chunk_chars``; cada chunk repite el final del anterior.
+
+    Pasada la mitad de ``chunk_chars`` el chunk se cierra en el primer párrafo
+    ancla. Como las anclas dependen solo del contenido, una edición pequeña
+    cambia los chunks cercanos y los cortes posteriores vuelven a coincidir con
+    los de la versión anterior (necesario para re-indexar por hash).
+    """
+    min_chars = chunk_chars // 2
+    current = ""
+
+    def start_next(previous: str, piece_len: int) -> str:
+        tail = previous[-overlap_chars:] if overlap_chars else ""
+        # El solapamiento parte en un límite de palabra
+        tail = tail[tail.find(" ") + 1:] if " " in tail else tail
+        return "" if len(tail) + piece_len + 1 > chunk_chars else tail
+
+    pending = False  # Hay párrafos nuevos (no solo solapamiento) en ``current``
+    for piece in _pieces(text, chunk_chars):
+        if pending and len(current) + len(piece) + 1 > chunk_chars:
+            yield current
+            current = start_next(current, len(piece))
+        current = f"{current} {piece}" if current else piece
+        pending = True
+        if len(current) >= min_chars and _is_anchor(piece):
+            yield current
+            current, pending = start_next(current, 0), False
+    if pending:
+        yield current
@@ -0,0 +1,59 @@
+"""Extracción de texto de PDF y DOCX (se ejecuta en procesos del pool de ingesta)."""
+from __future__ import annotations
+import os
+from typing import Any, Dict
+
+from docx import Document
+from docx.table import Table
+from PyPDF2 import PdfReader
+
+SUPPORTED_TYPES = {".pdf": "PDF", ".docx": "DOCX"}
+
+
+def file_type_of(path: str) -> str:
+    return SUPPORTED_TYPES.get(os.path.splitext(path)[1].lower(), "OTHER")
+
+
+def _pdf_text(path: str) -> str:
+    reader = PdfReader(path)
+    return "\n\n".join((page.extract_text() or "").strip() for page in reader.pages)
+
+
+def _docx_text(path: str) -> str:
+    """Párrafos y filas de tabla en el orden del documento.
+
+    Las tablas de los informes PDC traen actividades, indicadores y estados;
+    cada fila queda bajo el título de dimensión que la precede.
+    """
+    document = Document(path)
+    parts = []
+    for block in document.iter_inner_content():
+        if isinstance(block, Table):
+            for row in block.rows:
+                cells = [cell.text.strip() for cell in row.cells]
+                if any(cells):
+                    parts.append(" | ".join(cells))
+        elif block.text.strip():
+            parts.append(block.text.strip())
+    return "\n\n".join(parts)
+
+
+def parse_document(path: str) -> Dict[str, Any]:
+    """Retorna doc_name, file_type, path y text; ``error`` si no se pudo leer."""
+    file_type = file_type_of(path)
+    result = {
+        "path": path,
+        "doc_name": os.path.splitext(os.path.basename(path))[0],
+        "file_type": file_type,
+        "text": "",
+    }
+    try:
+        if file_type == "PDF":
+            result["text"] = _pdf_text(path)
+        elif file_type == "DOCX":
+            result["text"] = _docx_text(path)
+        else:
+            result["error"] = f"Tipo de archivo no soportado: {path}"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
@@ -0,0 +1,335 @@
+"""Pipeline de ingesta: parseo en procesos, chunking en streaming, embeddings por lote y BulkWriter."""
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from google.cloud import firestore
+
+from ..tools.query_rag import COLLECTION_NAME, EMBEDDING_BATCH_SIZE, get_db, get_embedding_service
+from ..tools.rag_activities import ACTIVITIES_SUBCOLLECTION, ACTIVITIES_VERSION, summarize
+from ..tools.rag_compact import estimate_tokens
+from .activities import extract_activities
+from .chunking import DEFAULT_CHUNK_CHARS, DEFAULT_OVERLAP_CHARS, iter_chunks
+from .parsers import parse_document
+
+logger = logging.getLogger(__name__)
+
+# Límite de tokens por request de get_embeddings (con margen sobre el límite de la API)
+EMBEDDING_BATCH_TOKENS = 15000
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def make_doc_id(doc_name: str) -> str:
+    """Id estable del documento a partir de su nombre (minúsculas, sin tildes, con guiones bajos)."""
+    text = unicodedata.normalize("NFD", doc_name.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return re.sub(r"[^a-z0-9]+", "_", text).strip("_")[:120] or "documento"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_activity_id(order: int) -> str:
+    return f"a{order:05d}"
+
+
+def make_chunk_id(doc_id: str, chunk_hash: str, occurrence: int = 0) -> str:
+    """Id del chunk derivado de su contenido: no cambia si el chunk solo se desplaza."""
+    suffix = f"_{occurrence}" if occurrence else ""
+    return f"{doc_id}_{chunk_hash[:16]}{suffix}"
+
+
+def plan_chunks(doc_id: str, texts: Iterable[str]) -> List[Dict[str, Any]]:
+    """chunk_id, chunk_index, text y content_hash de cada chunk del documento."""
+    chunks: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+    for chunk_index, text in enumerate(texts):
+        chunk_hash = content_hash(text)
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+        chunks.append({
+            "chunk_id": make_chunk_id(doc_id, chunk_hash, occurrence),
+            "chunk_index": chunk_index,
+            "text": text,
+            "content_hash": chunk_hash,
+        })
+    return chunks
+
+
+def diff_chunks(
+    previous: Dict[str, Dict[str, Any]], current: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+    """Compara los chunks guardados con los nuevos por hash de contenido.
+
+    Retorna (a_embeber, solo_cambia_chunk_index, ids_a_eliminar). Un chunk sin
+    ``content_hash`` (indexado antes de existir el campo) cuenta como distinto.
+    """
+    to_embed, reindex = [], []
+    for chunk in current:
+        old = previous.get(chunk["chunk_id"])
+        if old is None or old.get("content_hash") != chunk["content_hash"]:
+            to_embed.append(chunk)
+        elif old.get("chunk_index") != chunk["chunk_index"]:
+            reindex.append(chunk)
+    current_ids = {c["chunk_id"] for c in current}
+    return to_embed, reindex, [chunk_id for chunk_id in previous if chunk_id not in current_ids]
+
+
+class IngestionPipeline:
+    """Escribe documentos en ``rag_vectores2/{doc_id}`` y sus chunks en ``chunks/{chunk_id}``.
+
+    Los archivos se parsean en un ``ProcessPoolExecutor``; el texto se corta en
+    chunks a medida que llega cada documento y los chunks se agrupan en lotes de
+    hasta ``EMBEDDING_BATCH_SIZE`` textos y ``EMBEDDING_BATCH_TOKENS`` tokens,
+    con ``embed_workers`` requests en vuelo. Los chunks se escriben con un
+    ``BulkWriter`` y la metadata de cada documento se escribe al final, cuando
+    todos sus chunks ya están en Firestore.
+
+    Cada chunk guarda ``content_hash`` y su id se deriva del hash. Al
+    re-indexar un documento solo se embeben y escriben los chunks nuevos o
+    modificados, los desplazados solo actualizan ``chunk_index`` y los que
+    desaparecieron se eliminan (``full=True`` re-embebe todo).
+
+    Las actividades PDC del texto (ver ``ingestion.activities``) se escriben en
+    ``activities/{activity_id}`` cuando el documento cambia o cambió el
+    extractor (``ACTIVITIES_VERSION``); la metadata guarda su total y conteos L/NL/NA.
+    """
+
+    def __init__(
+        self,
+        db: Any = None,
+        embed_fn: Optional[EmbedFn] = None,
+        collection_name: str = COLLECTION_NAME,
+        parse_workers: int = 0,
+        embed_workers: int = 4,
+        chunk_chars: int = DEFAULT_CHUNK_CHARS,
+        overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+        gcs_prefix: Optional[str] = None,
+        extra_metadata: Optional[Dict[str, Any]] = None,
+        embedding_model: Optional[str] = None,
+        full: bool = False,
+    ):
+        self.db = db
+        # Por defecto, el mismo backend que usa la búsqueda (RAG_EMBED_BACKEND), sin micro-batching:
+        # la ingesta ya arma sus propios lotes
+        backend = get_embedding_service().backend
+        self.embed_fn = embed_fn or backend.embed
+        self.collection_name = collection_name
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.embed_workers = max(1, embed_workers)
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.gcs_prefix = gcs_prefix.rstrip("/") if gcs_prefix else None
+        self.extra_metadata = extra_metadata or {}
+        self.embedding_model = embedding_model or backend.name
+        self.full = full
+
+    def run(self, paths: Iterable[str]) -> Dict[str, Any]:
+        """Ingesta los archivos y retorna estadísticas de throughput."""
+        paths = list(paths)
+        db = self.db or get_db()
+        collection = db.collection(self.collection_name)
+        stats = {
+            "documents": 0, "chunks": 0, "characters": 0, "failed": [], "embed_requests": 0,
+            "chunks_embedded": 0, "chunks_unchanged": 0, "chunks_reindexed": 0, "chunks_deleted": 0,
+            "documents_unchanged": 0, "activities": 0, "activities_written": 0,
+        }
+        # embed_s suma el tiempo de todos los requests en vuelo; parse_wait_s es la espera por el pool
+        timings = {"parse_wait_s": 0.0, "embed_s": 0.0, "write_s": 0.0}
+        docs: Dict[str, Dict[str, Any]] = {}
+        start = time.perf_counter()
+
+        writer = db.bulk_writer()
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        batch_tokens = 0
+        in_flight: Deque[Tuple[List[Tuple[str, Dict[str, Any]]], Future]] = deque()
+
+        def chunk_ref(doc_id: str, chunk_id: str) -> Any:
+            return collection.document(doc_id).collection("chunks").document(chunk_id)
+
+        def activity_ref(doc_id: str, order: int) -> Any:
+            return collection.document(doc_id).collection(ACTIVITIES_SUBCOLLECTION).document(make_activity_id(order))
+
+        def drain(limit: int) -> None:
+            while len(in_flight) > limit:
+                items, future = in_flight.popleft()
+                vectors, embed_s = future.result()
+                timings["embed_s"] += embed_s
+                write_start = time.perf_counter()
+                for (doc_id, chunk), vector in zip(items, vectors):
+                    writer.set(chunk_ref(doc_id, chunk["chunk_id"]), {**chunk, "embedding": list(vector)})
+                timings["write_s"] += time.perf_counter() - write_start
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool, \
+                ThreadPoolExecutor(max_workers=self.embed_workers, thread_name_prefix="ingest-embed") as embed_pool:
+
+            def submit() -> None:
+                nonlocal batch, batch_tokens
+                if not batch:
+                    return
+                items = batch
+                in_flight.append((items, embed_pool.submit(self._embed, [c["text"] for _, c in items])))
+                stats["embed_requests"] += 1
+                batch, batch_tokens = [], 0
+                drain(self.embed_workers)
+
+            parse_start = time.perf_counter()
+            for parsed in parse_pool.map(parse_document, paths):
+                timings["parse_wait_s"] += time.perf_counter() - parse_start
+                if parsed.get("error") or not parsed["text"].strip():
+                    reason = parsed.get("error") or "sin texto extraíble"
+                    logger.warning(f"⚠️ Se omite {parsed['path']}: {reason}")
+                    stats["failed"].append({"path": parsed["path"], "error": reason})
+                    parse_start = time.perf_counter()
+                    continue
+
+                doc_id = make_doc_id(parsed["doc_name"])
+                chunks = plan_chunks(doc_id, iter_chunks(parsed["text"], self.chunk_chars, self.overlap_chars))
+                previous = self._previous_state(collection.document(doc_id))
+                to_embed, reindex, removed = diff_chunks(previous["chunks"], chunks)
+
+                for chunk in reindex:
+                    writer.update(chunk_ref(doc_id, chunk["chunk_id"]), {"chunk_index": chunk["chunk_index"]})
+                for chunk_id in removed:
+                    writer.delete(chunk_ref(doc_id, chunk_id))
+                for chunk in to_embed:
+                    tokens = estimate_tokens(chunk["text"])
+                    if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.batch_tokens):
+                        submit()
+                    batch.append((doc_id, chunk))
+                    batch_tokens += tokens
+
+                changed = bool(to_embed or reindex or removed)
+                activities = extract_activities(parsed["text"])
+                if changed or previous["activities_version"] != ACTIVITIES_VERSION:
+                    for activity in activities:
+                        writer.set(activity_ref(doc_id, activity["order"]), {
+                            **activity, "activity_id": make_activity_id(activity["order"]),
+                        })
+                    for order in range(len(activities), previous["total_activities"]):
+                        writer.delete(activity_ref(doc_id, order))
+                    stats["activities_written"] += len(activities)
+
+                docs[doc_id] = {
+                    "metadata": self._doc_metadata(doc_id, parsed, len(chunks), activities),
+                    "created_at": previous["created_at"],
+                    "changed": changed,
+                }
+                stats["documents"] += 1
+                stats["documents_unchanged"] += 0 if changed else 1
+                stats["chunks"] += len(chunks)
+                stats["chunks_embedded"] += len(to_embed)
+                stats["chunks_reindexed"] += len(reindex)
+                stats["chunks_unchanged"] += len(chunks) - len(to_embed) - len(reindex)
+                stats["chunks_deleted"] += len(removed)
+                stats["characters"] += len(parsed["text"])
+                stats["activities"] += len(activities)
+                logger.info(
+                    f"📄 {parsed['doc_name']}: {len(chunks)} chunks "
+                    f"({len(to_embed)} a embeber, {len(reindex)} desplazados, {len(removed)} eliminados), "
+                    f"{len(activities)} actividades"
+                )
+                parse_start = time.perf_counter()
+
+            submit()
+            drain(0)
+
+        write_start = time.perf_counter()
+        writer.flush()
+        self._publish_documents(collection, writer, docs)
+        writer.close()
+        timings["write_s"] += time.perf_counter() - write_start
+
+        elapsed = time.perf_counter() - start
+        stats.update(
+            elapsed_s=round(elapsed, 2),
+            docs_per_s=round(stats["documents"] / elapsed, 2) if elapsed else 0.0,
+            chunks_per_s=round(stats["chunks"] / elapsed, 1) if elapsed else 0.0,
+            **{k: round(v, 2) for k, v in timings.items()},
+        )
+        return stats
+
+    def _embed(self, texts: List[str]) -> Tuple[List[List[float]], float]:
+        """Embebe un lote en un hilo del pool; retorna los vectores y el tiempo del request.
+
+        El tiempo se suma a ``timings`` en el hilo principal (en ``drain``), no aquí.
+        """
+        embed_start = time.perf_counter()
+        vectors = self.embed_fn(texts)
+        elapsed = time.perf_counter() - embed_start
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"El backend de embeddings retornó {len(vectors)} vectores para {len(texts)} textos")
+        return vectors, elapsed
+
+    def _doc_metadata(
+        self, doc_id: str, parsed: Dict[str, Any], n_chunks: int, activities: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        filename = os.path.basename(parsed["path"])
+        summary = summarize(activities)
+        return {
+            **self.extra_metadata,
+            "doc_id": doc_id,
+            "doc_name": parsed["doc_name"],
+            "file_type": parsed["file_type"],
+            "gcs_uri": f"{self.gcs_prefix}/{filename}" if self.gcs_prefix else None,
+            "source_path": parsed["path"],
+            "total_chunks": n_chunks,
+            "total_characters": len(parsed["text"]),
+            "embedding_model": self.embedding_model,
+            "total_activities": len(activities),
+            "activities_summary": {k: summary[k] for k in ("L", "NL", "NA")},
+            "activities_version": ACTIVITIES_VERSION,
+        }
+
+    def _previous_state(self, doc_ref: Any) -> Dict[str, Any]:
+        """created_at, chunks guardados (content_hash, chunk_index) y versión de las actividades de un documento."""
+        snapshot = doc_ref.get(field_paths=["created_at", "embedding_model", "total_activities", "activities_version"])
+        data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        chunks = {
+            chunk.id: chunk.to_dict() or {}
+            for chunk in doc_ref.collection("chunks").select(["content_hash", "chunk_index"]).stream()
+        }
+        if self.full or (chunks and data.get("embedding_model") != self.embedding_model):
+            # Con otro modelo los embeddings guardados no sirven: todo cuenta como distinto
+            chunks = {chunk_id: {} for chunk_id in chunks}
+        return {
+            "created_at": data.get("created_at"),
+            "chunks": chunks,
+            "total_activities": data.get("total_activities") or 0,
+            "activities_version": data.get("activities_version"),
+        }
+
+    def _publish_documents(self, collection: Any, writer: Any, docs: Dict[str, Dict[str, Any]]) -> None:
+        """Escribe la metadata de cada documento una vez que sus chunks están en Firestore.
+
+        Solo los documentos con chunks modificados avanzan ``updated_at``, la
+        marca de agua con la que la búsqueda decide recargar sus chunks.
+        """
+        now = firestore.SERVER_TIMESTAMP
+        for doc_id, doc in docs.items():
+            metadata = doc["metadata"]
+            if doc["changed"] or doc["created_at"] is None:
+                writer.set(collection.document(doc_id), {
+                    **metadata, "created_at": doc["created_at"] or now, "updated_at": now, "indexed_at": now,
+                })
+            else:
+                writer.set(collection.document(doc_id), metadata, merge=True)
+        writer.flush()
+
+
+def ingest_paths(paths: Iterable[str], **kwargs: Any) -> Dict[str, Any]:
+    """Atajo: ``IngestionPipeline(**kwargs).run(paths)``."""
+    return IngestionPipeline(**kwargs).run(paths)
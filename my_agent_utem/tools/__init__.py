@@ -1,13 +1,15 @@
 from .generate_pdf_report import generate_pdf_report_tool
 from .upload_to_storage import upload_pdf_to_storage_tool
-from .query_rag import search_rag_tool, list_documents_tool
+from .query_rag import search_rag_tool, search_rag_batch_tool, list_documents_tool, activities_tool
 from .google_search import google_search_tool
 
 __all__ = [
     "generate_pdf_report_tool",
     "upload_pdf_to_storage_tool",
     "search_rag_tool",
+    "search_rag_batch_tool",
     "list_documents_tool",
+    "activities_tool",
     "google_search_tool"
 ]
 
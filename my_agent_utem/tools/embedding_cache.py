@@ -0,0 +1,161 @@
+"""Cache LRU+TTL de embeddings de consultas, con nivel persistente opcional en SQLite."""
+from __future__ import annotations
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza una consulta para usarla como clave (NFC, minúsculas, espacios colapsados)."""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class EmbeddingCache:
+    """Cache acotado de embeddings por (modelo, consulta normalizada).
+
+    El nivel en memoria es un LRU con expiración por TTL. Si se indica
+    ``persist_path`` se agrega un nivel SQLite que sobrevive reinicios; los
+    aciertos en disco se promueven a memoria. ``get``/``put`` usan ambos
+    niveles; el código async usa ``get_memory``/``put_memory`` en el loop y
+    ``get_disk``/``put_disk`` en un hilo.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        persist_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # SQLite va con su propio lock para que la E/S no frene el nivel en memoria
+        self._disk_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if persist_path:
+            try:
+                self._conn = sqlite3.connect(persist_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "model TEXT, query TEXT, vector BLOB, created_at REAL, "
+                    "PRIMARY KEY (model, query))"
+                )
+                self._conn.commit()
+            except Exception as e:
+                logger.warning(f"No se pudo abrir el cache persistente de embeddings: {e}")
+                self._conn = None
+
+    @property
+    def persistent(self) -> bool:
+        return self._conn is not None
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        vector = self.get_memory(model_name, query)
+        if vector is None:
+            vector = self.get_disk(model_name, query)
+        return vector
+
+    def put(self, model_name: str, query: str, vector: List[float]) -> None:
+        self.put_memory(model_name, query, vector)
+        self.put_disk(model_name, query, vector)
+
+    def get_memory(self, model_name: str, query: str) -> Optional[List[float]]:
+        """Solo el nivel en memoria; no toca SQLite (seguro dentro del event loop)."""
+        key = (model_name, normalize_query(query))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, vector = entry
+            if now - created_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            del self._entries[key]
+            return None
+
+    def get_disk(self, model_name: str, query: str) -> Optional[List[float]]:
+        """Nivel SQLite (bloqueante); un acierto se promueve a memoria. Cuenta el fallo."""
+        key = (model_name, normalize_query(query))
+        now = time.time()
+        vector = self._disk_get(key, now)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_memory(key, vector, now)
+            return vector
+
+    def put_memory(self, model_name: str, query: str, vector: List[float]) -> None:
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            self._put_memory(key, list(vector), time.time())
+
+    def put_disk(self, model_name: str, query: str, vector: List[float]) -> None:
+        """Escribe en SQLite (bloqueante); no-op sin ``persist_path``."""
+        if self._conn is None:
+            return
+        key = (model_name, normalize_query(query))
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self._disk_lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], blob, time.time()),
+                )
+                self._conn.commit()
+            except Exception as e:
+                logger.warning(f"Error escribiendo cache persistente de embeddings: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _put_memory(self, key: Tuple[str, str], vector: List[float], now: float) -> None:
+        self._entries[key] = (now, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key: Tuple[str, str], now: float) -> Optional[List[float]]:
+        if self._conn is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._conn.execute(
+                    "SELECT vector, created_at FROM embeddings WHERE model = ? AND query = ?", key
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"Error leyendo cache persistente de embeddings: {e}")
+            return None
+        if row is None or now - row[1] >= self.ttl_seconds:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
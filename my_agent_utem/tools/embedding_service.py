@@ -0,0 +1,207 @@
+"""Servicio de embeddings con micro-batching, límite de concurrencia y rate limiting."""
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .rag_lexical import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class VertexEmbeddingBackend:
+    """Backend con ``TextEmbeddingModel`` de Vertex AI (el modelo se obtiene de forma diferida)."""
+
+    def __init__(self, get_model: Callable[[], Any], name: str):
+        self._get_model = get_model
+        self.name = name
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [e.values for e in self._get_model().get_embeddings(texts)]
+
+
+class HashEmbeddingBackend:
+    """Embedder local y determinista (feature hashing de tokens y bigramas).
+
+    No tiene calidad semántica, pero textos que comparten términos quedan
+    cerca; sirve para correr y medir toda la búsqueda sin credenciales.
+    """
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+        self.name = f"local-hash-{dim}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text).tolist() for text in texts]
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = tokenize(text)
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if h >> 63 else -1.0
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else vector
+
+
+class TokenBucket:
+    """Rate limiter de requests por segundo con ráfagas de hasta ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Bloquea hasta tener ``tokens`` disponibles; retorna los segundos esperados."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class EmbeddingService:
+    """Agrupa las consultas que llegan dentro de ``window_ms`` en un solo request al backend.
+
+    Cada consulta recibe un ``Future`` con su vector. Un hilo despachador arma
+    lotes de hasta ``max_batch`` textos (sin repetidos) y los envía con a lo
+    más ``max_concurrency`` requests en vuelo; mientras todos los cupos están
+    ocupados las consultas se siguen acumulando en el siguiente lote. Con
+    ``rate_per_s`` > 0 cada request consume un token de un token bucket.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        window_ms: float = 5.0,
+        max_batch: int = 250,
+        max_concurrency: int = 4,
+        rate_per_s: float = 0.0,
+        burst: float = 0.0,
+    ):
+        self.backend = backend
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_concurrency = max(1, max_concurrency)
+        self._bucket = TokenBucket(rate_per_s, burst or rate_per_s) if rate_per_s > 0 else None
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts_sent = 0
+        self.largest_batch = 0
+        self.rate_limited_s = 0.0
+
+    def submit(self, text: str) -> "Future[List[float]]":
+        """Encola una consulta; el Future se resuelve con su embedding."""
+        future: Future = Future()
+        self._ensure_started()
+        with self._stats_lock:
+            self.requests += 1
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def embed_async(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "backend": self.backend.name,
+                "requests": self.requests,
+                "batches": self.batches,
+                "texts_sent": self.texts_sent,
+                "avg_batch": round(self.texts_sent / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "rate_limited_s": round(self.rate_limited_s, 3),
+            }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="rag-embed")
+                self._thread = threading.Thread(target=self._dispatch, name="rag-embed-batcher", daemon=True)
+                self._thread.start()
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._slots.acquire()
+            self._pool.submit(self._call, batch)
+
+    def _call(self, batch: List[Tuple[str, Future]]) -> None:
+        try:
+            # Las consultas canceladas mientras esperaban en la cola no se envían
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                return
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            if self._bucket is not None:
+                waited = self._bucket.acquire()
+                with self._stats_lock:
+                    self.rate_limited_s += waited
+            vectors = dict(zip(texts, self.backend.embed(texts)))
+            with self._stats_lock:
+                self.batches += 1
+                self.texts_sent += len(texts)
+                self.largest_batch = max(self.largest_batch, len(texts))
+        except Exception as e:
+            logger.warning(f"Error en lote de embeddings ({len(batch)} consultas): {e}")
+            for _, future in batch:
+                _settle(future, error=e)
+            return
+        finally:
+            self._slots.release()
+        for text, future in batch:
+            if text in vectors:
+                _settle(future, result=vectors[text])
+            else:
+                _settle(future, error=RuntimeError(f"El backend no retornó el embedding de: {text[:50]}"))
+
+
+def _settle(future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    """Resuelve un Future sin afectar a los demás del lote si ya estaba resuelto o cancelado."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
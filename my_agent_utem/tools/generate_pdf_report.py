@@ -4,6 +4,8 @@ from fpdf import FPDF
 from datetime import datetime
 from google.adk.tools import FunctionTool 
 
+from .rag_activities import DIMENSION_TITLES
+
 
 def limpiar_texto(texto: str) -> str:
     """Limpia y normaliza texto para el PDF."""
@@ -329,15 +331,7 @@ def generate_pdf_report(content_data: dict, report_title: str = "Reporte_Generad
         pdf.ln(3)
         
         dimensiones = content_data.get('dimensiones', {})
-        dimensiones_info = [
-            ('dim1', 'Dimensión N°I: Docencia y resultados del proceso de formación'),
-            ('dim2', 'Dimensión N°II: Gestión estratégica y recursos institucionales'),
-            ('dim3', 'Dimensión N°III: Aseguramiento interno de la calidad'),
-            ('dim4', 'Dimensión N°IV: Vinculación con el Medio'),
-            ('dim5', 'Dimensión N°V: Investigación, creación y/o innovación'),
-        ]
-        
-        for dim_key, dim_titulo in dimensiones_info:
+        for dim_key, dim_titulo in DIMENSION_TITLES.items():
             pdf.dimension_titulo(dim_titulo)
             
             dim_data = dimensiones.get(dim_key, {})
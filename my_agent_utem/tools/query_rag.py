@@ -1,11 +1,16 @@
 """Motor de búsqueda RAG para documentos UTEM."""
 from __future__ import annotations
+import asyncio
 import os
 import re
+import threading
+import time
 import numpy as np
-from typing import Any, Optional, List, Dict
+from typing import Any, Iterable, Optional, List, Dict, Set, Tuple
 import traceback
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 from google.cloud import firestore
 from vertexai.language_models import TextEmbeddingModel
@@ -13,6 +18,26 @@ from google.adk.tools import FunctionTool
 from google.auth import default
 import vertexai
 
+from .embedding_cache import EmbeddingCache
+from .rag_activities import (
+    ACTIVITIES_SUBCOLLECTION, DIMENSION_TITLES, STATUS_LABELS, ActivityCache,
+    classify_status, dimension_key, filter_activities, summarize, to_dimensiones,
+)
+from .embedding_service import EmbeddingService, HashEmbeddingBackend, VertexEmbeddingBackend
+from .rag_ann import IVFIndex
+from .rag_compact import compact_contexts, estimate_tokens
+from .rag_filters import MetadataColumns
+from .rag_index import ChunkIndex, load_snapshot, load_snapshot_matrix, save_snapshot
+from .rag_lexical import reciprocal_rank_fusion
+from .rag_metrics import AccessMetricsWriter
+from .rag_names import DocNameIndex
+from .rag_refresh import CacheSnapshot, RefreshCoordinator
+from .rag_result_cache import SemanticResultCache
+from .rag_router import DocumentRouter
+from .rag_stats import KnowledgeBaseStats
+from .rag_texts import ChunkTextCache
+from .rag_tracing import NOOP_STAGE, SearchTrace, Stage
+
 
 PROJECT_ID = os.getenv("FIRESTORE_PROJECT_ID", "muruna-utem-project")
 VERTEX_LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
@@ -20,70 +45,235 @@ DATABASE_ID = os.getenv("FIRESTORE_DATABASE_ID", "(default)")
 COLLECTION_NAME = "rag_vectores2"
 
 DEFAULT_TOP_K = 35
+DEFAULT_BATCH_TOP_K = 15
 DEFAULT_SIMILARITY_THRESHOLD = 0.45
 
+# "hybrid" (vector + BM25 con RRF), "lexical" (solo BM25, sin embedding) o "vector"
+SEARCH_MODES = ("hybrid", "lexical", "vector")
+DEFAULT_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "hybrid").lower()
+LEXICAL_ENABLED = os.getenv("RAG_LEXICAL_ENABLED", "1") == "1"
+HYBRID_CANDIDATE_FACTOR = 2
+# En "hybrid" un chunk que solo encontró BM25 debe tener coseno >= umbral × este factor
+HYBRID_LEXICAL_THRESHOLD_FACTOR = float(os.getenv("RAG_HYBRID_LEXICAL_FACTOR", "0.8"))
+
+# "compact": un solo texto sin duplicados y con chunks contiguos fusionados, dentro de max_tokens;
+# "full": lista completa de contextos (formato histórico)
+RESPONSE_MODES = ("compact", "full")
+DEFAULT_RESPONSE_MODE = os.getenv("RAG_RESPONSE_MODE", "compact").lower()
+DEFAULT_MAX_CONTEXT_TOKENS = int(os.getenv("RAG_MAX_CONTEXT_TOKENS", "6000"))
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 _db = None
 _embedding_model = None
+_embedding_model_name: Optional[str] = None
 _initialized = False
+_init_lock = threading.Lock()
 
 EMBEDDING_MODELS = ["text-multilingual-embedding-002"]
+EMBEDDING_BATCH_SIZE = 250  # Máximo de textos por request de get_embeddings
+
+_embedding_cache = EmbeddingCache(
+    max_entries=int(os.getenv("RAG_EMBED_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("RAG_EMBED_CACHE_TTL", "86400")),
+    persist_path=os.getenv("RAG_EMBED_CACHE_PATH") or None,
+)
+_disk_writes: Set[asyncio.Task] = set()  # escrituras al cache en disco en curso
 
 
 def _initialize_clients():
     """Inicializa los clientes de GCP."""
-    global _db, _embedding_model, _initialized
+    global _db, _embedding_model, _embedding_model_name, _initialized
     
     if _initialized:
         return
     
-    try:
-        # Inicializar credenciales
-        credentials, _ = default(quota_project_id=PROJECT_ID)
-        
-        # Inicializar Firestore
-        _db = firestore.Client(
-            project=PROJECT_ID, 
-            database=DATABASE_ID, 
-            credentials=credentials
-        )
-        
-        vertexai.init(project=PROJECT_ID, location=VERTEX_LOCATION, credentials=credentials)
-        
-        for model_name in EMBEDDING_MODELS:
-            try:
-                _embedding_model = TextEmbeddingModel.from_pretrained(model_name)
-                logger.info(f"✓ Modelo de embeddings cargado: {model_name}")
-                break
-            except Exception as e:
-                logger.warning(f"No se pudo cargar {model_name}: {e}")
-                continue
-        
-        if _embedding_model is None:
-            raise RuntimeError("No se pudo cargar ningún modelo de embeddings")
+    # Un solo hilo inicializa; los demás esperan y encuentran _initialized en True
+    with _init_lock:
+        if _initialized:
+            return
         
-        _initialized = True
-        logger.info("✓ Clientes GCP inicializados correctamente")
-        
-    except Exception as e:
-        logger.error(f"Error inicializando clientes GCP: {e}")
-        raise
+        try:
+            # Inicializar credenciales
+            credentials, _ = default(quota_project_id=PROJECT_ID)
+            
+            # Inicializar Firestore (salvo que configure_clients haya inyectado uno)
+            if _db is None:
+                _db = firestore.Client(
+                    project=PROJECT_ID, 
+                    database=DATABASE_ID, 
+                    credentials=credentials
+                )
+            
+            vertexai.init(project=PROJECT_ID, location=VERTEX_LOCATION, credentials=credentials)
+            
+            for model_name in EMBEDDING_MODELS:
+                try:
+                    _embedding_model = TextEmbeddingModel.from_pretrained(model_name)
+                    _embedding_model_name = model_name
+                    logger.info(f"✓ Modelo de embeddings cargado: {model_name}")
+                    break
+                except Exception as e:
+                    logger.warning(f"No se pudo cargar {model_name}: {e}")
+                    continue
+            
+            if _embedding_model is None:
+                raise RuntimeError("No se pudo cargar ningún modelo de embeddings")
+            
+            _initialized = True
+            logger.info("✓ Clientes GCP inicializados correctamente")
+            
+        except Exception as e:
+            logger.error(f"Error inicializando clientes GCP: {e}")
+            raise
 
 
 def get_db():
     """Obtiene el cliente de Firestore (inicializa si es necesario)."""
-    _initialize_clients()
+    if _db is None:
+        _initialize_clients()
     return _db
 
 
+_async_db = None
+_async_db_loop = None
+_async_db_override = None
+
+
+def get_async_db():
+    """Cliente asíncrono de Firestore ligado al event loop actual."""
+    global _async_db, _async_db_loop
+    
+    if _async_db_override is not None:
+        return _async_db_override
+    loop = asyncio.get_running_loop()
+    if _async_db is None or _async_db_loop is not loop:
+        credentials, _ = default(quota_project_id=PROJECT_ID)
+        _async_db = firestore.AsyncClient(
+            project=PROJECT_ID,
+            database=DATABASE_ID,
+            credentials=credentials
+        )
+        _async_db_loop = loop
+    return _async_db
+
+
 def get_embedding_model():
     """Obtiene el modelo de embeddings (inicializa si es necesario)."""
-    _initialize_clients()
+    if _embedding_model is None:
+        _initialize_clients()
     return _embedding_model
 
 
+# Backend de embeddings: "vertex" (TextEmbeddingModel) o "hash" (local y determinista, sin credenciales)
+EMBED_BACKEND = os.getenv("RAG_EMBED_BACKEND", "vertex").lower()
+
+
+def _default_embedding_backend():
+    if EMBED_BACKEND == "hash":
+        return HashEmbeddingBackend(int(os.getenv("RAG_HASH_EMBED_DIM", "768")))
+    return VertexEmbeddingBackend(get_embedding_model, EMBEDDING_MODELS[0])
+
+
+_embedding_service = EmbeddingService(
+    _default_embedding_backend(),
+    window_ms=float(os.getenv("RAG_EMBED_BATCH_WINDOW_MS", "5")),
+    max_batch=EMBEDDING_BATCH_SIZE,
+    max_concurrency=int(os.getenv("RAG_EMBED_MAX_CONCURRENCY", "4")),
+    rate_per_s=float(os.getenv("RAG_EMBED_RATE_PER_S", "0")),
+    burst=float(os.getenv("RAG_EMBED_BURST", "0")),
+)
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Servicio compartido que agrupa las consultas concurrentes en requests por lote."""
+    return _embedding_service
+
+
+def set_embedding_backend(backend) -> None:
+    """Reemplaza el backend de embeddings (p. ej. HashEmbeddingBackend para pruebas offline)."""
+    _embedding_service.backend = backend
+
+
+def configure_clients(db=None, async_db=None, embedding_backend=None) -> None:
+    """Inyecta clientes ya construidos en lugar de los de GCP.
+
+    Sirve para el emulador de Firestore, el Firestore en memoria de
+    ``benchmarks`` o un backend de embeddings local. ``async_db`` reemplaza al
+    cliente por event loop, así que debe poder usarse desde el loop de las búsquedas.
+    """
+    global _db, _async_db_override
+    if db is not None:
+        _db = db
+    if async_db is not None:
+        _async_db_override = async_db
+    if embedding_backend is not None:
+        set_embedding_backend(embedding_backend)
+
+
+def _query_embedding(query: str) -> Tuple[List[float], bool]:
+    """(embedding, acierto_de_cache) de una consulta."""
+    model_name = _embedding_service.backend.name
+    cached = _embedding_cache.get(model_name, query)
+    if cached is not None:
+        return cached, True
+    vector = _embedding_service.embed(query)
+    _embedding_cache.put(model_name, query, vector)
+    return vector, False
+
+
+async def _query_embedding_async(query: str) -> Tuple[List[float], bool]:
+    # En el loop solo se toca el nivel en memoria; SQLite se lee en un hilo y
+    # se escribe en segundo plano sin hacer esperar a la búsqueda.
+    model_name = _embedding_service.backend.name
+    cached = _embedding_cache.get_memory(model_name, query)
+    if cached is None and _embedding_cache.persistent:
+        cached = await asyncio.to_thread(_embedding_cache.get_disk, model_name, query)
+    elif cached is None:
+        cached = _embedding_cache.get_disk(model_name, query)  # sin disco: solo cuenta el fallo
+    if cached is not None:
+        return cached, True
+    vector = await _embedding_service.embed_async(query)
+    _embedding_cache.put_memory(model_name, query, vector)
+    if _embedding_cache.persistent:
+        _background_disk_write(model_name, query, vector)
+    return vector, False
+
+
+def _background_disk_write(model_name: str, query: str, vector: List[float]) -> None:
+    task = asyncio.create_task(asyncio.to_thread(_embedding_cache.put_disk, model_name, query, vector))
+    _disk_writes.add(task)
+    task.add_done_callback(_disk_writes.discard)
+
+
+def get_query_embedding(query: str) -> List[float]:
+    """Embedding de una consulta, usando el cache LRU (y el nivel en disco si está configurado)."""
+    return _query_embedding(query)[0]
+
+
+async def get_query_embedding_async(query: str) -> List[float]:
+    """Versión no bloqueante de get_query_embedding."""
+    return (await _query_embedding_async(query))[0]
+
+
+def get_query_embeddings(queries: List[str]) -> List[List[float]]:
+    """Embeddings de varias consultas; las que no están en cache se piden juntas al servicio."""
+    model_name = _embedding_service.backend.name
+    vectors: List[Optional[List[float]]] = [
+        _embedding_cache.get(model_name, q) for q in queries
+    ]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    for i, vector in zip(missing, _embedding_service.embed_many([queries[i] for i in missing])):
+        vectors[i] = vector
+        _embedding_cache.put(model_name, queries[i], vector)
+    return vectors
+
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    """Contadores de aciertos/fallos del cache de embeddings de consultas."""
+    return {**_embedding_cache.stats(), "service": _embedding_service.stats()}
+
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """Calcula similitud coseno entre dos vectores usando numpy optimizado."""
@@ -106,190 +296,1399 @@ def normalize_doc_name(name: str) -> str:
     return name.strip()
 
 
-_docs_cache: Dict[str, Any] = {}
-_cache_timestamp: float = 0
-CACHE_TTL_SECONDS = 300
+# Metadata e índice vigentes; se reemplaza completo en cada recarga (ver _publish_snapshot)
+_snapshot = CacheSnapshot({}, ChunkIndex.empty())
+_snapshot_load_lock = threading.Lock()
+CACHE_TTL_SECONDS = int(os.getenv("RAG_CACHE_TTL_SECONDS", "300"))
+# Pasado el TTL se sigue sirviendo el snapshot anterior mientras una sola recarga corre en
+# segundo plano; con edad mayor a este límite las búsquedas la esperan (0 = sin límite)
+CACHE_MAX_STALE_SECONDS = float(os.getenv("RAG_CACHE_MAX_STALE_SECONDS", "0"))
+CACHE_RETRY_SECONDS = float(os.getenv("RAG_CACHE_RETRY_SECONDS", "30"))
+
+# "listener": sincronización incremental con on_snapshot; "ttl": recarga cada CACHE_TTL_SECONDS
+# (una sola a la vez, releyendo solo los chunks de los documentos que cambiaron)
+SYNC_MODE = os.getenv("RAG_SYNC_MODE", "listener").lower()
+SYNC_READY_TIMEOUT_SECONDS = 30
+# En modo listener, edad máxima del snapshot sin deltas antes de verificarlo con una recarga
+# por TTL (0 = sin límite; en la práctica no menor que RAG_CACHE_TTL_SECONDS); si el stream
+# del listener se cierra se recarga por TTL hasta reiniciarlo
+SYNC_MAX_AGE_SECONDS = float(os.getenv("RAG_SYNC_MAX_AGE_SECONDS", "900"))
+WATERMARK_FIELDS = ("updated_at", "indexed_at")
+
+# Lectura de chunks: "parallel" (subcolecciones en paralelo) o "collection_group" (una sola consulta)
+CHUNK_FETCH_MODE = os.getenv("RAG_CHUNK_FETCH", "parallel").lower()
+CHUNK_FETCH_WORKERS = int(os.getenv("RAG_CHUNK_FETCH_WORKERS", "8"))
+
+# Motor aproximado opcional: "" = búsqueda exacta, "ivf" = listas invertidas k-means
+ANN_ENGINE = os.getenv("RAG_ANN_ENGINE", "").lower()
+ANN_MIN_CHUNKS = int(os.getenv("RAG_ANN_MIN_CHUNKS", "200000"))
+IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "0"))  # 0 = automático (4·√N)
+IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+
+# Búsqueda en dos etapas para consultas sin filtros: centroides por documento eligen los
+# DOC_FANOUT documentos más cercanos y solo se evalúan sus chunks (0 = recorrer todo el corpus)
+DOC_FANOUT = int(os.getenv("RAG_DOC_FANOUT", "0"))
+DOC_CENTROIDS = int(os.getenv("RAG_DOC_CENTROIDS", "1"))  # centroides por documento
+
+# Almacenamiento de la primera pasada: "float32" (exacto), "float16" o "int8" con re-evaluación float32
+INDEX_STORAGE = os.getenv("RAG_INDEX_STORAGE", "float32").lower()
+RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "4"))
+
+# Directorio del snapshot en disco del índice (vacío = deshabilitado)
+SNAPSHOT_DIR = os.getenv("RAG_INDEX_SNAPSHOT_DIR", "")
+
+# Texto bajo demanda: el índice residente guarda solo vectores e ids y el texto
+# de los ganadores se lee con proyección de campos, pasando por una cache LRU
+LAZY_CHUNK_TEXT = os.getenv("RAG_LAZY_CHUNK_TEXT", "1") == "1"
+TEXT_CACHE_MAX_CHARS = int(os.getenv("RAG_TEXT_CACHE_CHARS", "20000000"))
+
+_text_cache = ChunkTextCache(TEXT_CACHE_MAX_CHARS)
+
+# Cache semántico de respuestas (0 MB = deshabilitado); se invalida cuando avanza la versión del snapshot
+_result_cache = SemanticResultCache(
+    max_bytes=int(float(os.getenv("RAG_RESULT_CACHE_MB", "64")) * 1024 * 1024),
+    similarity=float(os.getenv("RAG_RESULT_CACHE_SIMILARITY", "0.97")),
+)
+
+
+def get_cache_snapshot() -> CacheSnapshot:
+    """Snapshot vigente de metadata e índice, sin recargar."""
+    return _snapshot
+
+
+def _publish_snapshot(docs: Dict[str, Any], index: ChunkIndex) -> CacheSnapshot:
+    """Reemplaza el snapshot de una vez; se llama con _sync_lock tomado.
+    
+    Si ``docs`` e ``index`` son los mismos objetos publicados, solo se renueva
+    ``loaded_at`` y la versión no avanza.
+    """
+    global _snapshot
+    
+    unchanged = docs is _snapshot.docs and index is _snapshot.index
+    _snapshot = CacheSnapshot(docs, index, time.time(), _snapshot.version + (0 if unchanged else 1))
+    return _snapshot
+
+
+def _ensure_snapshot(force_refresh: bool = False) -> CacheSnapshot:
+    """Snapshot al día: listener incremental o recarga coordinada por TTL."""
+    if not force_refresh and not _snapshot.loaded_at and SNAPSHOT_DIR:
+        with _snapshot_load_lock:
+            if not _snapshot.loaded_at:
+                load_index_snapshot()
+    
+    if not force_refresh and SYNC_MODE == "listener" and _ensure_sync_listener():
+        if not _listener_snapshot_expired():
+            return _snapshot
+        # Sin deltas hace mucho: se verifica con una recarga en segundo plano
+        _refresher.ensure()
+        return _snapshot
+    
+    _refresher.ensure(force_refresh)
+    return _snapshot
 
 
 def get_documents_metadata(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """Obtiene metadata de todos los documentos con cache."""
-    import time
-    global _docs_cache, _cache_timestamp
+    return list(_ensure_snapshot(force_refresh).docs.values())
+
+
+async def get_documents_metadata_async(force_refresh: bool = False) -> List[Dict[str, Any]]:
+    """Como get_documents_metadata; solo se espera (en un hilo) si no hay snapshot o se fuerza la recarga."""
+    if SYNC_MODE == "listener" and not _sync_failed:
+        if not force_refresh and _listener_active() and not _listener_snapshot_expired():
+            return list(_snapshot.docs.values())
+        return await asyncio.to_thread(get_documents_metadata, force_refresh)
+    
+    if not force_refresh and not _snapshot.loaded_at and SNAPSHOT_DIR:
+        return await asyncio.to_thread(get_documents_metadata, force_refresh)
+    
+    await _refresher.ensure_async(force_refresh)
+    return list(_snapshot.docs.values())
+
+
+def _stream_documents() -> Dict[str, Dict[str, Any]]:
+    """Lee la metadata de todos los documentos de la colección."""
+    docs = {}
+    for doc in get_db().collection(COLLECTION_NAME).stream():
+        doc_data = doc.to_dict()
+        doc_data['_firestore_id'] = doc.id
+        docs[doc.id] = doc_data
+    return docs
+
+
+def _refresh_snapshot() -> None:
+    """Recarga por TTL (la ejecuta _refresher, una a la vez).
+    
+    Relee la metadata y actualiza el índice con _apply_document_changes: solo
+    se releen los chunks de los documentos nuevos o cuya marca de agua cambió.
+    """
+    docs = _stream_documents()
+    logger.info(f"Cache de documentos actualizado: {len(docs)} docs")
+    removed = [doc_id for doc_id in _snapshot.docs if doc_id not in docs]
+    _apply_document_changes(docs, removed)
+
+
+_refresher = RefreshCoordinator(
+    _refresh_snapshot,
+    lambda: _snapshot.loaded_at,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    max_stale_seconds=CACHE_MAX_STALE_SECONDS,
+    retry_seconds=CACHE_RETRY_SECONDS,
+)
+
+
+def _chunk_fields() -> List[str]:
+    """Campos de los chunks a leer al indexar; el texto solo si se guarda o alimenta BM25."""
+    fields = ["chunk_id", "chunk_index", "embedding"]
+    if not LAZY_CHUNK_TEXT or LEXICAL_ENABLED:
+        fields.append("text")
+    return fields
+
+
+def _chunk_record(doc_id: str, chunk_doc) -> Optional[Dict[str, Any]]:
+    chunk_data = chunk_doc.to_dict()
+    if "embedding" not in chunk_data or ("text" not in chunk_data and "text" in _chunk_fields()):
+        return None
+    return {
+        "doc_id": doc_id,
+        "chunk_id": chunk_data.get("chunk_id", chunk_doc.id),
+        "chunk_index": chunk_data.get("chunk_index", 0),
+        "text": chunk_data.get("text", ""),
+        "embedding": chunk_data["embedding"],
+    }
+
+
+def _fetch_document_chunks(doc_id: str) -> List[Dict[str, Any]]:
+    """Lee la subcolección de chunks de un documento."""
+    chunks_ref = get_db().collection(COLLECTION_NAME).document(doc_id).collection("chunks")
+    records = (_chunk_record(doc_id, chunk_doc) for chunk_doc in chunks_ref.select(_chunk_fields()).stream())
+    return [r for r in records if r is not None]
+
+
+def _load_chunk_records(doc_ids: List[str]):
+    """Lee los chunks de los documentos indicados desde Firestore.
+    
+    Con RAG_CHUNK_FETCH=collection_group se usa una sola consulta sobre todas las
+    subcolecciones "chunks" (filtrando las de otras colecciones); si no, se leen
+    las subcolecciones en paralelo con a lo más CHUNK_FETCH_WORKERS streams.
+    """
+    wanted = set(doc_ids)
+    if not wanted:
+        return
     
-    current_time = time.time()
-    if not force_refresh and _docs_cache and (current_time - _cache_timestamp) < CACHE_TTL_SECONDS:
-        return list(_docs_cache.values())
+    if CHUNK_FETCH_MODE == "collection_group":
+        for chunk_doc in get_db().collection_group("chunks").select(_chunk_fields()).stream():
+            parent = chunk_doc.reference.parent.parent
+            if parent is None or parent.parent.id != COLLECTION_NAME or parent.id not in wanted:
+                continue
+            record = _chunk_record(parent.id, chunk_doc)
+            if record is not None:
+                yield record
+        return
     
+    workers = min(CHUNK_FETCH_WORKERS, len(wanted))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-chunks") as pool:
+        for records in pool.map(_fetch_document_chunks, sorted(wanted)):
+            yield from records
+
+
+def get_chunk_index(force_refresh: bool = False) -> ChunkIndex:
+    """Obtiene el índice vectorial residente, publicado junto con la metadata."""
+    return _ensure_snapshot(force_refresh).index
+
+
+def _build_snapshot(docs: Dict[str, Dict[str, Any]]) -> None:
+    """Construye el índice completo de ``docs`` y lo publica junto con la metadata."""
+    index = ChunkIndex.build(_load_chunk_records(list(docs.keys())))
+    _attach_ann(index)
+    _attach_router(index)
+    _quantize(index)
+    _attach_lexical(index)
+    _release_texts(index)
+    with _sync_lock:
+        snapshot = _publish_snapshot(docs, index)
+    _text_cache.clear()
+    logger.info(f"Índice vectorial actualizado: {len(index)} chunks, dim={index.dim}")
+    _persist_index(snapshot)
+
+
+def _persist_index(snapshot: CacheSnapshot) -> None:
+    """Guarda el snapshot en disco y deja su matriz como memmap de ese archivo.
+    
+    Así los workers comparten las páginas de la matriz por el page cache y, con
+    almacenamiento cuantizado, la matriz float32 queda en disco y solo se leen
+    las filas que se re-evalúan. Se llama fuera de _sync_lock tras publicar un
+    índice nuevo; la matriz mapeada tiene los mismos valores que la reemplazada.
+    """
+    if not SNAPSHOT_DIR:
+        if INDEX_STORAGE != "float32":
+            logger.warning("RAG_INDEX_STORAGE cuantizado sin RAG_INDEX_SNAPSHOT_DIR: la matriz float32 sigue en memoria")
+        return
+    saved = _save_snapshot(snapshot, SNAPSHOT_DIR)
+    if not saved["ok"]:
+        return
+    matrix = load_snapshot_matrix(SNAPSHOT_DIR, saved["version"])
+    if matrix.shape == snapshot.index.matrix.shape:
+        snapshot.index.matrix = matrix
+
+
+def _attach_ann(index: ChunkIndex) -> None:
+    """Construye el índice aproximado configurado si el corpus supera ANN_MIN_CHUNKS."""
+    if ANN_ENGINE != "ivf" or len(index) < ANN_MIN_CHUNKS:
+        return
+    start = time.time()
+    index.ann = IVFIndex.build(index.matrix, n_lists=IVF_NLIST, nprobe=IVF_NPROBE)
+    logger.info(
+        f"Índice IVF construido: {index.ann.n_lists} listas, nprobe={IVF_NPROBE} "
+        f"({time.time() - start:.1f}s)"
+    )
+
+
+def _attach_router(index: ChunkIndex) -> None:
+    """Construye (o ajusta, si vino del snapshot) los centroides por documento según RAG_DOC_FANOUT."""
+    if DOC_FANOUT <= 0 or len(index) == 0:
+        index.router = None
+        return
+    if index.router is not None and index.router.per_doc == DOC_CENTROIDS:
+        index.router.fanout = DOC_FANOUT
+        return
+    start = time.time()
+    index.router = DocumentRouter.build(index.matrix, index.doc_ids, fanout=DOC_FANOUT, per_doc=DOC_CENTROIDS)
+    logger.info(
+        f"Centroides por documento: {index.router.n_docs} documentos, "
+        f"fanout={DOC_FANOUT} ({time.time() - start:.1f}s)"
+    )
+
+
+def _attach_lexical(index: ChunkIndex) -> None:
+    """Construye el índice BM25 sobre el texto de los chunks (RAG_LEXICAL_ENABLED)."""
+    if not LEXICAL_ENABLED or len(index) == 0 or index.lexical is not None:
+        return
+    if index.texts is None:
+        logger.warning("Índice sin texto en memoria: no se puede construir BM25")
+        return
+    start = time.time()
+    index.build_lexical()
+    logger.info(
+        f"Índice léxico BM25 construido: {index.lexical.n_terms} términos "
+        f"({time.time() - start:.1f}s)"
+    )
+
+
+def _release_texts(index: ChunkIndex) -> None:
+    """Con RAG_LAZY_CHUNK_TEXT descarta el texto residente una vez construido BM25."""
+    if LAZY_CHUNK_TEXT:
+        index.release_texts()
+
+
+def _quantize(index: ChunkIndex) -> None:
+    """Aplica el almacenamiento cuantizado configurado en RAG_INDEX_STORAGE."""
+    if INDEX_STORAGE == "float32" or len(index) == 0:
+        return
+    index.quantize(INDEX_STORAGE, RESCORE_FACTOR)
+    logger.info(
+        f"Índice cuantizado a {INDEX_STORAGE}: {index.resident_bytes / 1e6:.1f} MB "
+        f"(float32: {index.matrix.nbytes / 1e6:.1f} MB)"
+    )
+
+
+def save_index_snapshot(path: Optional[str] = None) -> Dict[str, Any]:
+    """Escribe el índice y la metadata actuales como snapshot versionado en disco."""
+    root = path or SNAPSHOT_DIR
+    if not root:
+        return {"ok": False, "error": "RAG_INDEX_SNAPSHOT_DIR no está configurado"}
+    return _save_snapshot(_snapshot, root)
+
+
+def _save_snapshot(snapshot: CacheSnapshot, root: str) -> Dict[str, Any]:
     try:
-        db = get_db()
-        docs_ref = db.collection(COLLECTION_NAME)
-        all_docs = list(docs_ref.stream())
+        docs, index = snapshot.docs, snapshot.index
+        version = save_snapshot(index, root, docs, extra={"embedding_model": _embedding_service.backend.name})
+        logger.info(f"Snapshot del índice guardado: {root}/{version} ({len(index)} chunks)")
+        return {"ok": True, "version": version, "chunks": len(index), "documents": len(docs)}
+    except Exception as e:
+        logger.warning(f"Error guardando snapshot del índice: {e}")
+        return {"ok": False, "error": str(e)}
+
+
+def load_index_snapshot(path: Optional[str] = None) -> bool:
+    """Carga el snapshot en disco para arrancar sin leer todo el corpus desde Firestore."""
+    root = path or SNAPSHOT_DIR
+    if not root:
+        return False
+    try:
+        loaded = load_snapshot(root)
+        if loaded is None:
+            return False
+        index, manifest = loaded
+        if manifest.get("embedding_model") != _embedding_service.backend.name:
+            logger.warning(f"Snapshot generado con otro modelo ({manifest.get('embedding_model')}), se ignora")
+            return False
+        _attach_router(index)
+        _quantize(index)
+        _attach_lexical(index)
+        _release_texts(index)
+        
+        with _sync_lock:
+            _publish_snapshot(manifest["docs"], index)
+        _text_cache.clear()
+        logger.info(f"✓ Snapshot del índice cargado: {manifest['version']} ({len(index)} chunks)")
+        return True
+    except Exception as e:
+        logger.warning(f"Error cargando snapshot del índice: {e}")
+        return False
+
+
+_sync_lock = threading.Lock()  # serializa las publicaciones del snapshot
+_sync_start_lock = threading.Lock()
+_sync_ready = threading.Event()
+_sync_watch = None
+_sync_failed = False
+_sync_watermark = None
+_sync_retry_at = 0.0
+
+
+def _doc_watermark(doc_data: Dict[str, Any]) -> Optional[str]:
+    """Marca de agua de indexación de un documento (None si no la tiene).
+    
+    Se normaliza a texto ISO para poder compararla con la metadata de un snapshot en disco.
+    """
+    for field in WATERMARK_FIELDS:
+        value = doc_data.get(field)
+        if value is not None:
+            return value.isoformat() if hasattr(value, "isoformat") else str(value)
+    return None
+
+
+def _changed_documents(current: CacheSnapshot, upserts: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Documentos de ``upserts`` cuyos chunks hay que releer.
+    
+    Con marca de agua en ambas versiones se comparan las marcas. Los documentos
+    anteriores a la marca de agua no la tienen: se releen solo si cambió su
+    metadata y su ``total_chunks`` (si lo tienen) no coincide con las filas
+    indexadas, para no volver a leerlos en cada recarga.
+    """
+    reload_ids = []
+    indexed_rows: Optional[Counter] = None
+    for doc_id, doc_data in upserts.items():
+        previous = current.docs.get(doc_id)
+        if previous is None:
+            reload_ids.append(doc_id)
+            continue
+        watermark, previous_watermark = _doc_watermark(doc_data), _doc_watermark(previous)
+        if watermark is not None and previous_watermark is not None:
+            if watermark != previous_watermark:
+                reload_ids.append(doc_id)
+            continue
+        if watermark != previous_watermark:
+            # Recién recibió marca de agua: fue re-indexado
+            reload_ids.append(doc_id)
+        elif _strip_internal(doc_data) == _strip_internal(previous):
+            continue
+        elif doc_data.get("total_chunks") is not None:
+            if indexed_rows is None:
+                indexed_rows = Counter(current.index.doc_ids.tolist())
+            if int(doc_data["total_chunks"]) != indexed_rows.get(doc_id, 0):
+                reload_ids.append(doc_id)
+        else:
+            reload_ids.append(doc_id)
+    return reload_ids
+
+
+def _strip_internal(doc_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in doc_data.items() if not k.startswith("_")}
+
+
+def _apply_document_changes(upserts: Dict[str, Dict[str, Any]], removed: List[str]) -> None:
+    """Aplica al cache y al índice solo los documentos agregados, modificados o eliminados.
+    
+    Corre serializada por _refresher (recargas y deltas del listener no se
+    solapan). La lectura de chunks y el armado del índice ocurren sin
+    _sync_lock; el lock solo se toma para publicar el snapshot nuevo.
+    """
+    global _kb_stats, _kb_stats_source
+    
+    if len(_snapshot.index) == 0:
+        # Carga inicial: build completo, con ANN, cuantización y BM25
+        docs = {doc_id: d for doc_id, d in _snapshot.docs.items() if doc_id not in removed}
+        docs.update(upserts)
+        _build_snapshot(docs)
+        return
+    
+    while True:
+        current = _snapshot
+        reload_ids = _changed_documents(current, upserts)
+        removed_ids = [doc_id for doc_id in removed if doc_id in current.docs]
+        
+        if reload_ids or removed_ids:
+            records = list(_load_chunk_records(reload_ids)) if reload_ids else []
+            index = current.index.replace_documents(reload_ids + removed_ids, records)
+            _release_texts(index)
+        else:
+            # Sin chunks que cambien (p. ej. recarga por TTL sin novedades): se reutiliza el índice
+            index = current.index
+        
+        if removed_ids or any(current.docs.get(doc_id) != d for doc_id, d in upserts.items()):
+            docs = dict(current.docs)
+            for doc_id in removed_ids:
+                docs.pop(doc_id, None)
+            docs.update(upserts)
+        else:
+            docs = current.docs
+        
+        with _sync_lock:
+            if _snapshot is not current:
+                # Se publicó otro snapshot mientras se leían los chunks (p. ej. el de disco): rehacer sobre él
+                continue
+            _text_cache.invalidate_docs(reload_ids + removed_ids)
+            if _kb_stats_source is current.docs and docs is not current.docs:
+                _kb_stats = _kb_stats.apply(current.docs, upserts, removed_ids)
+                _kb_stats_source = docs
+            published = _publish_snapshot(docs, index)
+            break
+    
+    if index is not current.index:
+        _persist_index(published)
+    
+    logger.info(
+        f"Sincronización incremental: {len(upserts)} doc(s) actualizados "
+        f"({len(reload_ids)} con chunks recargados), {len(removed_ids)} eliminados, "
+        f"índice={len(index)} chunks"
+    )
+
+
+def _on_collection_snapshot(col_snapshot, changes, read_time) -> None:
+    """Callback de on_snapshot: traduce los cambios de Firestore a deltas del cache."""
+    global _sync_watermark
+    
+    try:
+        upserts: Dict[str, Dict[str, Any]] = {}
+        removed: List[str] = []
+        for change in changes:
+            doc = change.document
+            if change.type.name == "REMOVED":
+                removed.append(doc.id)
+                upserts.pop(doc.id, None)
+            else:
+                doc_data = doc.to_dict() or {}
+                doc_data['_firestore_id'] = doc.id
+                upserts[doc.id] = doc_data
         
-        _docs_cache = {}
-        for doc in all_docs:
-            doc_data = doc.to_dict()
-            doc_data['_firestore_id'] = doc.id
-            _docs_cache[doc.id] = doc_data
+        if not _sync_ready.is_set():
+            # Snapshot inicial (también al reiniciar): trae la colección completa,
+            # así que lo que no viene se eliminó mientras el listener no corría
+            removed.extend(doc_id for doc_id in _snapshot.docs if doc_id not in upserts)
         
-        _cache_timestamp = current_time
-        logger.info(f"Cache de documentos actualizado: {len(_docs_cache)} docs")
-        return list(_docs_cache.values())
+        if upserts or removed or not _sync_ready.is_set():
+            # Por el coordinador: no se solapa con una recarga forzada
+            _refresher.run_exclusive(_apply_document_changes, upserts, removed)
+        _sync_watermark = read_time
     except Exception as e:
-        logger.error(f"Error obteniendo documentos: {e}")
-        return list(_docs_cache.values()) if _docs_cache else []
+        logger.error(f"Error aplicando cambios incrementales: {e}")
+    finally:
+        _sync_ready.set()
+
+
+def _ensure_sync_listener() -> bool:
+    """Inicia (o reinicia) el listener de la colección; retorna False si hay que usar el modo TTL.
+    
+    Si el stream se cerró (error o desconexión) se descarta y se usa la recarga
+    por TTL; el reinicio se intenta pasados CACHE_RETRY_SECONDS. Mientras un
+    reinicio entrega su snapshot inicial se sigue con el snapshot vigente.
+    """
+    global _sync_watch, _sync_failed, _sync_retry_at
+    
+    if _sync_failed:
+        return False
+    
+    if _sync_watch is not None and _sync_ready.is_set() and not _listener_active():
+        logger.warning("⚠️ El listener se cerró, se usa recarga por TTL hasta reiniciarlo")
+        stop_sync_listener()
+        _sync_retry_at = time.time() + CACHE_RETRY_SECONDS
+    
+    if _sync_watch is None:
+        if time.time() < _sync_retry_at:
+            return False
+        with _sync_start_lock:
+            if _sync_watch is None:
+                try:
+                    _sync_watch = get_db().collection(COLLECTION_NAME).on_snapshot(_on_collection_snapshot)
+                    logger.info("✓ Listener de sincronización incremental iniciado")
+                except Exception as e:
+                    logger.warning(f"No se pudo iniciar el listener, se usa recarga por TTL: {e}")
+                    _sync_failed = True
+                    return False
+    
+    if _snapshot.loaded_at and not _sync_ready.is_set():
+        return False
+    if not _sync_ready.wait(SYNC_READY_TIMEOUT_SECONDS):
+        logger.warning("El listener no entregó el snapshot inicial, se usa recarga por TTL")
+        return False
+    return True
+
+
+def _listener_active() -> bool:
+    """True si el listener entregó su snapshot inicial y su stream sigue abierto."""
+    watch = _sync_watch
+    return watch is not None and _sync_ready.is_set() and getattr(watch, "is_active", True)
+
+
+def _listener_snapshot_expired() -> bool:
+    """True si el snapshot lleva más de SYNC_MAX_AGE_SECONDS sin deltas ni recargas."""
+    age = _snapshot.age()
+    return SYNC_MAX_AGE_SECONDS > 0 and age is not None and age > SYNC_MAX_AGE_SECONDS
+
+
+def stop_sync_listener() -> None:
+    """Detiene el listener de sincronización incremental."""
+    global _sync_watch
+    
+    if _sync_watch is not None:
+        try:
+            _sync_watch.unsubscribe()
+        except Exception as e:
+            logger.warning(f"Error deteniendo el listener: {e}")
+        _sync_watch = None
+        _sync_ready.clear()
+
+
+_kb_stats = KnowledgeBaseStats()
+_kb_stats_source: Optional[Dict[str, Any]] = None
 
 
+def get_kb_stats(recompute: bool = False) -> KnowledgeBaseStats:
+    """Estadísticas de la colección; se recalculan solo si cambió el cache completo o se pide.
+    
+    Los cambios del listener se aplican como delta en _apply_document_changes.
+    """
+    global _kb_stats, _kb_stats_source
+    
+    docs = _snapshot.docs
+    if recompute or _kb_stats_source is not docs:
+        _kb_stats = KnowledgeBaseStats.from_docs(docs.values())
+        _kb_stats_source = docs
+    return _kb_stats
+
+
+_name_index: Optional[DocNameIndex] = None
+_name_index_source: Optional[Dict[str, Any]] = None
+
+
+def get_doc_name_index(docs: Optional[Dict[str, Any]] = None) -> DocNameIndex:
+    """Índice de nombres de documentos; se reconstruye solo cuando cambia el cache de metadata."""
+    global _name_index, _name_index_source
+    
+    docs = _snapshot.docs if docs is None else docs
+    if _name_index is None or _name_index_source is not docs:
+        _name_index = DocNameIndex(docs, normalize_doc_name)
+        _name_index_source = docs
+    return _name_index
+
+
+_metadata_columns: Optional[MetadataColumns] = None
+_metadata_columns_source: Tuple[Any, Any] = (None, None)
+
+
+def get_metadata_columns(index: ChunkIndex, docs: Optional[Dict[str, Any]] = None) -> MetadataColumns:
+    """Columnas de metadata alineadas con el índice; se reconstruyen si cambia el índice o la metadata."""
+    global _metadata_columns, _metadata_columns_source
+    
+    docs = _snapshot.docs if docs is None else docs
+    source = _metadata_columns_source
+    if _metadata_columns is None or source[0] is not index or source[1] is not docs:
+        _metadata_columns = MetadataColumns(docs, index.doc_ids)
+        _metadata_columns_source = (index, docs)
+    return _metadata_columns
+
+
+def _metadata_filters(
+    file_type: Optional[str] = None,
+    year: Optional[int] = None,
+    career: Optional[str] = None,
+    faculty: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Filtros de metadata informados (se omiten los vacíos)."""
+    filters = {
+        "file_type": file_type, "year": year, "career": career,
+        "faculty": faculty, "date_from": date_from, "date_to": date_to,
+    }
+    return {k: v for k, v in filters.items() if v not in (None, "", 0)}
+
+
+def _resolve_target_docs(
+    document_name: Optional[str], docs: Dict[str, Dict[str, Any]]
+) -> Tuple[List[str], Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Resuelve el filtro por nombre de documento.
+    
+    Retorna (doc_ids, respuesta_de_error, candidatos_rankeados); los candidatos
+    solo se informan cuando la coincidencia es ambigua.
+    """
+    if not document_name:
+        return [d['_firestore_id'] for d in docs.values()], None, []
+    
+    target_doc_ids, candidates = get_doc_name_index(docs).resolve(document_name)
+    
+    if not target_doc_ids:
+        if candidates:
+            message = f"Documentos más parecidos: {[c['doc_name'] for c in candidates]}"
+        else:
+            message = f"Documentos disponibles: {[d.get('doc_name', 'Unknown') for d in docs.values()]}"
+        return [], {
+            "ok": False, 
+            "status": f"Documento no encontrado: '{document_name}'",
+            "message": message,
+            "document_candidates": candidates
+        }, []
+    return target_doc_ids, None, candidates if len(target_doc_ids) > 1 else []
+
+
+def _effective_mode(mode: str, index: ChunkIndex) -> str:
+    mode = (mode or DEFAULT_SEARCH_MODE).lower()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode debe ser uno de {SEARCH_MODES}")
+    if mode != "vector" and index.lexical is None:
+        logger.warning("Índice léxico no disponible, se usa búsqueda vectorial")
+        return "vector"
+    return mode
+
+
+def _fuse_hits(
+    index: ChunkIndex,
+    query: str,
+    query_vector: List[float],
+    vector_hit: Tuple[np.ndarray, np.ndarray, int],
+    top_k: int,
+    similarity_threshold: float,
+    mask: Optional[np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Fusiona (RRF) el resultado vectorial con el BM25 de la misma consulta.
+
+    Los chunks que solo trae BM25 pasan si su coseno llega al umbral
+    relajado (``HYBRID_LEXICAL_THRESHOLD_FACTOR``); así una consulta sin
+    chunks relevantes sigue pudiendo responder "Sin coincidencias".
+    """
+    lex_rows, _, _ = index.search_lexical(query, top_k * HYBRID_CANDIDATE_FACTOR, mask)
+    lex_only = lex_rows[~np.isin(lex_rows, vector_hit[0])]
+    relevant = index.similarities(query_vector, lex_only) >= similarity_threshold * HYBRID_LEXICAL_THRESHOLD_FACTOR
+    lex_rows = lex_rows[~np.isin(lex_rows, lex_only[~relevant])]
+    rows, scores = reciprocal_rank_fusion([vector_hit[0], lex_rows], top_k)
+    return rows, scores, max(vector_hit[2], int(lex_rows.size))
+
+
+def _text_requests(
+    index: ChunkIndex, rows: Iterable[int]
+) -> Tuple[Dict[int, str], Dict[int, Tuple[str, str]]]:
+    """Separa las filas en (textos ya disponibles, claves a leer desde Firestore)."""
+    rows = {int(r) for r in rows}
+    if index.texts is not None:
+        return {r: index.texts[r] for r in rows}, {}
+    keys = {r: (index.doc_ids[r], index.chunk_ids[r]) for r in rows}
+    cached = _text_cache.get_many(keys.values())
+    texts = {r: cached[k] for r, k in keys.items() if k in cached}
+    return texts, {r: k for r, k in keys.items() if k not in cached}
+
+
+def _chunk_refs(db, keys: Iterable[Tuple[str, str]]) -> Dict[str, Any]:
+    """Referencias de chunks indexadas por su ruta, para mapear la respuesta de get_all."""
+    refs = {}
+    for doc_id, chunk_id in keys:
+        ref = db.collection(COLLECTION_NAME).document(doc_id).collection("chunks").document(chunk_id)
+        refs[ref.path] = ((doc_id, chunk_id), ref)
+    return refs
+
+
+def _store_texts(
+    texts: Dict[int, str],
+    missing: Dict[int, Tuple[str, str]],
+    fetched: Dict[Tuple[str, str], str],
+    stage: Stage = NOOP_STAGE,
+) -> Dict[int, str]:
+    if stage.recording:
+        stage.set(
+            rows=len(texts) + len(missing),
+            text_cache_hits=len(texts),
+            firestore_reads=len(missing),
+            bytes_read=sum(len(t.encode("utf-8")) for t in fetched.values()),
+        )
+    _text_cache.put_many(fetched)
+    for row, key in missing.items():
+        texts[row] = fetched.get(key, "")
+    return texts
+
+
+def _chunk_texts(index: ChunkIndex, rows: Iterable[int], stage: Stage = NOOP_STAGE) -> Dict[int, str]:
+    """Texto de las filas indicadas: cache LRU y una sola lectura get_all (solo el campo text)."""
+    texts, missing = _text_requests(index, rows)
+    if not missing:
+        return _store_texts(texts, missing, {}, stage)
+    db = get_db()
+    refs = _chunk_refs(db, missing.values())
+    fetched = {}
+    for snap in db.get_all([ref for _, ref in refs.values()], field_paths=["text"]):
+        if snap.exists:
+            fetched[refs[snap.reference.path][0]] = (snap.to_dict() or {}).get("text", "")
+    return _store_texts(texts, missing, fetched, stage)
+
+
+async def _chunk_texts_async(index: ChunkIndex, rows: Iterable[int], stage: Stage = NOOP_STAGE) -> Dict[int, str]:
+    """Como _chunk_texts, con firestore.AsyncClient."""
+    texts, missing = _text_requests(index, rows)
+    if not missing:
+        return _store_texts(texts, missing, {}, stage)
+    db = get_async_db()
+    refs = _chunk_refs(db, missing.values())
+    fetched = {}
+    async for snap in db.get_all([ref for _, ref in refs.values()], field_paths=["text"]):
+        if snap.exists:
+            fetched[refs[snap.reference.path][0]] = (snap.to_dict() or {}).get("text", "")
+    return _store_texts(texts, missing, fetched, stage)
+
+
+def _build_results(
+    index: ChunkIndex, rows: np.ndarray, scores: np.ndarray, texts: Dict[int, str], docs: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Arma los contextos de respuesta para las filas ganadoras del índice."""
+    results: List[Dict[str, Any]] = []
+    for row, score in zip(rows, scores):
+        doc_id = index.doc_ids[row]
+        chunk_id = index.chunk_ids[row]
+        doc_metadata = docs.get(doc_id, {})
+        results.append({
+            "doc_id": doc_id,
+            "doc_name": doc_metadata.get("doc_name", "Unknown"),
+            "chunk_id": chunk_id,
+            "chunk_index": int(index.chunk_indexes[row]),
+            "text": texts[int(row)],
+            "similarity_score": float(score),
+            "gcs_uri": doc_metadata.get("gcs_uri"),
+            "file_type": doc_metadata.get("file_type", "?"),
+            "firestore_path": f"{COLLECTION_NAME}/{doc_id}/chunks/{chunk_id}"
+        })
+    return results
+
+
+# Métricas de acceso: "async" (agrupadas en segundo plano), "sync" (commit en la consulta) u "off"
+ACCESS_METRICS_MODE = os.getenv("RAG_ACCESS_METRICS", "async").lower()
+
+_metrics_writer = AccessMetricsWriter(
+    get_db,
+    COLLECTION_NAME,
+    flush_interval=float(os.getenv("RAG_METRICS_FLUSH_SECONDS", "10")),
+    max_pending=int(os.getenv("RAG_METRICS_MAX_PENDING", "500")),
+)
+
+
+def _record_access_metrics(results: List[Dict[str, Any]]) -> None:
+    """Incrementa access_count y last_accessed de los chunks retornados."""
+    if ACCESS_METRICS_MODE == "off":
+        return
+    if ACCESS_METRICS_MODE == "async":
+        _metrics_writer.record((r["doc_id"], r["chunk_id"]) for r in results)
+        return
+    
+    try:
+        db = get_db()
+        batch = db.batch()
+        for result in results:
+            chunk_ref = db.collection(COLLECTION_NAME).document(
+                result["doc_id"]
+            ).collection("chunks").document(result["chunk_id"])
+            batch.update(chunk_ref, {
+                "access_count": firestore.Increment(1),
+                "last_accessed": firestore.SERVER_TIMESTAMP
+            })
+        batch.commit()
+    except Exception as e:
+        logger.warning(f"Error actualizando métricas: {e}")
+
+
+async def _record_access_metrics_async(results: List[Dict[str, Any]]) -> None:
+    """Como _record_access_metrics; en modo "sync" el commit usa firestore.AsyncClient."""
+    if ACCESS_METRICS_MODE != "sync":
+        _record_access_metrics(results)
+        return
+    
+    try:
+        db = get_async_db()
+        batch = db.batch()
+        for result in results:
+            chunk_ref = db.collection(COLLECTION_NAME).document(
+                result["doc_id"]
+            ).collection("chunks").document(result["chunk_id"])
+            batch.update(chunk_ref, {
+                "access_count": firestore.Increment(1),
+                "last_accessed": firestore.SERVER_TIMESTAMP
+            })
+        await batch.commit()
+    except Exception as e:
+        logger.warning(f"Error actualizando métricas: {e}")
+
+
+def flush_access_metrics() -> int:
+    """Fuerza la escritura de las métricas de acceso pendientes."""
+    return _metrics_writer.flush()
+
+
+def _compact_payload(
+    index: ChunkIndex,
+    rows: np.ndarray,
+    scores: np.ndarray,
+    max_tokens: int,
+    texts: Dict[int, str],
+    docs: Dict[str, Any],
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Payload compacto para el LLM y la lista de contextos efectivamente usados."""
+    results = _build_results(index, rows, scores, texts, docs)
+    entries = [dict(r, score=r["similarity_score"]) for r in results]
+    vectors = np.asarray(index.matrix[rows], dtype=np.float32)
+    context, sources, used = compact_contexts(entries, vectors, max_tokens)
+    return {
+        "context": context,
+        "sources": sources,
+        "chunks_used": len(used),
+        "estimated_tokens": estimate_tokens(context) if context else 0
+    }, [results[i] for i in used]
+
+
+def _format_contexts(results: List[Dict[str, Any]]) -> str:
+    return "\n\n---\n\n".join([
+        f"📄 [{r['doc_name']}] (Chunk {r['chunk_index']}, Score: {r['similarity_score']:.3f})\n{r['text']}"
+        for r in results
+    ])
+
+
+def _prepare_search(
+    document_name: Optional[str], mode: str, filters: Optional[Dict[str, Any]] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Resuelve metadata, filtros e índice; retorna (plan, respuesta_de_error).
+    
+    El nombre de documento y los filtros de metadata se combinan en una sola
+    máscara booleana sobre las filas del índice, aplicada antes del scoring.
+    Todo el plan sale de un mismo snapshot, aunque se publique otro mientras tanto.
+    """
+    snapshot = _ensure_snapshot()
+    docs = snapshot.docs
+    
+    if not docs:
+        return None, {"ok": False, "status": "No hay documentos", "message": "La colección está vacía"}
+    
+    target_doc_ids, error, doc_candidates = _resolve_target_docs(document_name, docs)
+    if error:
+        return None, error
+    
+    index = snapshot.index
+    mask = None
+    if document_name or filters:
+        columns = get_metadata_columns(index, docs)
+        doc_keep = columns.doc_selection(filters or {}, target_doc_ids if document_name else None)
+        if not doc_keep.any():
+            return None, {
+                "ok": False,
+                "status": "Sin documentos para los filtros",
+                "message": f"Ningún documento cumple {filters}. Valores disponibles: {columns.values()}",
+            }
+        target_doc_ids = columns.selected_ids(doc_keep)
+        mask = columns.row_mask(doc_keep)
+    
+    return {
+        "index": index,
+        "docs": docs,
+        "version": snapshot.version,
+        "mode": _effective_mode(mode, index),
+        "mask": mask,
+        "target_doc_ids": target_doc_ids,
+        "doc_candidates": doc_candidates,
+        "filters": filters or {},
+    }, None
+
+
+def _run_search(
+    plan: Dict[str, Any],
+    query: str,
+    query_vector: Optional[List[float]],
+    top_k: int,
+    similarity_threshold: float,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Ejecuta la búsqueda del plan en el índice residente."""
+    index, mask, mode = plan["index"], plan["mask"], plan["mode"]
+    if mode == "lexical":
+        return index.search_lexical(query, top_k, mask)
+    
+    vector_k = top_k * HYBRID_CANDIDATE_FACTOR if mode == "hybrid" else top_k
+    hit = index.search(query_vector, vector_k, similarity_threshold, mask=mask)
+    if mode == "hybrid":
+        hit = _fuse_hits(index, query, query_vector, hit, top_k, similarity_threshold, mask)
+    return hit
+
+
+def _search_response(
+    plan: Dict[str, Any],
+    query: str,
+    hit: Tuple[np.ndarray, np.ndarray, int],
+    response_mode: str,
+    max_tokens: int,
+    texts: Dict[int, str],
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Arma la respuesta de search_documents y la lista de contextos entregados."""
+    rows, scores, candidates_found = hit
+    logger.info(f"   Resultados encontrados: {len(rows)}")
+    
+    if len(rows) == 0:
+        empty = {
+            "ok": True,
+            "status": "Sin coincidencias",
+            "message": "No se encontraron fragmentos relevantes para la consulta.",
+        }
+        if (response_mode or "").lower() == "full":
+            empty.update(contexts=[], contexts_text="")
+        else:
+            empty.update(context="", sources=[], chunks_used=0, estimated_tokens=0)
+        return empty, []
+    
+    index = plan["index"]
+    response = {
+        "ok": True,
+        "status": f"Se encontraron {len(rows)} contextos relevantes",
+        "query": query,
+        "mode": plan["mode"],
+        "documents_searched": len(plan["target_doc_ids"]),
+        "document_candidates": plan["doc_candidates"],
+        "filters": plan["filters"],
+        "candidates_found": candidates_found
+    }
+    
+    if (response_mode or "").lower() == "full":
+        final_results = _build_results(index, rows, scores, texts, plan["docs"])
+        response.update(contexts=final_results, contexts_text=_format_contexts(final_results))
+    else:
+        payload, final_results = _compact_payload(index, rows, scores, max_tokens, texts, plan["docs"])
+        response.update(payload)
+    return response, final_results
+
+
+def _result_cache_key(
+    document_name: Optional[str],
+    plan: Dict[str, Any],
+    top_k: int,
+    similarity_threshold: float,
+    response_mode: str,
+    max_tokens: int,
+) -> Tuple[Any, ...]:
+    """Clave de los filtros y parámetros que determinan la respuesta (sin la consulta)."""
+    return (
+        normalize_doc_name(document_name) if document_name else None,
+        tuple(sorted((k, str(v)) for k, v in plan["filters"].items())),
+        plan["mode"], top_k, similarity_threshold, (response_mode or "").lower(), max_tokens,
+    )
+
+
+def _cache_vector(query_vector: Optional[List[float]]) -> Optional[np.ndarray]:
+    if query_vector is None:
+        return None
+    vector = np.asarray(query_vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else None
+
+
+# Tiempos por etapa: spans de OpenTelemetry según RAG_TRACING ("stages", "root" u "off";
+# ver rag_tracing) y, con RAG_RESPONSE_TIMINGS=1, bloque timings_ms en la respuesta
+TRACING_LEVEL = os.getenv("RAG_TRACING", "stages").lower()
+RESPONSE_TIMINGS = os.getenv("RAG_RESPONSE_TIMINGS", "0") == "1"
+
+
+def _start_trace(
+    query: str, document_name: Optional[str], top_k: int, mode: str, response_mode: str
+) -> SearchTrace:
+    return SearchTrace(
+        "rag.search",
+        level=TRACING_LEVEL,
+        query_chars=len(query or ""),
+        document_filter=bool(document_name),
+        top_k=top_k,
+        mode=mode,
+        response_mode=response_mode,
+    )
+
+
+def _finish_search(search_trace: SearchTrace, response: Dict[str, Any]) -> Dict[str, Any]:
+    """Cierra el span de la búsqueda y, con RAG_RESPONSE_TIMINGS=1, agrega ``timings_ms``."""
+    search_trace.finish(response)
+    if RESPONSE_TIMINGS:
+        response = dict(response, timings_ms=search_trace.timings_ms())
+    return response
+
+
+def _metadata_stage(stage: Stage, load: Any) -> None:
+    previous = _snapshot.version
+    docs = load()
+    _snapshot_attributes(stage, len(docs), previous)
+
+
+async def _metadata_stage_async(stage: Stage) -> None:
+    previous = _snapshot.version
+    docs = await get_documents_metadata_async()
+    _snapshot_attributes(stage, len(docs), previous)
+
+
+def _snapshot_attributes(stage: Stage, documents: int, previous_version: int) -> None:
+    if stage.recording:
+        snapshot = _snapshot
+        stage.set(
+            documents=documents,
+            refreshed=snapshot.version != previous_version,
+            snapshot_age_s=snapshot.age(),
+            refresh_in_flight=_refresher.in_flight,
+        )
+
+
+async def _embedding_stage_async(search_trace: SearchTrace, query: str) -> List[float]:
+    with search_trace.stage("embedding") as stage:
+        vector, cache_hit = await _query_embedding_async(query)
+        stage.set(cache_hit=cache_hit, backend=_embedding_service.backend.name)
+    return vector
+
+
+def _plan_stage(stage: Stage, plan: Optional[Dict[str, Any]], snapshot_version: int) -> None:
+    if plan is not None:
+        stage.set(
+            mode=plan["mode"],
+            index_rows=len(plan["index"]),
+            index_rebuilt=_snapshot.version != snapshot_version,
+            documents_searched=len(plan["target_doc_ids"]),
+            filtered=plan["mask"] is not None,
+        )
+
+
+def _scoring_stage(stage: Stage, plan: Dict[str, Any], hit: Tuple[np.ndarray, np.ndarray, int]) -> None:
+    if not stage.recording:
+        return
+    index, mask = plan["index"], plan["mask"]
+    routed = plan["mode"] != "lexical" and index.routes(mask)
+    stage.set(
+        chunks_scored=int(mask.sum()) if mask is not None else len(index),
+        ann=index.ann is not None and plan["mode"] != "lexical",
+        doc_fanout=index.router.fanout if routed else 0,
+        storage=index.storage,
+        candidates_found=hit[2],
+        results=len(hit[0]),
+    )
+
+
+def _response_stage(stage: Stage, response: Dict[str, Any], final_results: List[Dict[str, Any]]) -> None:
+    stage.set(chunks_used=len(final_results), estimated_tokens=response.get("estimated_tokens"))
+
+
+def _search_error(e: Exception) -> Dict[str, Any]:
+    logger.error(f"Error en búsqueda RAG: {e}")
+    return {
+        "ok": False,
+        "status": "Error",
+        "message": f"Error en búsqueda: {str(e)}",
+        "traceback": traceback.format_exc()
+    }
+
 
 def search_documents(
     query: str,
     document_name: Optional[str] = None,
     top_k: int = DEFAULT_TOP_K,
-    similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD
+    similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    mode: str = DEFAULT_SEARCH_MODE,
+    response_mode: str = DEFAULT_RESPONSE_MODE,
+    max_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+    file_type: Optional[str] = None,
+    year: Optional[int] = None,
+    career: Optional[str] = None,
+    faculty: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Busca información en documentos indexados usando búsqueda vectorial simple.
+    Busca información en documentos indexados (vectorial, léxica BM25 o híbrida).
     
     Args:
         query: Consulta del usuario en lenguaje natural
         document_name: (Opcional) Filtrar por nombre de documento específico
         top_k: Número de resultados a retornar
-        similarity_threshold: Umbral mínimo de similitud coseno
+        similarity_threshold: Umbral mínimo de similitud coseno (parte vectorial)
+        mode: "hybrid" (vector + términos exactos), "lexical" (solo términos exactos,
+            p. ej. "ANEXO 12", códigos o años) o "vector" (solo semántica)
+        response_mode: "compact" (un solo texto `context` dentro de max_tokens) o
+            "full" (lista `contexts` con todos los campos)
+        max_tokens: Presupuesto aproximado de tokens del texto en modo "compact"
+        file_type: (Opcional) Tipo de archivo, p. ej. "PDF" o "DOCX"
+        year: (Opcional) Año del documento, p. ej. 2024
+        career: (Opcional) Carrera, p. ej. "Ingeniería Civil en Ciencia de Datos"
+        faculty: (Opcional) Facultad, p. ej. "Facultad de Ingeniería"
+        date_from: (Opcional) Fecha mínima del documento (YYYY-MM-DD)
+        date_to: (Opcional) Fecha máxima del documento (YYYY-MM-DD, inclusive)
     
     Returns:
-        Dict con status, contextos encontrados y texto formateado
+        Dict con status y el texto de contexto (compact) o los contextos
+        encontrados (full). En modo "hybrid" el score es RRF y en "lexical" es BM25.
     """
+    search_trace = _start_trace(query, document_name, top_k, mode, response_mode)
     try:
-        logger.info(f"🔎 Búsqueda RAG: '{query}' | doc_filter: '{document_name}'")
-
+        logger.info(f"🔎 Búsqueda RAG: '{query}' | doc_filter: '{document_name}' | mode: '{mode}'")
 
-        try:
-            model = get_embedding_model()
-            query_embeddings = model.get_embeddings([query])
-            query_vector = query_embeddings[0].values
-        except Exception as e:
-            logger.error(f"Error generando embedding: {e}")
-            return {"ok": False, "status": "Error", "message": f"Error en embedding: {e}"}
+        with search_trace.stage("metadata") as stage:
+            _metadata_stage(stage, get_documents_metadata)
+        filters = _metadata_filters(file_type, year, career, faculty, date_from, date_to)
+        with search_trace.stage("plan") as stage:
+            snapshot_version = _snapshot.version
+            plan, error = _prepare_search(document_name, mode, filters)
+            _plan_stage(stage, plan, snapshot_version)
+        if error:
+            return _finish_search(search_trace, error)
         
-
-        all_docs = get_documents_metadata()
+        logger.info(f"   Buscando en {len(plan['target_doc_ids'])} documento(s)")
         
-        if not all_docs:
-            return {"ok": False, "status": "No hay documentos", "message": "La colección está vacía"}
-        
-        target_doc_ids = []
-        
-        if document_name:
-            norm_search = normalize_doc_name(document_name)
-            search_tokens = set(norm_search.split())
-            
-            for doc_data in all_docs:
-                d_name = doc_data.get("doc_name", "")
-                norm_doc = normalize_doc_name(d_name)
-                
-                if norm_search in norm_doc or norm_doc in norm_search:
-                    target_doc_ids.append(doc_data['_firestore_id'])
-                    continue
-                    
-                doc_tokens = set(norm_doc.split())
-                common_tokens = search_tokens.intersection(doc_tokens)
-                if common_tokens and (len(common_tokens) / len(search_tokens) >= 0.5):
-                    target_doc_ids.append(doc_data['_firestore_id'])
-
-            if not target_doc_ids:
-                available_docs = [d.get('doc_name', 'Unknown') for d in all_docs]
-                return {
-                    "ok": False, 
-                    "status": f"Documento no encontrado: '{document_name}'",
-                    "message": f"Documentos disponibles: {available_docs}"
-                }
-        else:
-            target_doc_ids = [d['_firestore_id'] for d in all_docs]
+        query_vector = None
+        if plan["mode"] != "lexical":
+            try:
+                with search_trace.stage("embedding") as stage:
+                    query_vector, cache_hit = _query_embedding(query)
+                    stage.set(cache_hit=cache_hit, backend=_embedding_service.backend.name)
+            except Exception as e:
+                logger.error(f"Error generando embedding: {e}")
+                return _finish_search(search_trace, {"ok": False, "status": "Error", "message": f"Error en embedding: {e}"})
         
-        logger.info(f"   Buscando en {len(target_doc_ids)} documento(s)")
+        cache_key = _result_cache_key(document_name, plan, top_k, similarity_threshold, response_mode, max_tokens)
+        cache_vector = _cache_vector(query_vector)
+        with search_trace.stage("result_cache") as stage:
+            cached = _result_cache.get(
+                plan["version"], cache_key, query, cache_vector, semantic=plan["mode"] == "vector"
+            )
+            stage.set(hit=cached is not None)
+        if cached is not None:
+            logger.info("   Respuesta servida desde el cache semántico")
+            return _finish_search(search_trace, dict(cached, cached=True))
         
+        with search_trace.stage("scoring") as stage:
+            hit = _run_search(plan, query, query_vector, top_k, similarity_threshold)
+            _scoring_stage(stage, plan, hit)
+        with search_trace.stage("chunk_text") as stage:
+            texts = _chunk_texts(plan["index"], hit[0], stage)
+        with search_trace.stage("response") as stage:
+            response, final_results = _search_response(plan, query, hit, response_mode, max_tokens, texts)
+            _response_stage(stage, response, final_results)
+        with search_trace.stage("metrics", metrics_mode=ACCESS_METRICS_MODE, chunks=len(final_results[:10])):
+            _record_access_metrics(final_results[:10])  # Limitar batch
+        _result_cache.put(plan["version"], cache_key, query, cache_vector, response)
+        return _finish_search(search_trace, response)
 
-        candidates: List[Dict[str, Any]] = []
-        db = get_db()
+    except Exception as e:
+        return _finish_search(search_trace, _search_error(e))
+
+
+async def search_documents_async(
+    query: str,
+    document_name: Optional[str] = None,
+    top_k: int = DEFAULT_TOP_K,
+    similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    mode: str = DEFAULT_SEARCH_MODE,
+    response_mode: str = DEFAULT_RESPONSE_MODE,
+    max_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+    file_type: Optional[str] = None,
+    year: Optional[int] = None,
+    career: Optional[str] = None,
+    faculty: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Busca información en documentos indexados (vectorial, léxica BM25 o híbrida).
+    
+    Args:
+        query: Consulta del usuario en lenguaje natural
+        document_name: (Opcional) Filtrar por nombre de documento específico
+        top_k: Número de resultados a retornar
+        similarity_threshold: Umbral mínimo de similitud coseno (parte vectorial)
+        mode: "hybrid" (vector + términos exactos), "lexical" (solo términos exactos,
+            p. ej. "ANEXO 12", códigos o años) o "vector" (solo semántica)
+        response_mode: "compact" (un solo texto `context` dentro de max_tokens) o
+            "full" (lista `contexts` con todos los campos)
+        max_tokens: Presupuesto aproximado de tokens del texto en modo "compact"
+        file_type: (Opcional) Tipo de archivo, p. ej. "PDF" o "DOCX"
+        year: (Opcional) Año del documento, p. ej. 2024
+        career: (Opcional) Carrera, p. ej. "Ingeniería Civil en Ciencia de Datos"
+        faculty: (Opcional) Facultad, p. ej. "Facultad de Ingeniería"
+        date_from: (Opcional) Fecha mínima del documento (YYYY-MM-DD)
+        date_to: (Opcional) Fecha máxima del documento (YYYY-MM-DD, inclusive)
+    
+    Returns:
+        Dict con status y el texto de contexto (compact) o los contextos
+        encontrados (full). En modo "hybrid" el score es RRF y en "lexical" es BM25.
+    """
+    # Variante no bloqueante de search_documents: el embedding se pide mientras
+    # se refresca la metadata/índice y el scoring corre fuera del event loop.
+    # El tiempo de "embedding" se solapa con "metadata" y "plan"; "embedding_wait"
+    # es lo que la búsqueda efectivamente esperó por el vector.
+    embed_task = None
+    search_trace = _start_trace(query, document_name, top_k, mode, response_mode)
+    try:
+        logger.info(f"🔎 Búsqueda RAG (async): '{query}' | doc_filter: '{document_name}' | mode: '{mode}'")
         
-        for doc_id in target_doc_ids:
-            doc_ref = db.collection(COLLECTION_NAME).document(doc_id)
-            doc_metadata = doc_ref.get().to_dict()
-            
-            if not doc_metadata:
-                continue
-                
-            chunks = list(doc_ref.collection("chunks").stream())
-            
-            for chunk_doc in chunks:
-                chunk_data = chunk_doc.to_dict()
-                if "embedding" not in chunk_data or "text" not in chunk_data:
-                    continue
-                
-                chunk_text = chunk_data.get("text", "")
-                chunk_embedding = chunk_data["embedding"]
-                similarity = cosine_similarity(query_vector, chunk_embedding)
-                
-                if similarity >= similarity_threshold:
-                    candidates.append({
-                        "doc_id": doc_id,
-                        "doc_name": doc_metadata.get("doc_name", "Unknown"),
-                        "chunk_id": chunk_data.get("chunk_id", chunk_doc.id),
-                        "chunk_index": chunk_data.get("chunk_index", 0),
-                        "text": chunk_text,
-                        "similarity_score": similarity,
-                        "gcs_uri": doc_metadata.get("gcs_uri"),
-                        "file_type": doc_metadata.get("file_type", "?"),
-                        "firestore_path": f"{COLLECTION_NAME}/{doc_id}/chunks/{chunk_doc.id}"
-                    })
+        if (mode or DEFAULT_SEARCH_MODE).lower() != "lexical":
+            embed_task = asyncio.create_task(_embedding_stage_async(search_trace, query))
         
-        candidates.sort(key=lambda x: x["similarity_score"], reverse=True)
-        final_results = candidates[:top_k]
+        with search_trace.stage("metadata") as stage:
+            await _metadata_stage_async(stage)
+        filters = _metadata_filters(file_type, year, career, faculty, date_from, date_to)
+        with search_trace.stage("plan") as stage:
+            snapshot_version = _snapshot.version
+            plan, error = await asyncio.to_thread(_prepare_search, document_name, mode, filters)
+            _plan_stage(stage, plan, snapshot_version)
+        if error:
+            return _finish_search(search_trace, error)
         
-        logger.info(f"   Resultados encontrados: {len(final_results)}")
+        query_vector = None
+        if plan["mode"] != "lexical":
+            try:
+                with search_trace.stage("embedding_wait"):
+                    query_vector = await (embed_task or _embedding_stage_async(search_trace, query))
+            except Exception as e:
+                logger.error(f"Error generando embedding: {e}")
+                return _finish_search(search_trace, {"ok": False, "status": "Error", "message": f"Error en embedding: {e}"})
         
-        if not final_results:
-            return {
-                "ok": True,
-                "status": "Sin coincidencias",
-                "message": "No se encontraron fragmentos relevantes para la consulta.",
-                "contexts": [],
-                "contexts_text": ""
-            }
+        cache_key = _result_cache_key(document_name, plan, top_k, similarity_threshold, response_mode, max_tokens)
+        cache_vector = _cache_vector(query_vector)
+        with search_trace.stage("result_cache") as stage:
+            cached = _result_cache.get(
+                plan["version"], cache_key, query, cache_vector, semantic=plan["mode"] == "vector"
+            )
+            stage.set(hit=cached is not None)
+        if cached is not None:
+            logger.info("   Respuesta servida desde el cache semántico")
+            return _finish_search(search_trace, dict(cached, cached=True))
+        
+        with search_trace.stage("scoring") as stage:
+            hit = await asyncio.to_thread(
+                _run_search, plan, query, query_vector, top_k, similarity_threshold
+            )
+            _scoring_stage(stage, plan, hit)
+        with search_trace.stage("chunk_text") as stage:
+            texts = await _chunk_texts_async(plan["index"], hit[0], stage)
+        with search_trace.stage("response") as stage:
+            response, final_results = _search_response(plan, query, hit, response_mode, max_tokens, texts)
+            _response_stage(stage, response, final_results)
+        with search_trace.stage("metrics", metrics_mode=ACCESS_METRICS_MODE, chunks=len(final_results[:10])):
+            await _record_access_metrics_async(final_results[:10])  # Limitar batch
+        _result_cache.put(plan["version"], cache_key, query, cache_vector, response)
+        return _finish_search(search_trace, response)
 
+    except Exception as e:
+        return _finish_search(search_trace, _search_error(e))
+    finally:
+        if embed_task is not None and not embed_task.done():
+            embed_task.cancel()
 
-        try:
-            db = get_db()
-            batch = db.batch()
-            for result in final_results[:10]:  # Limitar batch
-                chunk_ref = db.collection(COLLECTION_NAME).document(
-                    result["doc_id"]
-                ).collection("chunks").document(result["chunk_id"])
-                batch.update(chunk_ref, {
-                    "access_count": firestore.Increment(1),
-                    "last_accessed": firestore.SERVER_TIMESTAMP
-                })
-            batch.commit()
-        except Exception as e:
-            logger.warning(f"Error actualizando métricas: {e}")
+
+def search_documents_batch(
+    queries: List[str],
+    document_name: Optional[str] = None,
+    top_k: int = DEFAULT_BATCH_TOP_K,
+    similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    mode: str = DEFAULT_SEARCH_MODE,
+    response_mode: str = DEFAULT_RESPONSE_MODE,
+    max_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+    file_type: Optional[str] = None,
+    year: Optional[int] = None,
+    career: Optional[str] = None,
+    faculty: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ejecuta varias búsquedas en una sola llamada (un embedding por lote y un producto matricial).
+    
+    Úsala cuando necesites información de varios temas del mismo documento,
+    por ejemplo identificación, resumen y cada una de las dimensiones de un informe.
+    
+    Args:
+        queries: Lista de consultas en lenguaje natural
+        document_name: (Opcional) Filtrar todas las consultas por un documento
+        top_k: Número de resultados por consulta
+        similarity_threshold: Umbral mínimo de similitud coseno (parte vectorial)
+        mode: "hybrid", "lexical" o "vector" (igual que en search_documents)
+        response_mode: "compact" o "full" (igual que en search_documents)
+        max_tokens: Presupuesto aproximado de tokens por consulta en modo "compact"
+        file_type, year, career, faculty, date_from, date_to: (Opcionales) Filtros
+            de metadata aplicados a todas las consultas (igual que en search_documents)
+    
+    Returns:
+        Dict con status y una entrada de resultados por consulta
+    """
+    try:
+        queries = [q for q in queries if q and q.strip()]
+        if not queries:
+            return {"ok": False, "status": "Error", "message": "No se recibieron consultas"}
         
+        logger.info(f"🔎 Búsqueda RAG por lote: {len(queries)} consultas | doc_filter: '{document_name}' | mode: '{mode}'")
 
-        contexts_text = "\n\n---\n\n".join([
-            f"📄 [{r['doc_name']}] (Chunk {r['chunk_index']}, Score: {r['similarity_score']:.3f})\n{r['text']}"
-            for r in final_results
-        ])
+        filters = _metadata_filters(file_type, year, career, faculty, date_from, date_to)
+        plan, error = _prepare_search(document_name, mode, filters)
+        if error:
+            return error
+        index, mode, mask = plan["index"], plan["mode"], plan["mask"]
+        
+        if mode == "lexical":
+            hits = [index.search_lexical(q, top_k, mask) for q in queries]
+        else:
+            try:
+                query_vectors = get_query_embeddings(queries)
+            except Exception as e:
+                logger.error(f"Error generando embeddings: {e}")
+                return {"ok": False, "status": "Error", "message": f"Error en embedding: {e}"}
+            
+            vector_k = top_k * HYBRID_CANDIDATE_FACTOR if mode == "hybrid" else top_k
+            hits = index.search_many(query_vectors, vector_k, similarity_threshold, mask=mask)
+            if mode == "hybrid":
+                hits = [
+                    _fuse_hits(index, q, vector, hit, top_k, similarity_threshold, mask)
+                    for q, vector, hit in zip(queries, query_vectors, hits)
+                ]
+        
+        texts = _chunk_texts(index, (row for rows, _, _ in hits for row in rows))
+        results = []
+        accessed: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        compact = (response_mode or "").lower() != "full"
+        total = 0
+        for query, (rows, scores, candidates_found) in zip(queries, hits):
+            entry = {"query": query, "candidates_found": candidates_found}
+            if compact and len(rows):
+                payload, contexts = _compact_payload(index, rows, scores, max_tokens, texts, plan["docs"])
+                entry.update(payload)
+            elif compact:
+                contexts = []
+                entry.update(context="", sources=[], chunks_used=0, estimated_tokens=0)
+            else:
+                contexts = _build_results(index, rows, scores, texts, plan["docs"])
+                entry.update(contexts=contexts, contexts_text=_format_contexts(contexts))
+            for r in contexts[:10]:
+                accessed.setdefault((r["doc_id"], r["chunk_id"]), r)
+            total += len(contexts)
+            results.append(entry)
+        
+        if accessed:
+            _record_access_metrics(list(accessed.values()))
+        
+        logger.info(f"   Resultados encontrados: {total} en {len(queries)} consultas")
         
         return {
             "ok": True,
-            "status": f"Se encontraron {len(final_results)} contextos relevantes",
-            "query": query,
-            "documents_searched": len(target_doc_ids),
-            "candidates_found": len(candidates),
-            "contexts": final_results,
-            "contexts_text": contexts_text
+            "status": f"Se encontraron {total} contextos relevantes para {len(queries)} consultas",
+            "mode": mode,
+            "documents_searched": len(plan["target_doc_ids"]),
+            "document_candidates": plan["doc_candidates"],
+            "filters": filters,
+            "results": results
         }
 
     except Exception as e:
-        logger.error(f"Error en búsqueda RAG: {e}")
+        logger.error(f"Error en búsqueda RAG por lote: {e}")
         return {
             "ok": False,
             "status": "Error",
@@ -298,6 +1697,167 @@ def search_documents(
         }
 
 
+# Actividades PDC extraídas en la ingesta (subcolección "activities" de cada documento)
+ACTIVITY_OUTPUTS = ("table", "summary", "dimensiones")
+_activity_cache = ActivityCache(max_docs=int(os.getenv("RAG_ACTIVITY_CACHE_DOCS", "256")))
+
+
+def _fetch_activities(doc_id: str) -> List[Dict[str, Any]]:
+    ref = get_db().collection(COLLECTION_NAME).document(doc_id).collection(ACTIVITIES_SUBCOLLECTION)
+    return sorted((snap.to_dict() or {} for snap in ref.stream()), key=lambda a: a.get("order", 0))
+
+
+def _document_activities(docs: Dict[str, Dict[str, Any]], doc_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Actividades de cada documento; se releen solo si cambió su versión (marca de agua y extractor)."""
+    result: Dict[str, List[Dict[str, Any]]] = {}
+    missing: Dict[str, Tuple[Any, ...]] = {}
+    for doc_id in doc_ids:
+        doc = docs[doc_id]
+        version = (_doc_watermark(doc), doc.get("activities_version"), doc.get("total_activities"))
+        cached = _activity_cache.get(doc_id, version)
+        if cached is None:
+            missing[doc_id] = version
+        else:
+            result[doc_id] = cached
+    
+    if missing:
+        workers = min(CHUNK_FETCH_WORKERS, len(missing))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-activities") as pool:
+            for doc_id, records in zip(missing, pool.map(_fetch_activities, list(missing))):
+                _activity_cache.put(doc_id, missing[doc_id], records)
+                result[doc_id] = records
+    return {doc_id: result[doc_id] for doc_id in doc_ids}
+
+
+def _activity_row(doc_name: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "doc_name": doc_name,
+        "dimension": record.get("dimension_title") or DIMENSION_TITLES.get(record.get("dimension"), "Sin dimensión"),
+        "text": record.get("text", ""),
+        "date": record.get("date"),
+        "status": STATUS_LABELS.get(record.get("status"), "N/A"),
+        "annexes": record.get("annexes") or [],
+        "plan_mejora": record.get("plan_mejora"),
+    }
+
+
+def get_document_activities(
+    document_name: Optional[str] = None,
+    status: Optional[str] = None,
+    dimension: Optional[str] = None,
+    contains: Optional[str] = None,
+    career: Optional[str] = None,
+    faculty: Optional[str] = None,
+    year: Optional[int] = None,
+    output: str = "table",
+    max_activities: int = 200,
+) -> Dict[str, Any]:
+    """
+    Consulta las actividades de los informes PDC, extraídas al indexar cada documento.
+    
+    Para preguntas de actividades logradas / no logradas / no aplica es más
+    rápida y exacta que search_documents: no hay búsqueda ni texto crudo que interpretar.
+    
+    Args:
+        document_name: (Opcional) Informe específico; sin él se consideran todos
+        status: (Opcional) "L" (logradas), "NL" (no logradas) o "NA" (no aplica)
+        dimension: (Opcional) "dim1" a "dim5", número romano o tema, p. ej. "docencia"
+        contains: (Opcional) Texto que debe aparecer en la actividad
+        career: (Opcional) Carrera de los documentos
+        faculty: (Opcional) Facultad de los documentos
+        year: (Opcional) Año de los documentos
+        output: "table" (lista de actividades), "summary" (solo conteos por documento)
+            o "dimensiones" (estructura `dimensiones` de content_data para
+            generate_pdf_report; requiere un solo documento)
+        max_activities: Máximo de actividades listadas en "table" (los conteos son siempre completos)
+    
+    Returns:
+        Dict con las actividades (texto, fecha, estado, anexos, dimensión) y,
+        si no se filtra por estado, los conteos L/NL/NA y el % de avance por documento
+    """
+    try:
+        output = (output or "table").lower()
+        if output not in ACTIVITY_OUTPUTS:
+            raise ValueError(f"output debe ser uno de {ACTIVITY_OUTPUTS}")
+        status_code = classify_status(status) if status else None
+        if status and status_code is None:
+            raise ValueError(f"Estado no reconocido: '{status}' (usa L, NL o NA)")
+        dimension_code = dimension_key(dimension) if dimension else None
+        if dimension and dimension_code is None:
+            raise ValueError(f"Dimensión no reconocida: '{dimension}' (usa {list(DIMENSION_TITLES)})")
+        
+        logger.info(f"📋 Actividades: doc_filter: '{document_name}' | status: '{status_code}' | dim: '{dimension_code}'")
+        snapshot = _ensure_snapshot()
+        docs = snapshot.docs
+        target_doc_ids, error, doc_candidates = _resolve_target_docs(document_name, docs)
+        if error:
+            return error
+        filters = _metadata_filters(year=year, career=career, faculty=faculty)
+        if filters:
+            columns = get_metadata_columns(snapshot.index, docs)
+            target_doc_ids = columns.selected_ids(
+                columns.doc_selection(filters, target_doc_ids if document_name else None)
+            )
+        
+        doc_ids = [doc_id for doc_id in target_doc_ids if docs[doc_id].get("total_activities")]
+        if not doc_ids:
+            return {
+                "ok": False,
+                "status": "Sin actividades indexadas",
+                "message": "Los documentos seleccionados no tienen actividades extraídas; usa search_documents_async",
+                "documents_searched": len(target_doc_ids),
+            }
+        if output == "dimensiones" and len(doc_ids) > 1:
+            return {
+                "ok": False,
+                "status": "Se requiere un solo documento",
+                "message": "output='dimensiones' arma el content_data de un informe: indica document_name",
+                "document_candidates": [docs[doc_id].get("doc_name", "Unknown") for doc_id in doc_ids[:10]],
+            }
+        
+        by_doc = _document_activities(docs, doc_ids)
+        documents, matches = [], []
+        for doc_id in doc_ids:
+            doc_name = docs[doc_id].get("doc_name", "Unknown")
+            # Los conteos ignoran el filtro de estado para que el % de avance sea el del documento
+            scoped = filter_activities(by_doc[doc_id], dimension=dimension_code, contains=contains)
+            found = filter_activities(scoped, status=status_code)
+            entry = {"doc_name": doc_name, "activities_found": len(found)}
+            if status_code is None:
+                entry.update(summarize(scoped))
+            documents.append(entry)
+            matches.extend((doc_name, record) for record in found)
+        
+        response = {
+            "ok": True,
+            "status": f"Se encontraron {len(matches)} actividades",
+            "filters": {
+                k: v for k, v in {
+                    "status": STATUS_LABELS.get(status_code), "dimension": dimension_code,
+                    "contains": contains, **filters,
+                }.items() if v
+            },
+            "documents_searched": len(doc_ids),
+            "document_candidates": doc_candidates,
+            "documents": documents,
+        }
+        if status_code is None and len(documents) > 1:
+            response["summary"] = summarize(
+                record for doc_id in doc_ids
+                for record in filter_activities(by_doc[doc_id], dimension=dimension_code, contains=contains)
+            )
+        if output == "table":
+            response["activities"] = [_activity_row(doc_name, record) for doc_name, record in matches[:max_activities]]
+            response["truncated"] = len(matches) > max_activities
+        elif output == "dimensiones":
+            response["dimensiones"] = to_dimensiones(record for _, record in matches)
+        return response
+    
+    except Exception as e:
+        logger.error(f"Error consultando actividades: {e}")
+        return {"ok": False, "status": "Error", "message": f"Error consultando actividades: {str(e)}"}
+
+
 def list_available_documents() -> Dict[str, Any]:
     """Lista todos los documentos indexados con su metadata."""
     try:
@@ -321,30 +1881,26 @@ def list_available_documents() -> Dict[str, Any]:
         return {"ok": False, "error": str(e)}
 
 
-def get_document_stats() -> Dict[str, Any]:
+def get_document_stats(recompute: bool = False) -> Dict[str, Any]:
     """
     Obtiene estadísticas agregadas de la base de conocimiento.
+    
+    Args:
+        recompute: Relee la colección completa y recalcula los totales (reparación)
     """
     try:
-        docs = get_documents_metadata(force_refresh=True)
-        
-        total_docs = len(docs)
-        total_chunks = sum(d.get("total_chunks", 0) for d in docs)
-        total_chars = sum(d.get("total_characters", 0) for d in docs)
-        
-        by_type = {}
-        for d in docs:
-            ftype = d.get("file_type", "OTHER")
-            by_type[ftype] = by_type.get(ftype, 0) + 1
+        get_documents_metadata(force_refresh=recompute)
         
         return {
             "ok": True,
             "stats": {
-                "total_documents": total_docs,
-                "total_chunks": total_chunks,
-                "total_characters": total_chars,
-                "estimated_words": total_chars // 5,  # Aproximación
-                "documents_by_type": by_type
+                **get_kb_stats(recompute=recompute).as_dict(),
+                "embedding_cache": get_embedding_cache_stats(),
+                "chunk_text_cache": _text_cache.stats(),
+                "result_cache": _result_cache.stats(),
+                "access_metrics": _metrics_writer.stats(),
+                "activity_cache": _activity_cache.stats(),
+                "cache_refresh": {**_refresher.stats(), "snapshot_version": _snapshot.version}
             }
         }
     except Exception as e:
@@ -352,7 +1908,8 @@ def get_document_stats() -> Dict[str, Any]:
         return {"ok": False, "error": str(e)}
 
 
-
-search_rag_tool = FunctionTool(search_documents)
+search_rag_tool = FunctionTool(search_documents_async)
+search_rag_batch_tool = FunctionTool(search_documents_batch)
 list_documents_tool = FunctionTool(list_available_documents)
-stats_tool = FunctionTool(get_document_stats)
\ No newline at end of file
+stats_tool = FunctionTool(get_document_stats)
+activities_tool = FunctionTool(get_document_activities)
\ No newline at end of file
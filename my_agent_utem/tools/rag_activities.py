@@ -0,0 +1,166 @@
+"""Actividades PDC estructuradas: estados L/NL/NA, dimensiones, filtros y formato ``dimensiones`` del reporte."""
+from __future__ import annotations
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Versión del extractor de ingestion/activities: al cambiarla, la ingesta vuelve a escribir las actividades
+ACTIVITIES_VERSION = 1
+ACTIVITIES_SUBCOLLECTION = "activities"
+
+STATUS_LABELS = {"L": "Logrado", "NL": "No Logrado", "NA": "No Aplica"}
+
+DIMENSION_TITLES = {
+    "dim1": "Dimensión N°I: Docencia y resultados del proceso de formación",
+    "dim2": "Dimensión N°II: Gestión estratégica y recursos institucionales",
+    "dim3": "Dimensión N°III: Aseguramiento interno de la calidad",
+    "dim4": "Dimensión N°IV: Vinculación con el Medio",
+    "dim5": "Dimensión N°V: Investigación, creación y/o innovación",
+}
+ROMAN_NUMERALS = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5}
+# Palabras que identifican cada dimensión en filtros escritos por el usuario
+DIMENSION_KEYWORDS = {
+    "dim1": ("docencia", "formacion"),
+    "dim2": ("gestion", "recursos"),
+    "dim3": ("aseguramiento", "calidad"),
+    "dim4": ("vinculacion", "medio"),
+    "dim5": ("investigacion", "creacion", "innovacion"),
+}
+UNASSIGNED_DIMENSION = "sin_dimension"
+
+# Reglas de clasificación de los prompts: "No logrado" incluye pendientes, en proceso y reprogramadas.
+# Se evalúan en orden y cada coincidencia se borra antes de la siguiente ("no logrado" no cuenta como "logrado").
+_STATUS_PATTERNS: Tuple[Tuple[str, "re.Pattern[str]"], ...] = (
+    ("NA", re.compile(r"\bno\s+aplica\b")),
+    ("NL", re.compile(
+        r"\bno\s+lograd[oa]s?\b|\bpendientes?\b|\ben\s+proceso\b|\ben\s+curso\b"
+        r"|\breprogramad[oa]s?\b|\batrasad[oa]s?\b"
+    )),
+    ("L", re.compile(r"\blograd[oa]s?\b|\b100\s*%")),
+)
+_STATUS_CODES = {"l": "L", "nl": "NL", "na": "NA", "n/a": "NA"}
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin tildes, conservando el largo (las posiciones valen para el texto original)."""
+    return "".join(unicodedata.normalize("NFD", c)[0] if c.isalpha() else c for c in (text or "").lower())
+
+
+def find_statuses(text: str) -> List[Tuple[str, int, int]]:
+    """(estado, inicio, fin) de cada mención de estado escrita con palabras."""
+    work = fold(text)
+    found = []
+    for code, pattern in _STATUS_PATTERNS:
+        for match in pattern.finditer(work):
+            found.append((code, match.start(), match.end()))
+        work = pattern.sub(lambda m: " " * len(m.group()), work)
+    return sorted(found, key=lambda item: item[1])
+
+
+def classify_status(value: Any) -> Optional[str]:
+    """Código L/NL/NA de un valor ("Logrado", "no logradas", "NL", ...); None si es ambiguo o no es un estado."""
+    text = " ".join(fold(str(value or "")).split())
+    if text in _STATUS_CODES:
+        return _STATUS_CODES[text]
+    codes = {code for code, _, _ in find_statuses(text)}
+    return codes.pop() if len(codes) == 1 else None
+
+
+def dimension_key(value: Any) -> Optional[str]:
+    """``dimN`` de un filtro: "dim2", "2", "II", "Dimensión N°II" o palabras como "docencia"."""
+    text = " ".join(fold(str(value or "")).replace("°", " ").replace("º", " ").split())
+    if not text:
+        return None
+    match = re.fullmatch(r"(?:dim(?:ension)?\s*(?:n\s*)?)?([ivx]+|\d)", text)
+    if match:
+        token = match.group(1)
+        number = int(token) if token.isdigit() else ROMAN_NUMERALS.get(token)
+        key = f"dim{number}"
+        return key if key in DIMENSION_TITLES else None
+    for key, keywords in DIMENSION_KEYWORDS.items():
+        if any(word in text for word in keywords):
+            return key
+    return None
+
+
+def filter_activities(
+    records: Iterable[Dict[str, Any]],
+    status: Optional[str] = None,
+    dimension: Optional[str] = None,
+    contains: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Actividades con el estado (código), la dimensión (``dimN``) y el texto indicados."""
+    wanted = fold(contains).strip() if contains else ""
+    return [
+        r for r in records
+        if (status is None or r.get("status") == status)
+        and (dimension is None or r.get("dimension") == dimension)
+        and (not wanted or wanted in fold(r.get("text", "")))
+    ]
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Conteos L/NL/NA y avance = logradas / total × 100."""
+    counts = Counter(r.get("status") for r in records)
+    total = counts["L"] + counts["NL"] + counts["NA"]
+    return {
+        "L": counts["L"],
+        "NL": counts["NL"],
+        "NA": counts["NA"],
+        "total": total,
+        "avance_pct": round(100.0 * counts["L"] / total, 1) if total else 0.0,
+    }
+
+
+def to_dimensiones(records: Iterable[Dict[str, Any]], max_chars: int = 300) -> Dict[str, Dict[str, Any]]:
+    """Estructura ``dimensiones`` de ``generate_pdf_report`` (las actividades sin dimensión van en ``sin_dimension``)."""
+    dimensiones: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        key = record.get("dimension") or UNASSIGNED_DIMENSION
+        entry = dimensiones.setdefault(key, {
+            "titulo": record.get("dimension_title") or DIMENSION_TITLES.get(key, "Sin dimensión"),
+            "criterio_objetivo": "",
+            "acciones": [],
+        })
+        entry["acciones"].append({
+            "texto": (record.get("text") or "")[:max_chars],
+            "fecha": record.get("date") or "No especificada",
+            "estado": STATUS_LABELS.get(record.get("status"), "N/A"),
+            "medios": list(record.get("annexes") or []) or ["N/A"],
+            "plan_mejora": record.get("plan_mejora") or "N/A",
+        })
+    return dict(sorted(dimensiones.items()))
+
+
+class ActivityCache:
+    """Actividades por documento, válidas mientras no cambie la versión del documento (LRU por documentos)."""
+
+    def __init__(self, max_docs: int = 256):
+        self.max_docs = max_docs
+        self._entries: "OrderedDict[str, Tuple[Any, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, doc_id: str, version: Any) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(doc_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, doc_id: str, version: Any, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[doc_id] = (version, records)
+            self._entries.move_to_end(doc_id)
+            while len(self._entries) > self.max_docs:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"documents": len(self._entries), "hits": self.hits, "misses": self.misses}
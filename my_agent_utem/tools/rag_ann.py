@@ -0,0 +1,155 @@
+"""Índice aproximado IVF (k-means + listas invertidas) para corpus grandes."""
+from __future__ import annotations
+import json
+import logging
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .rag_index import normalize_rows, select_top_k
+
+logger = logging.getLogger(__name__)
+
+ASSIGN_BATCH_ROWS = 65536
+
+
+class IVFIndex:
+    """Cuantizador grueso k-means (coseno) sobre las filas de una matriz normalizada.
+
+    Cada fila queda asignada a su centroide más cercano; ``order`` agrupa las
+    filas por lista y ``offsets[l]:offsets[l + 1]`` delimita la lista ``l``.
+    Una consulta solo evalúa las filas de las ``nprobe`` listas más cercanas,
+    con score exacto contra la matriz original.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, nprobe: int = 8):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        n_lists: int = 0,
+        nprobe: int = 8,
+        n_iter: int = 20,
+        sample_size: int = 0,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Entrena los centroides sobre una muestra y asigna todas las filas."""
+        n_rows = int(matrix.shape[0])
+        if n_lists <= 0:
+            n_lists = max(1, int(4 * np.sqrt(n_rows)))
+        n_lists = min(n_lists, max(n_rows, 1))
+
+        rng = np.random.default_rng(seed)
+        sample_size = sample_size or min(n_rows, n_lists * 64)
+        sample_rows = np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = _nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        return cls.from_centroids(centroids, matrix, nprobe=nprobe)
+
+    @classmethod
+    def from_centroids(cls, centroids: np.ndarray, matrix: np.ndarray, nprobe: int = 8) -> "IVFIndex":
+        """Asigna las filas de ``matrix`` a centroides ya entrenados."""
+        return cls.from_assignments(centroids, _nearest(matrix, centroids), nprobe=nprobe)
+
+    @classmethod
+    def from_assignments(cls, centroids: np.ndarray, assign: np.ndarray, nprobe: int = 8) -> "IVFIndex":
+        """Listas invertidas a partir de la lista asignada a cada fila."""
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.zeros(centroids.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=centroids.shape[0]), out=offsets[1:])
+        return cls(centroids, order, offsets, nprobe=nprobe)
+
+    def assignments(self) -> np.ndarray:
+        """Lista de cada fila (inverso de ``order``/``offsets``)."""
+        assign = np.empty(self.order.shape[0], dtype=np.int64)
+        assign[self.order] = np.repeat(np.arange(self.n_lists), np.diff(self.offsets))
+        return assign
+
+    def replace_rows(self, keep: np.ndarray, added: np.ndarray) -> "IVFIndex":
+        """Listas para la matriz ``[filas keep] + added`` con los mismos centroides.
+
+        Las filas conservadas mantienen su lista; solo las agregadas se
+        comparan contra los centroides (sin re-entrenar).
+        """
+        assign = np.concatenate([self.assignments()[keep], _nearest(added, self.centroids)])
+        return IVFIndex.from_assignments(self.centroids, assign, nprobe=self.nprobe)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Filas de las ``nprobe`` listas más cercanas a la consulta (normalizada)."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+        return np.concatenate(
+            [self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe]
+        )
+
+    def search(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        top_k: int,
+        similarity_threshold: float,
+        mask: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        rows = self.candidates(query, nprobe)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        if rows.size == 0:
+            return rows, np.array([], dtype=np.float32), 0
+        rows.sort()
+        local, scores, total = select_top_k(matrix[rows] @ query, top_k, similarity_threshold, None)
+        return rows[local], scores, total
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "order.npy"), self.order)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        with open(os.path.join(path, "ivf.json"), "w") as f:
+            json.dump({"engine": "ivf", "n_lists": self.n_lists, "nprobe": self.nprobe}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IVFIndex":
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "ivf.json")) as f:
+            meta = json.load(f)
+        return cls(
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "order.npy"), mmap_mode=mode),
+            np.load(os.path.join(path, "offsets.npy")),
+            nprobe=int(meta.get("nprobe", 8)),
+        )
+
+
+def _nearest(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Centroide más cercano (mayor producto punto) de cada fila, por bloques."""
+    assign = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], ASSIGN_BATCH_ROWS):
+        block = np.asarray(matrix[start:start + ASSIGN_BATCH_ROWS], dtype=np.float32)
+        assign[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assign
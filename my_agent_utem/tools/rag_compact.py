@@ -0,0 +1,108 @@
+"""Respuesta compacta para el LLM: sin duplicados, con presupuesto de tokens y chunks contiguos fusionados."""
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+MMR_LAMBDA = 0.7
+DUPLICATE_SIMILARITY = 0.95
+BLOCK_SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de tokens de Gemini para texto en español (~4 caracteres por token)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def mmr_order(vectors: np.ndarray, scores: np.ndarray) -> List[int]:
+    """Orden MMR de las posiciones, descartando casi-duplicados.
+
+    Los scores se normalizan a [0, 1] para que el criterio sirva con scores
+    coseno, RRF o BM25. ``vectors`` debe venir normalizado por fila.
+    """
+    n = len(scores)
+    if n == 0:
+        return []
+    rel = scores.astype(np.float32)
+    spread = float(rel.max() - rel.min())
+    rel = (rel - rel.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+
+    sims = vectors @ vectors.T
+    max_sim = np.full(n, -1.0, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    order: List[int] = []
+    while available.any():
+        mmr = np.where(available, MMR_LAMBDA * rel - (1 - MMR_LAMBDA) * np.maximum(max_sim, 0), -np.inf)
+        best = int(np.argmax(mmr))
+        available[best] = False
+        if max_sim[best] >= DUPLICATE_SIMILARITY:
+            continue
+        order.append(best)
+        max_sim = np.maximum(max_sim, sims[best])
+    return order
+
+
+def _format_range(start: int, end: int) -> str:
+    return f"Chunk {start}" if start == end else f"Chunks {start}-{end}"
+
+
+def _block_header(doc_name: str, start: int, end: int) -> str:
+    return f"📄 [{doc_name}] ({_format_range(start, end)})"
+
+
+def compact_contexts(
+    entries: List[Dict[str, Any]], vectors: np.ndarray, max_tokens: int
+) -> Tuple[str, List[Dict[str, Any]], List[int]]:
+    """Arma un único texto dentro de ``max_tokens``.
+
+    ``entries`` trae doc_id, doc_name, chunk_index, text y score, ordenados por
+    relevancia. Retorna (texto, fuentes, posiciones_usadas). Cada chunk se
+    cobra con su encabezado y separador; fusionar chunks contiguos solo ahorra.
+    """
+    selected: List[int] = []
+    budget = max_tokens
+    for pos in mmr_order(vectors, np.asarray([e["score"] for e in entries], dtype=np.float32)):
+        entry = entries[pos]
+        header = _block_header(entry["doc_name"], entry["chunk_index"], entry["chunk_index"])
+        cost = estimate_tokens(f"{header}\n{entry['text']}{BLOCK_SEPARATOR}")
+        if cost > budget:
+            continue
+        selected.append(pos)
+        budget -= cost
+
+    blocks: List[Dict[str, Any]] = []
+    by_doc: Dict[str, List[int]] = {}
+    for pos in selected:
+        by_doc.setdefault(entries[pos]["doc_id"], []).append(pos)
+    for positions in by_doc.values():
+        positions.sort(key=lambda p: entries[p]["chunk_index"])
+        current: List[int] = []
+        for pos in positions:
+            if current and entries[pos]["chunk_index"] != entries[current[-1]]["chunk_index"] + 1:
+                blocks.append(_make_block(entries, current))
+                current = []
+            current.append(pos)
+        if current:
+            blocks.append(_make_block(entries, current))
+
+    blocks.sort(key=lambda b: b["score"], reverse=True)
+    text = BLOCK_SEPARATOR.join(
+        f"{_block_header(b['doc_name'], b['start'], b['end'])}\n{b['text']}" for b in blocks
+    )
+    sources = [
+        {"doc_name": b["doc_name"], "chunks": _format_range(b["start"], b["end"]), "score": round(b["score"], 3)}
+        for b in blocks
+    ]
+    return text, sources, selected
+
+
+def _make_block(entries: List[Dict[str, Any]], positions: List[int]) -> Dict[str, Any]:
+    first = entries[positions[0]]
+    return {
+        "doc_name": first["doc_name"],
+        "start": first["chunk_index"],
+        "end": entries[positions[-1]]["chunk_index"],
+        "score": max(float(entries[p]["score"]) for p in positions),
+        "text": "\n".join(entries[p]["text"] for p in positions),
+    }
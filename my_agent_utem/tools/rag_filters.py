@@ -0,0 +1,159 @@
+"""Filtros de metadata (tipo, año, carrera, facultad, fecha) como máscaras columnares sobre el índice."""
+from __future__ import annotations
+import re
+import unicodedata
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+CATEGORICAL_FIELDS = {
+    "file_type": ("file_type",),
+    "career": ("career", "carrera"),
+    "faculty": ("faculty", "facultad"),
+}
+YEAR_FIELDS = ("year", "anio", "año")
+DATE_FIELDS = ("document_date", "created_at")
+
+# Sin \b: los nombres de archivo usan "_" (palabra para \b) y a veces pegan el año ("informe2023")
+_YEAR_RE = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+
+
+def _normalize(value: Any) -> str:
+    text = unicodedata.normalize("NFD", str(value).lower())
+    return " ".join("".join(c for c in text if unicodedata.category(c) != "Mn").split())
+
+
+def _first(doc: Dict[str, Any], fields: Iterable[str]) -> Any:
+    for field in fields:
+        value = doc.get(field)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def to_timestamp(value: Any) -> Optional[float]:
+    """Timestamp (segundos) de un datetime, date o texto ISO; None si no se puede interpretar."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp()
+    return None
+
+
+def _doc_year(doc: Dict[str, Any], doc_ts: Optional[float]) -> int:
+    value = _first(doc, YEAR_FIELDS)
+    if value is not None:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+    match = _YEAR_RE.search(doc.get("doc_name", "") or "")
+    if match:
+        return int(match.group(0))
+    if doc.get("document_date") is not None and doc_ts is not None:
+        return datetime.fromtimestamp(doc_ts, tz=timezone.utc).year
+    return 0
+
+
+class MetadataColumns:
+    """Atributos de los documentos en arreglos columnares, alineados con un ``ChunkIndex``.
+
+    Cada documento tiene un código por atributo categórico (-1 = sin valor),
+    un año y una fecha. ``row_doc[i]`` es la posición del documento de la fila
+    ``i`` del índice (``len(doc_ids)`` si el documento no está en la metadata),
+    así un filtro se evalúa sobre los documentos y se expande a las filas con
+    un solo ``take``.
+    """
+
+    def __init__(self, docs: Dict[str, Dict[str, Any]], index_doc_ids: np.ndarray):
+        self.doc_ids: List[str] = list(docs)
+        positions = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        n_docs = len(self.doc_ids)
+
+        self.vocabularies: Dict[str, List[str]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for name, fields in CATEGORICAL_FIELDS.items():
+            vocabulary: Dict[str, int] = {}
+            codes = np.full(n_docs, -1, dtype=np.int32)
+            for i, doc in enumerate(docs.values()):
+                value = _first(doc, fields)
+                if value is not None:
+                    codes[i] = vocabulary.setdefault(str(value), len(vocabulary))
+            self.vocabularies[name] = list(vocabulary)
+            self.codes[name] = codes
+
+        self.dates = np.full(n_docs, np.nan, dtype=np.float64)
+        self.years = np.zeros(n_docs, dtype=np.int32)
+        for i, doc in enumerate(docs.values()):
+            ts = to_timestamp(_first(doc, DATE_FIELDS))
+            if ts is not None:
+                self.dates[i] = ts
+            self.years[i] = _doc_year(doc, ts)
+
+        if len(index_doc_ids):
+            unique, inverse = np.unique(index_doc_ids.astype(str), return_inverse=True)
+            unique_pos = np.asarray([positions.get(d, n_docs) for d in unique], dtype=np.int32)
+            self.row_doc = unique_pos[inverse]
+        else:
+            self.row_doc = np.zeros(0, dtype=np.int32)
+
+    def values(self) -> Dict[str, List[Any]]:
+        """Valores disponibles por filtro (para orientar al usuario)."""
+        available = {name: sorted(vocab) for name, vocab in self.vocabularies.items() if vocab}
+        years = sorted({int(y) for y in self.years if y})
+        if years:
+            available["year"] = years
+        return available
+
+    def doc_selection(
+        self,
+        filters: Dict[str, Any],
+        doc_ids: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """Máscara por documento de los que cumplen ``filters`` (y están en ``doc_ids``, si se da)."""
+        keep = np.ones(len(self.doc_ids), dtype=bool)
+        if doc_ids is not None:
+            keep &= np.isin(np.asarray(self.doc_ids, dtype=object), list(doc_ids))
+
+        for name in CATEGORICAL_FIELDS:
+            if filters.get(name):
+                keep &= np.isin(self.codes[name], self._matching_codes(name, filters[name]))
+        if filters.get("year"):
+            keep &= self.years == int(filters["year"])
+        if filters.get("date_from") or filters.get("date_to"):
+            start = to_timestamp(filters.get("date_from")) if filters.get("date_from") else -np.inf
+            end = to_timestamp(filters.get("date_to")) if filters.get("date_to") else np.inf
+            if start is None or end is None:
+                raise ValueError("date_from y date_to deben tener formato YYYY-MM-DD")
+            if filters.get("date_to") and len(str(filters["date_to"])) <= 10:
+                end += 86400  # Fecha sin hora: incluye el día completo
+            with np.errstate(invalid="ignore"):
+                keep &= (self.dates >= start) & (self.dates < end)
+        return keep
+
+    def row_mask(self, doc_keep: np.ndarray) -> np.ndarray:
+        """Expande una máscara por documento a las filas del índice."""
+        return np.append(doc_keep, False)[self.row_doc]
+
+    def selected_ids(self, doc_keep: np.ndarray) -> List[str]:
+        return [self.doc_ids[i] for i in np.flatnonzero(doc_keep)]
+
+    def _matching_codes(self, name: str, value: Any) -> List[int]:
+        """Códigos cuyo valor coincide (sin tildes ni mayúsculas; basta que uno contenga al otro)."""
+        wanted = _normalize(value)
+        codes = []
+        for code, candidate in enumerate(self.vocabularies[name]):
+            candidate = _normalize(candidate)
+            if wanted and candidate and (wanted in candidate or candidate in wanted):
+                codes.append(code)
+        return codes
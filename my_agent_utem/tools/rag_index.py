@@ -0,0 +1,478 @@
+"""Índice vectorial residente para la búsqueda RAG."""
+from __future__ import annotations
+import json
+import logging
+import os
+import shutil
+import time
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .rag_lexical import BM25Index
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_KEEP_VERSIONS = 2
+
+STORAGE_TYPES = ("float32", "float16", "int8")
+QUANTIZE_BLOCK_ROWS = 4096
+
+
+class ChunkIndex:
+    """Matriz de embeddings normalizados (float32) con arreglos paralelos de ids.
+
+    La fila ``i`` de ``matrix`` corresponde al chunk ``chunk_ids[i]`` del
+    documento ``doc_ids[i]``. Como las filas están pre-normalizadas, la
+    similitud coseno contra todo el corpus es un único producto matriz-vector.
+    ``texts`` puede ser None: el texto se pide después, solo para las filas ganadoras.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        doc_ids: np.ndarray,
+        chunk_ids: np.ndarray,
+        chunk_indexes: np.ndarray,
+        texts: Optional[List[str]],
+        ann: Any = None,
+    ):
+        self.matrix = matrix
+        self.doc_ids = doc_ids
+        self.chunk_ids = chunk_ids
+        self.chunk_indexes = chunk_indexes
+        self.texts = texts
+        # Índice aproximado opcional (p. ej. rag_ann.IVFIndex); None = búsqueda exacta
+        self.ann = ann
+        # Copia cuantizada para la primera pasada (ver ``quantize``)
+        self.storage = "float32"
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.rescore_factor = 4
+        # Índice BM25 opcional sobre el texto de los chunks (ver ``build_lexical``)
+        self.lexical: Optional[BM25Index] = None
+        # Ruteo opcional por documento (rag_router.DocumentRouter) para consultas sin filtro
+        self.router: Any = None
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    @classmethod
+    def empty(cls, dim: int = 0) -> "ChunkIndex":
+        return cls(
+            np.zeros((0, dim), dtype=np.float32),
+            np.array([], dtype=object),
+            np.array([], dtype=object),
+            np.array([], dtype=np.int32),
+            [],
+        )
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]]) -> "ChunkIndex":
+        """Construye el índice desde registros con doc_id, chunk_id, chunk_index, text y embedding."""
+        vectors: List[List[float]] = []
+        doc_ids: List[str] = []
+        chunk_ids: List[str] = []
+        chunk_indexes: List[int] = []
+        texts: List[str] = []
+        dim: Optional[int] = None
+
+        for rec in records:
+            embedding = rec.get("embedding")
+            if not embedding:
+                continue
+            if dim is None:
+                dim = len(embedding)
+            elif len(embedding) != dim:
+                logger.warning(
+                    f"Embedding con dimensión {len(embedding)} != {dim} "
+                    f"({rec.get('doc_id')}/{rec.get('chunk_id')}), se omite"
+                )
+                continue
+            vectors.append(embedding)
+            doc_ids.append(rec["doc_id"])
+            chunk_ids.append(rec["chunk_id"])
+            chunk_indexes.append(int(rec.get("chunk_index", 0) or 0))
+            texts.append(rec.get("text", ""))
+
+        if dim is None:
+            return cls.empty()
+
+        return cls(
+            normalize_rows(np.asarray(vectors, dtype=np.float32)),
+            np.asarray(doc_ids, dtype=object),
+            np.asarray(chunk_ids, dtype=object),
+            np.asarray(chunk_indexes, dtype=np.int32),
+            texts,
+        )
+
+    def replace_documents(
+        self, doc_ids: Iterable[str], records: Iterable[Dict[str, Any]]
+    ) -> "ChunkIndex":
+        """Retorna un índice nuevo sin las filas de ``doc_ids`` y con ``records`` agregados.
+
+        El índice actual no se modifica, así las búsquedas en curso siguen
+        viendo una versión consistente hasta que se reemplace la referencia.
+        Si no se quita ni agrega ninguna fila se retorna el mismo índice (sin
+        copiar una matriz que puede ser un memmap).
+        """
+        doc_ids = list(doc_ids)
+        keep = ~self.doc_mask(doc_ids) if len(self) else np.zeros(0, dtype=bool)
+        added = ChunkIndex.build(records)
+        if not len(added) and keep.all():
+            return self
+
+        if len(added) and len(self) and added.dim != self.dim:
+            logger.warning(f"Dimensión {added.dim} != {self.dim}, se descartan chunks nuevos")
+            added = ChunkIndex.empty(self.dim)
+        if not len(self):
+            return added
+        if not len(added):
+            added = ChunkIndex.empty(self.dim)
+
+        merged = ChunkIndex(
+            np.concatenate([self.matrix[keep], added.matrix]),
+            np.concatenate([self.doc_ids[keep], added.doc_ids]),
+            np.concatenate([self.chunk_ids[keep], added.chunk_ids]),
+            np.concatenate([self.chunk_indexes[keep], added.chunk_indexes]),
+            None if self.texts is None else [t for t, k in zip(self.texts, keep) if k] + added.texts,
+        )
+        if self.ann is not None and len(merged):
+            merged.ann = self.ann.replace_rows(keep, added.matrix)
+        if self.router is not None and len(merged):
+            merged.router = self.router.replace_documents(merged.matrix, merged.doc_ids, doc_ids)
+        if self.codes is not None:
+            # Solo se cuantizan las filas nuevas: las conservadas reutilizan sus códigos
+            codes, scales = quantize_rows(added.matrix, self.storage)
+            merged.storage, merged.rescore_factor = self.storage, self.rescore_factor
+            merged.codes = np.concatenate([self.codes[keep], codes])
+            merged.scales = None if scales is None else np.concatenate([self.scales[keep], scales])
+        elif self.storage != "float32":
+            merged.quantize(self.storage, self.rescore_factor)
+        if self.lexical is not None:
+            merged.lexical = self.lexical.replace_rows(keep, added.texts)
+        return merged
+
+    def doc_mask(self, doc_ids: Iterable[str]) -> np.ndarray:
+        """Máscara booleana de las filas que pertenecen a ``doc_ids``."""
+        return np.isin(self.doc_ids, list(doc_ids))
+
+    def build_lexical(self) -> None:
+        """Construye el índice BM25 sobre el texto de los chunks."""
+        if self.texts is None:
+            raise ValueError("El índice no tiene el texto de los chunks en memoria")
+        self.lexical = BM25Index.build(self.texts)
+
+    def release_texts(self) -> None:
+        """Descarta el texto residente; BM25 (si existe) no lo necesita para buscar."""
+        self.texts = None
+
+    def search_lexical(
+        self,
+        query: str,
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Búsqueda BM25; retorna (filas, scores, filas_con_algún_término)."""
+        if self.lexical is None or len(self) == 0 or top_k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32), 0
+        return select_top_k(self.lexical.score(query), top_k, 1e-9, mask)
+
+    def quantize(self, storage: str, rescore_factor: int = 4) -> None:
+        """Agrega una copia float16 o int8 (escala por fila) de la matriz.
+
+        La primera pasada usa la copia cuantizada y los ``top_k * rescore_factor``
+        mejores candidatos se re-evalúan en float32 contra ``matrix``. Si
+        ``matrix`` es un memmap, en memoria residente solo queda la copia
+        cuantizada y las páginas de los candidatos.
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Tipo de almacenamiento no soportado: {storage}")
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+        if storage == "float32" or len(self) == 0:
+            self.codes, self.scales = None, None
+            return
+
+        self.codes, self.scales = quantize_rows(self.matrix, storage)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Bytes de la representación usada en la primera pasada."""
+        if self.codes is not None:
+            return int(self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+        return int(self.matrix.nbytes)
+
+    def search(
+        self,
+        query_vector: Iterable[float],
+        top_k: int,
+        similarity_threshold: float,
+        mask: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        fanout: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Retorna (filas, scores, candidatos_sobre_umbral) ordenados por score descendente.
+
+        Con un índice ``ann`` solo se evalúan las filas de las listas sondeadas,
+        y con almacenamiento cuantizado el conteo sale de la primera pasada, por
+        lo que en ambos casos el conteo de candidatos es aproximado. Sin
+        ``mask`` y con ``router``, solo se evalúan los chunks de los ``fanout``
+        documentos más cercanos (``fanout=0`` recorre todo el corpus).
+        """
+        if len(self) == 0 or top_k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32), 0
+        return self.search_many([query_vector], top_k, similarity_threshold, mask, nprobe, fanout)[0]
+
+    def search_many(
+        self,
+        query_vectors: Iterable[Iterable[float]],
+        top_k: int,
+        similarity_threshold: float,
+        mask: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        fanout: Optional[int] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray, int]]:
+        """Como ``search`` para varias consultas, con un solo producto matriz-matriz."""
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if len(self) == 0 or top_k <= 0:
+            return [self.search([], 0, similarity_threshold) for _ in range(len(queries))]
+
+        queries = normalize_rows(queries.reshape(-1, self.dim))
+        if self.routes(mask, fanout):
+            return [
+                self.router.search(self.matrix, q, top_k, similarity_threshold, fanout)
+                for q in queries
+            ]
+        if self.ann is not None:
+            return [
+                self.ann.search(self.matrix, q, top_k, similarity_threshold, mask, nprobe)
+                for q in queries
+            ]
+        if self.codes is not None:
+            return self._search_quantized(queries, top_k, similarity_threshold, mask)
+
+        scores = self.matrix @ queries.T
+        return [
+            select_top_k(scores[:, j], top_k, similarity_threshold, mask)
+            for j in range(scores.shape[1])
+        ]
+
+    def similarities(self, query_vector: Iterable[float], rows: np.ndarray) -> np.ndarray:
+        """Coseno exacto (float32) de la consulta contra las filas ``rows``."""
+        if rows.size == 0:
+            return np.array([], dtype=np.float32)
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, self.dim))[0]
+        return np.asarray(self.matrix[rows], dtype=np.float32) @ query
+
+    def routes(self, mask: Optional[np.ndarray] = None, fanout: Optional[int] = None) -> bool:
+        """True si una búsqueda con ``mask`` y ``fanout`` pasa por el ruteo por documento."""
+        if self.router is None or mask is not None:
+            return False
+        fanout = self.router.fanout if fanout is None else fanout
+        return 0 < fanout < self.router.n_docs
+
+    def _search_quantized(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        similarity_threshold: float,
+        mask: Optional[np.ndarray],
+    ) -> List[Tuple[np.ndarray, np.ndarray, int]]:
+        approx = np.empty((len(self), queries.shape[0]), dtype=np.float32)
+        for start in range(0, len(self), QUANTIZE_BLOCK_ROWS):
+            block = self.codes[start:start + QUANTIZE_BLOCK_ROWS].astype(np.float32)
+            block_scores = block @ queries.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + block.shape[0], None]
+            approx[start:start + block.shape[0]] = block_scores
+
+        # Margen para no perder candidatos justo bajo el umbral por el error de cuantización
+        margin = 0.02 if self.scales is not None else 0.005
+        results = []
+        for j in range(queries.shape[0]):
+            shortlist, _, _ = select_top_k(
+                approx[:, j], top_k * self.rescore_factor, similarity_threshold - margin, mask
+            )
+            total = int(np.count_nonzero(
+                (approx[:, j] >= similarity_threshold) & (mask if mask is not None else True)
+            ))
+            if shortlist.size == 0:
+                results.append((shortlist, np.array([], dtype=np.float32), 0))
+                continue
+            shortlist.sort()
+            exact = np.asarray(self.matrix[shortlist], dtype=np.float32) @ queries[j]
+            local, scores, _ = select_top_k(exact, top_k, similarity_threshold, None)
+            results.append((shortlist[local], scores, total))
+        return results
+
+
+def quantize_rows(matrix: np.ndarray, storage: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """(códigos, escalas_por_fila) float16 o int8 de ``matrix``, leída por bloques (puede ser memmap)."""
+    n_rows, dim = int(matrix.shape[0]), int(matrix.shape[1])
+    if storage == "float16":
+        codes = np.empty((n_rows, dim), dtype=np.float16)
+        scales = None
+    else:
+        codes = np.empty((n_rows, dim), dtype=np.int8)
+        scales = np.empty(n_rows, dtype=np.float32)
+    for start in range(0, n_rows, QUANTIZE_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + QUANTIZE_BLOCK_ROWS], dtype=np.float32)
+        end = start + block.shape[0]
+        if scales is None:
+            codes[start:end] = block
+        else:
+            row_scale = np.abs(block).max(axis=1) / 127.0
+            row_scale[row_scale == 0] = 1.0
+            codes[start:end] = np.rint(block / row_scale[:, None])
+            scales[start:end] = row_scale
+    return codes, scales
+
+
+def select_top_k(
+    scores: np.ndarray, top_k: int, similarity_threshold: float, mask: Optional[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Selecciona los ``top_k`` mejores scores sobre el umbral, ordenados de mayor a menor."""
+    keep = scores >= similarity_threshold
+    if mask is not None:
+        keep &= mask
+    rows = np.flatnonzero(keep)
+    total = int(rows.size)
+
+    if rows.size > top_k:
+        part = np.argpartition(-scores[rows], top_k - 1)[:top_k]
+        rows = rows[part]
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    return rows, scores[rows], total
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza cada fila a norma 1; las filas casi nulas quedan en cero."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    safe = np.where(norms < 1e-9, 1.0, norms)
+    out = matrix / safe
+    out[norms[:, 0] < 1e-9] = 0.0
+    return out.astype(np.float32, copy=False)
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def save_snapshot(
+    index: ChunkIndex,
+    root: str,
+    docs: Dict[str, Dict[str, Any]],
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Escribe una versión del índice en ``root`` y la publica de forma atómica.
+
+    Cada versión vive en su propio subdirectorio (``embeddings.npy`` float32,
+    ``chunks.json`` con ids (y textos, si están en memoria), los postings BM25
+    en ``lexical/``, los centroides por documento en ``router/`` y ``manifest.json``); el archivo ``CURRENT`` apunta a la
+    versión vigente y se reemplaza con ``os.replace``.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = f"v{int(time.time() * 1000)}-{os.getpid()}"
+    tmp_dir = os.path.join(root, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "embeddings.npy"), np.ascontiguousarray(index.matrix, dtype=np.float32))
+    with open(os.path.join(tmp_dir, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "doc_ids": [str(d) for d in index.doc_ids],
+            "chunk_ids": [str(c) for c in index.chunk_ids],
+            "chunk_indexes": index.chunk_indexes.tolist(),
+            "texts": index.texts,
+        }, f, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "created_at": time.time(),
+            "rows": len(index),
+            "dim": index.dim,
+            "docs": docs,
+            "ann": "ivf" if index.ann is not None else None,
+            "lexical": index.lexical is not None,
+            "router": index.router is not None,
+            **(extra or {}),
+        }, f, ensure_ascii=False, default=_json_default)
+    if index.ann is not None:
+        index.ann.save(os.path.join(tmp_dir, "ivf"))
+    if index.lexical is not None:
+        index.lexical.save(os.path.join(tmp_dir, "lexical"))
+    if index.router is not None:
+        index.router.save(os.path.join(tmp_dir, "router"))
+
+    os.replace(tmp_dir, os.path.join(root, version))
+    pointer_tmp = os.path.join(root, f".CURRENT.{os.getpid()}")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, "CURRENT"))
+
+    _prune_snapshots(root, keep=version)
+    return version
+
+
+def _prune_snapshots(root: str, keep: str) -> None:
+    versions = sorted(
+        (d for d in os.listdir(root) if d.startswith("v") and d != keep),
+        reverse=True,
+    )
+    for old in versions[SNAPSHOT_KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def load_snapshot_matrix(root: str, version: str) -> np.ndarray:
+    """Matriz float32 de una versión guardada, abierta con ``np.memmap`` (solo lectura)."""
+    return np.load(os.path.join(root, version, "embeddings.npy"), mmap_mode="r")
+
+
+def load_snapshot(root: str) -> Optional[Tuple[ChunkIndex, Dict[str, Any]]]:
+    """Carga la versión vigente; la matriz se abre con ``np.memmap`` (solo lectura).
+
+    Varios procesos que cargan el mismo snapshot comparten las páginas de la
+    matriz a través del page cache del sistema operativo.
+    """
+    pointer = os.path.join(root, "CURRENT")
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        version_dir = os.path.join(root, f.read().strip())
+
+    with open(os.path.join(version_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        logger.warning(f"Snapshot con formato {manifest.get('format_version')} no soportado")
+        return None
+
+    matrix = load_snapshot_matrix(root, os.path.basename(version_dir))
+    with open(os.path.join(version_dir, "chunks.json"), encoding="utf-8") as f:
+        chunks = json.load(f)
+
+    index = ChunkIndex(
+        matrix,
+        np.asarray(chunks["doc_ids"], dtype=object),
+        np.asarray(chunks["chunk_ids"], dtype=object),
+        np.asarray(chunks["chunk_indexes"], dtype=np.int32),
+        chunks.get("texts"),
+    )
+    if len(index) != manifest.get("rows") or index.dim != manifest.get("dim"):
+        logger.warning("Snapshot inconsistente con su manifest, se ignora")
+        return None
+    if manifest.get("ann") == "ivf":
+        from .rag_ann import IVFIndex
+        index.ann = IVFIndex.load(os.path.join(version_dir, "ivf"))
+    if manifest.get("lexical"):
+        index.lexical = BM25Index.load(os.path.join(version_dir, "lexical"))
+    if manifest.get("router"):
+        from .rag_router import DocumentRouter
+        index.router = DocumentRouter.load(os.path.join(version_dir, "router"))
+    return index, manifest
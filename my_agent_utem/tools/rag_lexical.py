@@ -0,0 +1,178 @@
+"""Índice léxico BM25 en memoria y fusión por rango recíproco (RRF)."""
+from __future__ import annotations
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sin tildes, separando por caracteres no alfanuméricos."""
+    text = unicodedata.normalize("NFD", (text or "").lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return _TOKEN_RE.findall(text)
+
+
+class BM25Index:
+    """Índice invertido BM25 cuyas filas coinciden con las del ``ChunkIndex``.
+
+    Las listas de cada término se guardan concatenadas (``rows``/``tfs``,
+    delimitadas por ``offsets``) junto al largo de cada fila, y el peso BM25
+    de cada posting se calcula una vez. Así puntuar una consulta es sumar unas
+    pocas listas, y el índice se puede actualizar o persistir sin el texto.
+    """
+
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        rows: np.ndarray,
+        tfs: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.terms = terms
+        self.rows = rows
+        self.tfs = tfs
+        self.offsets = offsets
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.weights = self._weights()
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.lengths.size)
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.terms)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        term_rows: Dict[str, List[int]] = defaultdict(list)
+        term_tfs: Dict[str, List[int]] = defaultdict(list)
+        lengths: List[int] = []
+
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            counts: Dict[str, int] = defaultdict(int)
+            for token in tokens:
+                counts[token] += 1
+            for token, tf in counts.items():
+                term_rows[token].append(row)
+                term_tfs[token].append(tf)
+
+        terms = {term: i for i, term in enumerate(term_rows)}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in term_rows.values()], out=offsets[1:])
+        rows = np.fromiter((r for rs in term_rows.values() for r in rs), dtype=np.int64, count=int(offsets[-1]))
+        tfs = np.fromiter((t for ts in term_tfs.values() for t in ts), dtype=np.int32, count=int(offsets[-1]))
+        return cls(terms, rows, tfs, offsets, np.asarray(lengths, dtype=np.int32), k1, b)
+
+    def _weights(self) -> np.ndarray:
+        n_rows = self.n_rows
+        doc_len = self.lengths.astype(np.float32)
+        avg_len = float(doc_len.mean()) if n_rows else 0.0
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avg_len) if avg_len else np.full(n_rows, self.k1, dtype=np.float32)
+
+        df = np.diff(self.offsets)
+        idf = np.log(1 + (n_rows - df + 0.5) / (df + 0.5)).astype(np.float32)
+        tf = self.tfs.astype(np.float32)
+        return (np.repeat(idf, df) * tf * (self.k1 + 1) / (tf + norm[self.rows])).astype(np.float32)
+
+    def score(self, query: str) -> np.ndarray:
+        """Score BM25 de cada fila para la consulta (0 si no comparte términos)."""
+        scores = np.zeros(self.n_rows, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is not None:
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                scores[self.rows[start:end]] += self.weights[start:end]
+        return scores
+
+    def replace_rows(self, keep: np.ndarray, texts: Iterable[str]) -> "BM25Index":
+        """Índice nuevo con las filas ``keep`` (renumeradas) seguidas de ``texts``.
+
+        Solo se tokeniza el texto agregado; idf y largo promedio se recalculan
+        sobre el resultado, igual que en un ``build`` completo.
+        """
+        added = BM25Index.build(texts, self.k1, self.b)
+        new_row = np.cumsum(keep) - 1
+        kept = keep[self.rows]
+        old_term_ids = np.repeat(np.arange(self.n_terms, dtype=np.int64), np.diff(self.offsets))
+
+        terms = dict(self.terms)
+        for term in added.terms:
+            terms.setdefault(term, len(terms))
+        added_map = np.asarray([terms[t] for t in added.terms], dtype=np.int64)
+        added_term_ids = np.repeat(added_map, np.diff(added.offsets)) if added.n_terms else np.zeros(0, dtype=np.int64)
+
+        term_ids = np.concatenate([old_term_ids[kept], added_term_ids])
+        rows = np.concatenate([new_row[self.rows[kept]], added.rows + int(keep.sum())])
+        tfs = np.concatenate([self.tfs[kept], added.tfs])
+        order = np.lexsort((rows, term_ids))
+        term_ids, rows, tfs = term_ids[order], rows[order], tfs[order]
+
+        # Se descartan los términos que quedaron sin postings
+        counts = np.bincount(term_ids, minlength=len(terms))
+        alive = np.flatnonzero(counts)
+        names = list(terms)
+        offsets = np.zeros(alive.size + 1, dtype=np.int64)
+        np.cumsum(counts[alive], out=offsets[1:])
+        return BM25Index(
+            {names[t]: i for i, t in enumerate(alive)},
+            rows.astype(np.int64),
+            tfs.astype(np.int32),
+            offsets,
+            np.concatenate([self.lengths[keep], added.lengths]).astype(np.int32),
+            self.k1,
+            self.b,
+        )
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "rows.npy"), self.rows)
+        np.save(os.path.join(path, "tfs.npy"), self.tfs)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        np.save(os.path.join(path, "lengths.npy"), self.lengths)
+        with open(os.path.join(path, "bm25.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": list(self.terms)}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(os.path.join(path, "bm25.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            {term: i for i, term in enumerate(meta["terms"])},
+            np.load(os.path.join(path, "rows.npy")),
+            np.load(os.path.join(path, "tfs.npy")),
+            np.load(os.path.join(path, "offsets.npy")),
+            np.load(os.path.join(path, "lengths.npy")),
+            meta["k1"],
+            meta["b"],
+        )
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[np.ndarray], top_k: int, k: int = RRF_K
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Fusiona listas de filas ordenadas con RRF: score = Σ 1 / (k + rango)."""
+    fused: Dict[int, float] = defaultdict(float)
+    for rows in ranked_lists:
+        for rank, row in enumerate(rows.tolist(), start=1):
+            fused[row] += 1.0 / (k + rank)
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    rows = np.asarray([r for r, _ in best], dtype=np.int64)
+    scores = np.asarray([s for _, s in best], dtype=np.float32)
+    return rows, scores
@@ -0,0 +1,169 @@
+"""Escritura asíncrona y agrupada de métricas de acceso a chunks."""
+from __future__ import annotations
+import atexit
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+from google.cloud import firestore
+
+logger = logging.getLogger(__name__)
+
+# Código gRPC de un chunk que ya no existe: su incremento se descarta sin reintentar
+NOT_FOUND_CODE = 5
+# Flush fallidos que se reintentan antes de descartar los incrementos de un chunk
+MAX_FLUSH_RETRIES = 3
+
+
+class AccessMetricsWriter:
+    """Acumula incrementos de ``access_count`` por chunk y los escribe en segundo plano.
+
+    Los accesos se combinan por (doc_id, chunk_id): un chunk consultado N veces
+    entre dos flush cuesta una sola escritura con ``Increment(N)``. El flush
+    ocurre cada ``flush_interval`` segundos, al superar ``max_pending`` chunks
+    distintos o al terminar el proceso. Si la escritura de un chunk falla, su
+    incremento vuelve a lo pendiente y se reintenta en los siguientes flush
+    (hasta ``MAX_FLUSH_RETRIES``); si el chunk ya no existe se descarta. Tras
+    ``stop`` cada ``record`` escribe de inmediato.
+    """
+
+    def __init__(
+        self,
+        get_db: Callable[[], Any],
+        collection_name: str,
+        flush_interval: float = 10.0,
+        max_pending: int = 500,
+    ):
+        self._get_db = get_db
+        self._collection_name = collection_name
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Counter = Counter()
+        self._failures: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed_writes = 0
+        self.recorded_accesses = 0
+        self.failed_flushes = 0
+        self.dropped_accesses = 0
+        self.missing_chunks = 0
+
+    def record(self, keys: Iterable[Tuple[str, str]]) -> None:
+        """Registra accesos sin bloquear; el flush lo hace el hilo de fondo."""
+        with self._lock:
+            for key in keys:
+                self._pending[key] += 1
+                self.recorded_accesses += 1
+            pending = len(self._pending)
+            stopped = self._stopped.is_set()
+            if self._thread is None and not stopped:
+                self._start()
+        if stopped:
+            # Sin hilo de fondo nadie más escribiría estos incrementos
+            self.flush()
+        elif pending >= self.max_pending:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Escribe los incrementos acumulados; retorna la cantidad de chunks escritos.
+
+        Cada incremento es una escritura independiente del ``BulkWriter``: un
+        chunk que ya no existe (re-indexado o eliminado) se descarta solo, sin
+        arrastrar a los demás; otros errores vuelven a lo pendiente.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+            if not pending:
+                return 0
+
+            items = {}
+            written, missing, failed = [], [], []
+
+            def on_error(failure, _writer) -> bool:
+                item = items[failure.operation.reference.path]
+                (missing if failure.code == NOT_FOUND_CODE else failed).append(item)
+                return False
+
+            try:
+                db = self._get_db()
+                writer = db.bulk_writer()
+                writer.on_write_result(lambda reference, _result, _writer: written.append(items[reference.path]))
+                writer.on_write_error(on_error)
+                for (doc_id, chunk_id), count in pending.items():
+                    chunk_ref = db.collection(self._collection_name).document(
+                        doc_id
+                    ).collection("chunks").document(chunk_id)
+                    items[chunk_ref.path] = ((doc_id, chunk_id), count)
+                    writer.update(chunk_ref, {
+                        "access_count": firestore.Increment(count),
+                        "last_accessed": firestore.SERVER_TIMESTAMP
+                    })
+                writer.close()
+            except Exception as e:
+                logger.warning(f"Error actualizando métricas ({len(pending)} chunks): {e}")
+                settled = {key for key, _ in written + missing + failed}
+                failed += [(key, count) for key, count in pending.items() if key not in settled]
+
+            with self._lock:
+                for key, _ in written + missing:
+                    self._failures.pop(key, None)
+                self.flushed_writes += len(written)
+                self.missing_chunks += len(missing)
+            if failed:
+                logger.warning(f"Error actualizando métricas de {len(failed)} chunks, se reintentarán")
+                self._requeue(failed)
+            return len(written)
+
+    def _requeue(self, items: Iterable[Tuple[Tuple[str, str], int]]) -> None:
+        """Devuelve a lo pendiente los incrementos de escrituras fallidas."""
+        dropped = 0
+        with self._lock:
+            self.failed_flushes += 1
+            for key, count in items:
+                self._failures[key] += 1
+                if self._failures[key] > MAX_FLUSH_RETRIES:
+                    del self._failures[key]
+                    dropped += count
+                else:
+                    self._pending[key] += count
+            self.dropped_accesses += dropped
+        if dropped:
+            logger.error(f"Se descartan {dropped} accesos tras {MAX_FLUSH_RETRIES} reintentos fallidos")
+
+    def stop(self) -> None:
+        """Detiene el hilo de fondo y escribe lo pendiente."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_chunks": len(self._pending),
+                "recorded_accesses": self.recorded_accesses,
+                "flushed_writes": self.flushed_writes,
+                "failed_flushes": self.failed_flushes,
+                "dropped_accesses": self.dropped_accesses,
+                "missing_chunks": self.missing_chunks,
+            }
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="rag-metrics", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Error en flush de métricas: {e}")
@@ -0,0 +1,117 @@
+"""Índice de nombres de documentos para resolver el filtro ``document_name``."""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+FUZZY_MIN_SIMILARITY = 0.3
+TOKEN_MIN_OVERLAP = 0.5
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class DocNameIndex:
+    """Nombres normalizados, mapa token → doc_ids y trigrama → doc_ids, construidos una vez por refresco.
+
+    ``resolve`` mantiene las reglas históricas de coincidencia (subcadena o al
+    menos la mitad de los tokens de la búsqueda) y agrega un ranking por
+    similitud, más coincidencia difusa por trigramas cuando no hay matches.
+    Los candidatos salen de los índices invertidos, sin recorrer todos los
+    documentos; un nombre vacío (o solo separadores) no coincide con ninguno.
+    """
+
+    def __init__(self, docs: Dict[str, Dict[str, Any]], normalize: Callable[[str], str]):
+        self.normalize = normalize
+        self.names: Dict[str, str] = {}
+        self.normalized: Dict[str, str] = {}
+        self.exact: Dict[str, List[str]] = defaultdict(list)
+        self.tokens: Dict[str, Set[str]] = defaultdict(set)
+        self.grams: Dict[str, Set[str]] = {}
+        self.gram_docs: Dict[str, Set[str]] = defaultdict(set)
+        self.max_name_len = 0
+
+        for doc_id, doc_data in docs.items():
+            name = doc_data.get("doc_name", "") or ""
+            norm = normalize(name)
+            self.names[doc_id] = name or "Unknown"
+            self.normalized[doc_id] = norm
+            if not norm:
+                continue
+            self.exact[norm].append(doc_id)
+            self.max_name_len = max(self.max_name_len, len(norm))
+            for token in norm.split():
+                self.tokens[token].add(doc_id)
+            self.grams[doc_id] = trigrams(norm)
+            for gram in self.grams[doc_id]:
+                self.gram_docs[gram].add(doc_id)
+
+    def resolve(self, document_name: str, max_candidates: int = 5) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Retorna (doc_ids_a_buscar, candidatos_rankeados).
+
+        Si no hay coincidencias, la lista de doc_ids queda vacía y los
+        candidatos son los nombres más parecidos por trigramas.
+        """
+        norm_search = self.normalize(document_name or "")
+        if not norm_search:
+            return [], []
+
+        exact = self.exact.get(norm_search)
+        if exact:
+            return list(exact), [self._candidate(d, 1.0) for d in exact]
+
+        search_tokens = set(norm_search.split())
+        search_grams = trigrams(norm_search)
+        token_hits: Dict[str, int] = defaultdict(int)
+        for token in search_tokens:
+            for doc_id in self.tokens.get(token, ()):
+                token_hits[doc_id] += 1
+
+        scored: Dict[str, float] = {}
+        for doc_id in self._substring_matches(norm_search):
+            scored[doc_id] = 0.9 + 0.1 * _jaccard(search_grams, self.grams[doc_id])
+        for doc_id, hits in token_hits.items():
+            overlap = hits / len(search_tokens)
+            if doc_id not in scored and overlap >= TOKEN_MIN_OVERLAP:
+                scored[doc_id] = 0.8 * overlap + 0.1 * _jaccard(search_grams, self.grams[doc_id])
+
+        if scored:
+            ranked = sorted(scored.items(), key=lambda item: item[1], reverse=True)
+            return [d for d, _ in ranked], [self._candidate(d, s) for d, s in ranked[:max_candidates]]
+
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in search_grams:
+            for doc_id in self.gram_docs.get(gram, ()):
+                shared[doc_id] += 1
+        fuzzy = sorted(
+            ((d, n / (len(search_grams) + len(self.grams[d]) - n)) for d, n in shared.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return [], [self._candidate(d, s) for d, s in fuzzy[:max_candidates] if s >= FUZZY_MIN_SIMILARITY]
+
+    def _substring_matches(self, norm_search: str) -> Set[str]:
+        """Documentos cuyo nombre contiene la búsqueda o está contenido en ella."""
+        # Nombre contenido en la búsqueda: sus subcadenas (hasta el nombre más largo) se buscan en ``exact``
+        matches = {
+            doc_id
+            for start in range(len(norm_search))
+            for end in range(start + 1, min(len(norm_search), start + self.max_name_len) + 1)
+            for doc_id in self.exact.get(norm_search[start:end], ())
+        }
+        # Búsqueda contenida en el nombre: el nombre tiene todos los trigramas internos de la búsqueda
+        if len(norm_search) >= 3:
+            inner = {norm_search[i:i + 3] for i in range(len(norm_search) - 2)}
+            candidates: Iterable[str] = set.intersection(*(self.gram_docs.get(g, set()) for g in inner))
+        else:
+            candidates = self.grams.keys()  # 1-2 caracteres: no hay trigramas que intersectar
+        matches.update(d for d in candidates if norm_search in self.normalized[d])
+        return matches
+
+    def _candidate(self, doc_id: str, score: float) -> Dict[str, Any]:
+        return {"doc_id": doc_id, "doc_name": self.names[doc_id], "match_score": round(score, 3)}
@@ -0,0 +1,183 @@
+"""Snapshot del cache de metadata e índice, y su recarga single-flight con stale-while-revalidate."""
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheSnapshot:
+    """Metadata e índice publicados juntos.
+
+    Nunca se modifica: cada recarga arma uno nuevo y reemplaza la referencia,
+    así una búsqueda que tomó el snapshot ve la metadata y el índice de la
+    misma versión aunque se publique otro mientras tanto.
+    """
+
+    __slots__ = ("docs", "index", "loaded_at", "version")
+
+    def __init__(self, docs: Dict[str, Dict[str, Any]], index: Any, loaded_at: float = 0.0, version: int = 0):
+        self.docs = docs
+        self.index = index
+        self.loaded_at = loaded_at
+        self.version = version
+
+    def age(self, now: Optional[float] = None) -> Optional[float]:
+        """Segundos desde la carga (None si nunca se cargó)."""
+        if not self.loaded_at:
+            return None
+        return (now or time.time()) - self.loaded_at
+
+
+class RefreshCoordinator:
+    """Deja correr a lo más una recarga a la vez y sirve el snapshot vencido mientras tanto.
+
+    - Edad menor a ``ttl_seconds``: no se hace nada.
+    - Vencido: el primero que lo nota lanza la recarga en un hilo de fondo y
+      todos siguen con el snapshot anterior (stale-while-revalidate).
+    - Sin datos, con ``force`` o con edad mayor a ``max_stale_seconds`` (si es
+      > 0): se espera la recarga; si ya hay una en curso se espera esa en vez
+      de lanzar otra.
+
+    Tras un fallo no se reintenta hasta ``retry_seconds`` salvo que no haya
+    datos o se fuerce; mientras tanto se sigue sirviendo el snapshot anterior.
+    Otros cambios del snapshot (los deltas del listener) pasan por
+    ``run_exclusive`` para no solaparse con una recarga.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], None],
+        loaded_at: Callable[[], float],
+        ttl_seconds: float,
+        max_stale_seconds: float = 0.0,
+        retry_seconds: float = 30.0,
+        name: str = "rag-refresh",
+    ):
+        self._refresh = refresh
+        self._loaded_at = loaded_at
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.retry_seconds = retry_seconds
+        self.name = name
+        self._lock = threading.Lock()
+        # Lo toma la recarga mientras corre y run_exclusive; las lecturas del snapshot no lo usan
+        self._exclusive = threading.Lock()
+        self._in_flight: Optional[threading.Event] = None
+        self._retry_at = 0.0
+        self.refreshes = 0
+        self.failures = 0
+        self.background_refreshes = 0
+        self.coalesced_waits = 0
+        self.stale_served = 0
+        self.max_stale_served_s = 0.0
+        self.last_duration_ms = 0.0
+        self.max_duration_ms = 0.0
+        self._total_duration_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def in_flight(self) -> bool:
+        return self._in_flight is not None
+
+    def ensure(self, force: bool = False) -> None:
+        """Deja el snapshot al día según la política; solo bloquea si hay que esperar la recarga."""
+        if self._must_wait(force):
+            self._run_or_join(force)
+
+    async def ensure_async(self, force: bool = False) -> None:
+        """Como ``ensure``; la espera corre en un hilo para no bloquear el event loop."""
+        if self._must_wait(force):
+            await asyncio.to_thread(self._run_or_join, force)
+
+    def run_exclusive(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta ``fn`` sin solaparse con una recarga ni con otro ``run_exclusive``."""
+        with self._exclusive:
+            return fn(*args)
+
+    def _fresh(self, now: float) -> bool:
+        loaded_at = self._loaded_at()
+        return bool(loaded_at) and now - loaded_at < self.ttl_seconds
+
+    def _must_wait(self, force: bool) -> bool:
+        now = time.time()
+        loaded_at = self._loaded_at()
+        if force or not loaded_at:
+            return True
+        age = now - loaded_at
+        if age < self.ttl_seconds:
+            return False
+        if self.max_stale_seconds and age >= self.max_stale_seconds and now >= self._retry_at:
+            return True
+        self._start_background(age, now)
+        return False
+
+    def _start_background(self, age: float, now: float) -> None:
+        with self._lock:
+            self.stale_served += 1
+            self.max_stale_served_s = max(self.max_stale_served_s, age)
+            # Re-chequeo bajo el lock: la recarga anterior pudo publicar recién
+            if self._in_flight is not None or now < self._retry_at or self._fresh(time.time()):
+                return
+            event = self._in_flight = threading.Event()
+            self.background_refreshes += 1
+        threading.Thread(target=self._run, args=(event,), name=self.name, daemon=True).start()
+
+    def _run_or_join(self, force: bool) -> None:
+        with self._lock:
+            if not force and self._fresh(time.time()):
+                return
+            event = self._in_flight
+            leader = event is None
+            if leader:
+                event = self._in_flight = threading.Event()
+            else:
+                self.coalesced_waits += 1
+        if leader:
+            self._run(event)
+        else:
+            event.wait()
+
+    def _run(self, event: threading.Event) -> None:
+        start = time.perf_counter()
+        error = None
+        try:
+            with self._exclusive:
+                self._refresh()
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Error recargando el cache: {e}")
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.refreshes += 1
+                self.last_duration_ms = duration_ms
+                self.max_duration_ms = max(self.max_duration_ms, duration_ms)
+                self._total_duration_ms += duration_ms
+                if error is not None:
+                    self.failures += 1
+                    self.last_error = error
+                    self._retry_at = time.time() + self.retry_seconds
+                self._in_flight = None
+            event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        loaded_at = self._loaded_at()
+        with self._lock:
+            return {
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "background_refreshes": self.background_refreshes,
+                "coalesced_waits": self.coalesced_waits,
+                "stale_served": self.stale_served,
+                "in_flight": self._in_flight is not None,
+                "last_duration_ms": round(self.last_duration_ms, 1),
+                "max_duration_ms": round(self.max_duration_ms, 1),
+                "avg_duration_ms": round(self._total_duration_ms / self.refreshes, 1) if self.refreshes else 0.0,
+                "staleness_s": round(time.time() - loaded_at, 1) if loaded_at else None,
+                "max_stale_served_s": round(self.max_stale_served_s, 1),
+                "last_error": self.last_error,
+            }
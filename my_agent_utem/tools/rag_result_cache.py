@@ -0,0 +1,202 @@
+"""Cache semántico de respuestas RAG: consultas casi idénticas reutilizan el resultado."""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_cache import normalize_query
+from .rag_lexical import tokenize
+
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def estimate_bytes(value: Any) -> int:
+    """Tamaño aproximado de una respuesta (strings y contenedores anidados)."""
+    if isinstance(value, str):
+        return len(value) + 49
+    if isinstance(value, dict):
+        return 64 + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_bytes(v) for v in value)
+    return 32
+
+
+def _terms(query: str) -> Tuple[str, ...]:
+    """Términos de la consulta, sin importar orden, tildes ni puntuación."""
+    return tuple(sorted(tokenize(query)))
+
+
+class _Bucket:
+    """Entradas de una misma combinación de filtros, con sus vectores apilados."""
+
+    def __init__(self):
+        self.entry_ids: List[int] = []
+        self.vector_ids: List[int] = []
+        self.matrix: Optional[np.ndarray] = None
+
+    def vectors(self, entries: Dict[int, Dict[str, Any]]) -> np.ndarray:
+        """Matriz de embeddings de las entradas que lo tienen (fila i ↔ ``vector_ids[i]``)."""
+        if self.matrix is None:
+            self.vector_ids = [e for e in self.entry_ids if entries[e]["vector"] is not None]
+            self.matrix = (
+                np.stack([entries[e]["vector"] for e in self.vector_ids])
+                if self.vector_ids else np.zeros((0, 0), dtype=np.float32)
+            )
+        return self.matrix
+
+
+class SemanticResultCache:
+    """Respuestas por (filtros, embedding de la consulta), acotadas por memoria.
+
+    Una consulta reutiliza una respuesta guardada si tiene el mismo texto
+    normalizado o si su embedding tiene similitud coseno >= ``similarity``
+    con el de la consulta guardada bajo los mismos filtros. Con
+    ``semantic=False`` (búsquedas híbridas o léxicas, donde un término exacto
+    cambia el resultado) el acierto por similitud exige además los mismos
+    términos: "anexo 3" y "anexo 4" tienen embeddings casi iguales pero no
+    comparten respuesta. Las entradas pertenecen a una versión del contenido
+    (la del snapshot publicado, que solo avanza si cambian chunks o metadata):
+    al consultar con otra versión se descartan todas, y lo que se guarde con
+    una versión que ya no es la vigente se ignora. La expulsión es LRU hasta
+    quedar bajo ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int, similarity: float = 0.97):
+        self.max_bytes = max_bytes
+        self.similarity = similarity
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._buckets: Dict[Hashable, _Bucket] = {}
+        self._bytes = 0
+        self._next_id = 0
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(
+        self,
+        version: Hashable,
+        key: Hashable,
+        query: str,
+        vector: Optional[np.ndarray],
+        semantic: bool = True,
+    ) -> Optional[Dict[str, Any]]:
+        """Respuesta guardada para la consulta, o None; ``version`` es la versión vigente del contenido."""
+        if not self.enabled:
+            return None
+        text = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                for entry_id in bucket.entry_ids:
+                    if self._entries[entry_id]["query"] == text:
+                        self.hits += 1
+                        return self._hit(entry_id, query)
+                if vector is not None:
+                    entry_id = self._similar(bucket, vector, None if semantic else _terms(query))
+                    if entry_id is not None:
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        return self._hit(entry_id, query)
+            self.misses += 1
+        return None
+
+    def _similar(self, bucket: _Bucket, vector: np.ndarray, terms: Optional[Tuple[str, ...]]) -> Optional[int]:
+        """Entrada más parecida sobre el umbral (con los mismos ``terms`` si se indican)."""
+        matrix = bucket.vectors(self._entries)
+        if not matrix.shape[0] or matrix.shape[1] != vector.shape[0]:
+            return None
+        sims = matrix @ vector
+        for best in np.argsort(-sims):
+            if sims[best] < self.similarity:
+                break
+            entry_id = bucket.vector_ids[int(best)]
+            if terms is None or self._entries[entry_id]["terms"] == terms:
+                return entry_id
+        return None
+
+    def _hit(self, entry_id: int, query: str) -> Dict[str, Any]:
+        self._entries.move_to_end(entry_id)
+        response = self._entries[entry_id]["response"]
+        # La respuesta guardada pudo venir de otra redacción de la consulta
+        return dict(response, query=query) if "query" in response else response
+
+    def put(
+        self,
+        version: Hashable,
+        key: Hashable,
+        query: str,
+        vector: Optional[np.ndarray],
+        response: Dict[str, Any],
+    ) -> None:
+        if not self.enabled:
+            return
+        size = ENTRY_OVERHEAD_BYTES + estimate_bytes(response) + (vector.nbytes if vector is not None else 0)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._version is None:
+                self._check_version(version)
+            elif self._version != version:
+                # Búsqueda que terminó después de publicarse otra versión: no se guarda
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "key": key, "query": normalize_query(query), "terms": _terms(query),
+                "vector": vector, "response": response, "bytes": size,
+            }
+            bucket = self._buckets.setdefault(key, _Bucket())
+            bucket.entry_ids.append(entry_id)
+            bucket.matrix = None
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._evict(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def _check_version(self, version: Hashable) -> None:
+        if self._version is not None and self._version == version:
+            return
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._buckets.clear()
+        self._bytes = 0
+        self._version = version
+
+    def _evict(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self._bytes -= entry["bytes"]
+        bucket = self._buckets[entry["key"]]
+        bucket.entry_ids.remove(entry_id)
+        bucket.matrix = None
+        if not bucket.entry_ids:
+            del self._buckets[entry["key"]]
@@ -0,0 +1,185 @@
+"""Ruteo por documento: primera etapa gruesa con centroides por documento."""
+from __future__ import annotations
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .rag_index import normalize_rows, select_top_k
+
+logger = logging.getLogger(__name__)
+
+CENTROID_ITERATIONS = 5
+
+
+class DocumentRouter:
+    """Centroides de cada documento y sus filas agrupadas (como las listas de ``IVFIndex``).
+
+    El documento ``d`` tiene los centroides ``centroid_offsets[d]:centroid_offsets[d + 1]``
+    y las filas ``order[offsets[d]:offsets[d + 1]]``. Una consulta puntúa los
+    centroides, toma los ``fanout`` documentos con mejor centroide y solo
+    evalúa los chunks de esos documentos, con score exacto contra la matriz.
+    Con ``per_doc > 1`` cada documento tiene hasta ese número de centroides
+    (k-means esférico sobre sus chunks), útil si un informe trata varios temas.
+    """
+
+    def __init__(
+        self,
+        doc_names: np.ndarray,
+        centroids: np.ndarray,
+        centroid_offsets: np.ndarray,
+        order: np.ndarray,
+        offsets: np.ndarray,
+        fanout: int = 8,
+        per_doc: int = 1,
+    ):
+        self.doc_names = doc_names
+        self.centroids = centroids
+        self.centroid_offsets = centroid_offsets
+        self.order = order
+        self.offsets = offsets
+        self.fanout = fanout
+        self.per_doc = per_doc
+
+    @property
+    def n_docs(self) -> int:
+        return int(self.doc_names.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        doc_ids: np.ndarray,
+        fanout: int = 8,
+        per_doc: int = 1,
+        reuse: Optional[Dict[str, np.ndarray]] = None,
+    ) -> "DocumentRouter":
+        """Agrupa las filas por documento y calcula sus centroides.
+
+        ``reuse`` entrega centroides ya calculados por documento (los que no
+        cambiaron en una recarga incremental) para no volver a leer sus filas.
+        """
+        doc_names, inverse = np.unique(np.asarray(doc_ids, dtype=object), return_inverse=True)
+        order = np.argsort(inverse, kind="stable").astype(np.int64)
+        offsets = np.zeros(doc_names.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(inverse, minlength=doc_names.shape[0]), out=offsets[1:])
+
+        blocks = []
+        for d, name in enumerate(doc_names):
+            cached = reuse.get(name) if reuse else None
+            if cached is None:
+                rows = order[offsets[d]:offsets[d + 1]]
+                cached = _doc_centroids(np.asarray(matrix[rows], dtype=np.float32), per_doc)
+            blocks.append(cached)
+
+        dim = int(matrix.shape[1]) if matrix.ndim == 2 else 0
+        centroid_offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+        np.cumsum([b.shape[0] for b in blocks], out=centroid_offsets[1:])
+        centroids = np.concatenate(blocks) if blocks else np.zeros((0, dim), dtype=np.float32)
+        return cls(doc_names, centroids, centroid_offsets, order, offsets, fanout=fanout, per_doc=per_doc)
+
+    def replace_documents(self, matrix: np.ndarray, doc_ids: np.ndarray, changed: Iterable[str]) -> "DocumentRouter":
+        """Router para una matriz nueva; solo recalcula los centroides de los documentos ``changed``."""
+        changed = set(changed)
+        reuse = {
+            name: self.centroids[self.centroid_offsets[d]:self.centroid_offsets[d + 1]]
+            for d, name in enumerate(self.doc_names) if name not in changed
+        }
+        return DocumentRouter.build(matrix, doc_ids, fanout=self.fanout, per_doc=self.per_doc, reuse=reuse)
+
+    def route(self, query: np.ndarray, fanout: Optional[int] = None) -> np.ndarray:
+        """Índices de los ``fanout`` documentos con mejor centroide para la consulta (normalizada)."""
+        fanout = min(fanout or self.fanout, self.n_docs)
+        scores = self.centroids @ query
+        if self.centroids.shape[0] != self.n_docs:
+            scores = np.maximum.reduceat(scores, self.centroid_offsets[:-1])
+        if fanout < self.n_docs:
+            return np.argpartition(-scores, fanout - 1)[:fanout]
+        return np.arange(self.n_docs)
+
+    def candidates(self, query: np.ndarray, fanout: Optional[int] = None) -> np.ndarray:
+        """Filas de los documentos elegidos por ``route``."""
+        return np.concatenate(
+            [self.order[self.offsets[d]:self.offsets[d + 1]] for d in self.route(query, fanout)]
+        )
+
+    def search(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        top_k: int,
+        similarity_threshold: float,
+        fanout: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        parts_rows, parts_scores = [], []
+        for d in np.sort(self.route(query, fanout)):
+            rows = self.order[self.offsets[d]:self.offsets[d + 1]]
+            first, last = int(rows[0]), int(rows[-1])
+            # Los chunks de un documento suelen estar contiguos: se evalúa la vista sin copiar filas
+            block = matrix[first:last + 1] if last - first + 1 == rows.size else matrix[rows]
+            parts_scores.append(np.asarray(block, dtype=np.float32) @ query)
+            parts_rows.append(rows)
+        if not parts_rows:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32), 0
+        rows = np.concatenate(parts_rows)
+        local, scores, total = select_top_k(np.concatenate(parts_scores), top_k, similarity_threshold, None)
+        return rows[local], scores, total
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "centroid_offsets.npy"), self.centroid_offsets)
+        np.save(os.path.join(path, "order.npy"), self.order)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        with open(os.path.join(path, "router.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "doc_names": [str(d) for d in self.doc_names],
+                "fanout": self.fanout,
+                "per_doc": self.per_doc,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "DocumentRouter":
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "router.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            np.asarray(meta["doc_names"], dtype=object),
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "centroid_offsets.npy")),
+            np.load(os.path.join(path, "order.npy"), mmap_mode=mode),
+            np.load(os.path.join(path, "offsets.npy")),
+            fanout=int(meta.get("fanout", 8)),
+            per_doc=int(meta.get("per_doc", 1)),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self.n_docs,
+            "centroids": int(self.centroids.shape[0]),
+            "fanout": self.fanout,
+            "per_doc": self.per_doc,
+        }
+
+
+def _doc_centroids(vectors: np.ndarray, k: int) -> np.ndarray:
+    """Hasta ``k`` centroides normalizados de las filas de un documento (k-means esférico)."""
+    if vectors.shape[0] == 0:
+        return np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    if k <= 1:
+        return normalize_rows(vectors.sum(axis=0, keepdims=True))
+    if vectors.shape[0] <= k:
+        return normalize_rows(vectors.copy())
+
+    # Inicio determinista: filas repartidas a lo largo del documento
+    centroids = vectors[np.linspace(0, vectors.shape[0] - 1, k).astype(np.int64)].copy()
+    for _ in range(CENTROID_ITERATIONS):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        used = np.bincount(assign, minlength=k) > 0
+        centroids = normalize_rows(sums[used])
+        k = centroids.shape[0]
+    return centroids
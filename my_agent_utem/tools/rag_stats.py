@@ -0,0 +1,64 @@
+"""Estadísticas agregadas de la base de conocimiento, mantenidas por deltas."""
+from __future__ import annotations
+from collections import Counter
+from typing import Any, Dict, Iterable, List
+
+
+class KnowledgeBaseStats:
+    """Totales de documentos, chunks, caracteres y documentos por tipo.
+
+    Se calculan una vez desde la metadata y luego se ajustan con los
+    documentos agregados, modificados o eliminados, así leerlos es O(1).
+    """
+
+    def __init__(self):
+        self.total_documents = 0
+        self.total_chunks = 0
+        self.total_characters = 0
+        self.by_type: Counter = Counter()
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Dict[str, Any]]) -> "KnowledgeBaseStats":
+        stats = cls()
+        for doc in docs:
+            stats._add(doc)
+        return stats
+
+    def apply(
+        self,
+        previous: Dict[str, Dict[str, Any]],
+        upserts: Dict[str, Dict[str, Any]],
+        removed: List[str],
+    ) -> "KnowledgeBaseStats":
+        """Estadísticas nuevas tras aplicar un delta; ``previous`` es la metadata anterior."""
+        stats = KnowledgeBaseStats()
+        stats.total_documents = self.total_documents
+        stats.total_chunks = self.total_chunks
+        stats.total_characters = self.total_characters
+        stats.by_type = Counter(self.by_type)
+
+        for doc_id in list(removed) + list(upserts):
+            old = previous.get(doc_id)
+            if old is not None:
+                stats._remove(old)
+        for doc in upserts.values():
+            stats._add(doc)
+        return stats
+
+    def _add(self, doc: Dict[str, Any], sign: int = 1) -> None:
+        self.total_documents += sign
+        self.total_chunks += sign * (doc.get("total_chunks", 0) or 0)
+        self.total_characters += sign * (doc.get("total_characters", 0) or 0)
+        self.by_type[doc.get("file_type", "OTHER")] += sign
+
+    def _remove(self, doc: Dict[str, Any]) -> None:
+        self._add(doc, sign=-1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_documents": self.total_documents,
+            "total_chunks": self.total_chunks,
+            "total_characters": self.total_characters,
+            "estimated_words": self.total_characters // 5,  # Aproximación
+            "documents_by_type": {t: n for t, n in self.by_type.items() if n > 0},
+        }
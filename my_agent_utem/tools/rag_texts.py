@@ -0,0 +1,77 @@
+"""Cache LRU del texto de chunks, acotada por cantidad de caracteres."""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+ChunkKey = Tuple[str, str]
+
+
+class ChunkTextCache:
+    """Texto de chunks por (doc_id, chunk_id), pedido a Firestore solo para los ganadores.
+
+    El límite es en caracteres (no en entradas) para acotar la memoria aunque
+    los chunks tengan largos muy distintos.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[ChunkKey, str]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Iterable[ChunkKey]) -> Dict[ChunkKey, str]:
+        """Textos en cache para ``keys``; las ausentes no aparecen en el resultado."""
+        found: Dict[ChunkKey, str] = {}
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                text = self._entries.get(key)
+                if text is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = text
+                self.hits += 1
+        return found
+
+    def put_many(self, texts: Dict[ChunkKey, str]) -> None:
+        with self._lock:
+            for key, text in texts.items():
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._chars -= len(previous)
+                if len(text) > self.max_chars:
+                    continue
+                self._entries[key] = text
+                self._chars += len(text)
+            while self._chars > self.max_chars and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def invalidate_docs(self, doc_ids: Iterable[str]) -> None:
+        """Elimina los textos de los documentos re-indexados o eliminados."""
+        doc_ids = set(doc_ids)
+        if not doc_ids:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in doc_ids]:
+                self._chars -= len(self._entries.pop(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "chars": self._chars,
+                "max_chars": self.max_chars,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,113 @@
+"""Tiempos por etapa de la búsqueda RAG y spans de OpenTelemetry (si está instalado)."""
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+try:  # google-adk instala opentelemetry-api; sin él solo se miden tiempos
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+TRACER_NAME = "my_agent_utem.rag"
+
+# "stages": un span hijo por etapa; "root": un solo span con los atributos y ms de cada etapa; "off"
+TRACING_LEVELS = ("stages", "root", "off")
+
+
+def _attributes(values: Dict[str, Any], prefix: str = "rag.") -> Dict[str, Any]:
+    """Atributos con prefijo, sin None y con escalares numpy convertidos."""
+    clean = {}
+    for key, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, np.generic):
+            value = value.item()
+        clean[f"{prefix}{key}"] = value if isinstance(value, (bool, int, float, str)) else str(value)
+    return clean
+
+
+class Stage:
+    """Etapa en curso; ``set`` agrega atributos a su span (no hace nada sin tracing)."""
+
+    def __init__(self, span: Any = None, prefix: str = "rag."):
+        self._span = span
+        self._prefix = prefix
+
+    @property
+    def recording(self) -> bool:
+        """False si los atributos se descartarían (sin SDK o span no muestreado)."""
+        return self._span is not None and self._span.is_recording()
+
+    def set(self, **attributes: Any) -> None:
+        if self._span is not None:
+            self._span.set_attributes(_attributes(attributes, self._prefix))
+
+
+NOOP_STAGE = Stage()
+
+
+class SearchTrace:
+    """Cronómetro de una búsqueda: los ms acumulados de cada etapa y sus spans.
+
+    El span raíz cuelga del span actual (el de la herramienta en ADK). Con
+    ``level="stages"`` cada etapa es un span hijo creado con padre explícito,
+    así queda anidado aunque corra en otro hilo (``asyncio.to_thread``); con
+    ``"root"`` los atributos de la etapa van al span raíz como
+    ``rag.<etapa>.<atributo>``, a costa de un solo span por búsqueda. Sin un
+    SDK de OpenTelemetry configurado no se crea nada: queda un
+    ``perf_counter`` por etapa.
+    """
+
+    def __init__(self, name: str, level: str = "stages", **attributes: Any):
+        self.timings: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._stage_spans = level == "stages"
+        tracer = trace.get_tracer(TRACER_NAME) if level in ("stages", "root") and trace is not None else None
+        self._tracer = tracer
+        self._span = tracer.start_span(name, attributes=_attributes(attributes)) if tracer else None
+        self._recording = self._span is not None and self._span.is_recording()
+        self._context = trace.set_span_in_context(self._span) if self._recording else None
+
+    @contextmanager
+    def stage(self, name: str, **attributes: Any) -> Iterator[Stage]:
+        start = time.perf_counter()
+        try:
+            if not self._recording:
+                yield NOOP_STAGE
+            elif self._stage_spans:
+                span = self._tracer.start_span(f"rag.{name}", context=self._context, attributes=_attributes(attributes))
+                with trace.use_span(span, end_on_exit=True):
+                    yield Stage(span)
+            else:
+                stage = Stage(self._span, f"rag.{name}.")
+                stage.set(**attributes)
+                yield stage
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def set(self, **attributes: Any) -> None:
+        """Atributos del span raíz."""
+        if self._recording:
+            self._span.set_attributes(_attributes(attributes))
+
+    def timings_ms(self) -> Dict[str, float]:
+        timings = {name: round(ms, 3) for name, ms in self.timings.items()}
+        timings["total"] = round((time.perf_counter() - self._start) * 1000, 3)
+        return timings
+
+    def finish(self, response: Optional[Dict[str, Any]] = None) -> None:
+        """Cierra el span raíz con el resultado y los ms de cada etapa."""
+        if self._span is None:
+            return
+        if self._recording:
+            self._span.set_attributes(_attributes(
+                {f"{name}_ms": ms for name, ms in self.timings_ms().items()}, "rag.timings."
+            ))
+            if response is not None:
+                self.set(ok=bool(response.get("ok")), cached=bool(response.get("cached", False)))
+                if not response.get("ok"):
+                    self._span.set_status(trace.Status(trace.StatusCode.ERROR, str(response.get("message", ""))[:200]))
+        self._span.end()
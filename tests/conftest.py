@@ -0,0 +1,42 @@
+"""Configuración común: query_rag contra el Firestore en memoria de ``benchmarks``."""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# query_rag lee su configuración del entorno al importarse (igual que benchmarks/bench_search.py)
+os.environ.update({
+    "RAG_SYNC_MODE": "ttl",
+    "RAG_EMBED_BACKEND": "hash",
+    "RAG_HASH_EMBED_DIM": "64",
+    "RAG_ACCESS_METRICS": "off",
+    "RAG_EMBED_CACHE_PATH": "",
+    "RAG_TRACING": "off",
+})
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    """(query_rag sin snapshot publicado, corpus sintético, Firestore en memoria con ese corpus).
+
+    Los parámetros de módulo (p. ej. ``INDEX_STORAGE``) se cambian con ``monkeypatch.setattr``
+    antes de la primera búsqueda.
+    """
+    from benchmarks.fake_firestore import FakeAsyncFirestore, FakeFirestore
+    from benchmarks.synthetic_corpus import SyntheticCorpus
+    from my_agent_utem.tools import query_rag
+    from my_agent_utem.tools.embedding_service import HashEmbeddingBackend
+    from my_agent_utem.tools.rag_index import ChunkIndex
+    from my_agent_utem.tools.rag_refresh import CacheSnapshot
+
+    corpus = SyntheticCorpus(1200, n_docs=24, dim=64, vocab_size=3000, n_topics=8)
+    db = FakeFirestore()
+    corpus.populate(db, query_rag.COLLECTION_NAME)
+    query_rag.configure_clients(db=db, async_db=FakeAsyncFirestore(db), embedding_backend=HashEmbeddingBackend(64))
+
+    monkeypatch.setattr(query_rag, "_snapshot", CacheSnapshot({}, ChunkIndex.empty()))
+    monkeypatch.setattr(query_rag, "_kb_stats_source", None)
+    monkeypatch.setattr(query_rag, "SNAPSHOT_DIR", "")
+    query_rag._result_cache.clear()
+    query_rag._text_cache.clear()
+    return SimpleNamespace(q=query_rag, corpus=corpus, db=db)
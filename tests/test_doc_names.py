@@ -0,0 +1,38 @@
+"""DocNameIndex: resolución del filtro document_name."""
+from my_agent_utem.tools.query_rag import normalize_doc_name
+from my_agent_utem.tools.rag_names import DocNameIndex
+
+DOCS = {
+    "a": {"doc_name": "Informe_Avance_Ingenieria_Civil_2025.pdf"},
+    "b": {"doc_name": "Informe_Avance_Quimica_2025.pdf"},
+    "c": {"doc_name": "Plan_Mejora_Diseno.docx"},
+    "sin_nombre": {"doc_name": ""},
+}
+
+
+def test_blank_names_match_nothing():
+    index = DocNameIndex(DOCS, normalize_doc_name)
+
+    assert index.resolve("") == ([], [])
+    assert index.resolve("   ") == ([], [])
+    assert index.resolve("__") == ([], [])
+    # Un documento sin nombre no coincide con cualquier búsqueda
+    assert "sin_nombre" not in index.resolve("otro documento")[0]
+
+
+def test_substring_and_token_matches_are_ranked():
+    index = DocNameIndex(DOCS, normalize_doc_name)
+
+    assert index.resolve("Plan_Mejora_Diseno.docx")[0] == ["c"]
+    assert index.resolve("ingenieria civ")[0] == ["a"]
+    # Sin subcadena: coincide por tokens y el de más tokens en común queda primero
+    doc_ids, candidates = index.resolve("informe avance ingenieria 2025")
+    assert doc_ids == ["a", "b"]
+    assert candidates[0]["match_score"] > candidates[1]["match_score"]
+
+
+def test_fuzzy_candidates_when_nothing_matches():
+    index = DocNameIndex(DOCS, normalize_doc_name)
+
+    doc_ids, candidates = index.resolve("planmejoradiseño")
+    assert doc_ids == [] and candidates and candidates[0]["doc_id"] == "c"
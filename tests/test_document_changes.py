@@ -0,0 +1,38 @@
+"""Recarga incremental: qué documentos hay que releer al refrescar la metadata."""
+from types import SimpleNamespace
+
+import numpy as np
+
+from my_agent_utem.tools.query_rag import _changed_documents
+
+
+def _snapshot(docs, rows):
+    return SimpleNamespace(docs=docs, index=SimpleNamespace(doc_ids=np.asarray(rows)))
+
+
+def test_documents_without_watermark_are_not_reloaded_when_chunk_count_matches():
+    current = _snapshot(
+        {
+            "legacy": {"doc_name": "a.pdf", "total_chunks": 2},
+            "renamed": {"doc_name": "b.pdf", "total_chunks": 1},
+            "grown": {"doc_name": "c.pdf", "total_chunks": 1},
+            "stamped": {"doc_name": "d.pdf", "updated_at": 1},
+        },
+        ["legacy", "legacy", "renamed", "grown"],
+    )
+    upserts = {
+        "legacy": {"doc_name": "a.pdf", "total_chunks": 2},
+        "renamed": {"doc_name": "b2.pdf", "total_chunks": 1},
+        "grown": {"doc_name": "c.pdf", "total_chunks": 3},
+        "stamped": {"doc_name": "d.pdf", "updated_at": 1},
+        "new": {"doc_name": "e.pdf"},
+    }
+
+    assert _changed_documents(current, upserts) == ["grown", "new"]
+
+
+def test_watermark_changes_trigger_a_reload():
+    current = _snapshot({"a": {"updated_at": 1}, "b": {"total_chunks": 1}}, ["a", "b"])
+    upserts = {"a": {"updated_at": 2}, "b": {"total_chunks": 1, "updated_at": 5}}
+
+    assert _changed_documents(current, upserts) == ["a", "b"]
@@ -0,0 +1,61 @@
+"""EmbeddingCache: el nivel SQLite no debe correr dentro del event loop."""
+import asyncio
+import threading
+
+import numpy as np
+
+from my_agent_utem.tools.embedding_cache import EmbeddingCache
+
+
+class ThreadRecordingCache(EmbeddingCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.disk_threads = []
+
+    def get_disk(self, model_name, query):
+        self.disk_threads.append(threading.get_ident())
+        return super().get_disk(model_name, query)
+
+    def put_disk(self, model_name, query, vector):
+        self.disk_threads.append(threading.get_ident())
+        super().put_disk(model_name, query, vector)
+
+
+def test_memory_and_disk_tiers_are_split(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    cache = EmbeddingCache(persist_path=path)
+    cache.put_memory("m", "Hola  Mundo", [1.0, 2.0])
+    assert cache.get_memory("m", "hola mundo") == [1.0, 2.0]
+    assert cache.get_disk("m", "hola mundo") is None
+
+    cache.put_disk("m", "hola mundo", [1.0, 2.0])
+    reopened = EmbeddingCache(persist_path=path)
+    assert reopened.get_memory("m", "hola mundo") is None
+    assert reopened.get("m", "hola mundo") == [1.0, 2.0]
+    # El acierto en disco se promovió a memoria
+    assert reopened.get_memory("m", "hola mundo") == [1.0, 2.0]
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_async_query_embedding_keeps_sqlite_off_the_loop(rag, monkeypatch, tmp_path):
+    q = rag.q
+    cache = ThreadRecordingCache(persist_path=str(tmp_path / "emb.sqlite"))
+    monkeypatch.setattr(q, "_embedding_cache", cache)
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        vector, hit = await q._query_embedding_async("avance de actividades")
+        assert not hit
+        await asyncio.gather(*q._disk_writes)
+        _, hit = await q._query_embedding_async("avance de actividades")
+        assert hit
+        return loop_thread, vector
+
+    loop_thread, vector = asyncio.run(scenario())
+    assert len(cache.disk_threads) == 2  # una lectura (fallo) y una escritura
+    assert loop_thread not in cache.disk_threads
+
+    # La escritura en segundo plano quedó en disco
+    cache.clear()
+    stored = cache.get_disk(q._embedding_service.backend.name, "avance de actividades")
+    assert np.allclose(stored, vector)
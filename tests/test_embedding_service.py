@@ -0,0 +1,61 @@
+"""EmbeddingService: una consulta cancelada no debe hacer fallar al resto de su lote."""
+import asyncio
+import threading
+
+import pytest
+
+from my_agent_utem.tools.embedding_service import EmbeddingService, HashEmbeddingBackend
+
+
+class RecordingBackend(HashEmbeddingBackend):
+    def __init__(self, dim: int = 16):
+        super().__init__(dim)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def embed(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        return super().embed(texts)
+
+
+def test_cancelled_future_does_not_fail_the_batch():
+    backend = RecordingBackend()
+    service = EmbeddingService(backend, window_ms=200, max_batch=50)
+    futures = [service.submit(f"consulta {i}") for i in range(5)]
+    assert futures[2].cancel()
+
+    for i, future in enumerate(futures):
+        if i == 2:
+            assert future.cancelled()
+        else:
+            assert len(future.result(timeout=5)) == backend.dim
+    # La consulta cancelada no se envía al backend
+    assert all("consulta 2" not in call for call in backend.calls)
+
+
+def test_cancelled_task_does_not_fail_other_tasks():
+    backend = RecordingBackend()
+    service = EmbeddingService(backend, window_ms=200, max_batch=50)
+
+    async def main():
+        tasks = [asyncio.create_task(service.embed_async(f"consulta {i}")) for i in range(4)]
+        await asyncio.sleep(0.01)
+        tasks[0].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert all(len(vector) == backend.dim for vector in results[1:])
+
+
+def test_backend_error_reaches_every_pending_future():
+    class FailingBackend(RecordingBackend):
+        def embed(self, texts):
+            raise RuntimeError("cuota excedida")
+
+    service = EmbeddingService(FailingBackend(), window_ms=50)
+    futures = [service.submit(f"consulta {i}") for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
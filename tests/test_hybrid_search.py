@@ -0,0 +1,46 @@
+"""Búsqueda híbrida: el umbral de similitud también filtra lo que solo trae BM25."""
+
+
+def _noise_query(rag, row=5):
+    # Un término real del corpus entre palabras que no existen: BM25 encuentra chunks,
+    # pero ninguno se parece a la consulta
+    word = rag.corpus.text(row).split()[0]
+    return word + " " + " ".join(f"xq{i}zz" for i in range(12))
+
+
+def test_hybrid_drops_lexical_only_hits_below_threshold(rag):
+    q = rag.q
+    query = _noise_query(rag)
+
+    lexical = q.search_documents(query, mode="lexical", top_k=5)
+    assert lexical["ok"] and lexical["sources"]
+
+    hybrid = q.search_documents(query, mode="hybrid", top_k=5)
+    assert hybrid["ok"]
+    assert hybrid["status"] == "Sin coincidencias"
+
+
+def test_hybrid_keeps_relevant_hits(rag):
+    q = rag.q
+    row = 5
+    doc_name = rag.corpus.docs[rag.corpus.doc_id(int(rag.corpus.chunk_doc[row]))]["doc_name"]
+
+    response = q.search_documents(rag.corpus.text(row), mode="hybrid", top_k=5)
+    assert response["ok"] and response["sources"]
+    best = response["sources"][0]
+    assert (best["doc_name"], best["chunks"]) == (doc_name, f"Chunk {rag.corpus.chunk_index[row]}")
+
+
+def test_lexical_mode_ranks_the_matching_chunk_first_without_embeddings(rag, monkeypatch):
+    q = rag.q
+    row = 40
+    doc_name = rag.corpus.docs[rag.corpus.doc_id(int(rag.corpus.chunk_doc[row]))]["doc_name"]
+
+    def no_embeddings(*args, **kwargs):
+        raise AssertionError("el modo lexical no debe pedir embeddings")
+
+    monkeypatch.setattr(q, "_query_embedding", no_embeddings)
+    response = q.search_documents(rag.corpus.text(row), mode="lexical", top_k=5)
+    assert response["ok"] and response["sources"]
+    best = response["sources"][0]
+    assert (best["doc_name"], best["chunks"]) == (doc_name, f"Chunk {rag.corpus.chunk_index[row]}")
@@ -0,0 +1,84 @@
+"""Recargas incrementales del snapshot de metadata e índice."""
+import numpy as np
+
+from my_agent_utem.tools.rag_index import quantize_rows
+
+
+def test_refresh_without_changes_keeps_index_and_version(rag):
+    q = rag.q
+    first = q._ensure_snapshot(force_refresh=True)
+    rpcs = rag.db.rpcs
+
+    second = q._ensure_snapshot(force_refresh=True)
+
+    assert second.index is first.index
+    assert second.docs is first.docs
+    assert second.version == first.version
+    assert second.loaded_at >= first.loaded_at
+    assert rag.db.rpcs - rpcs == 1  # solo el stream de metadata
+
+
+def test_changed_document_reloads_only_its_chunks(rag):
+    q = rag.q
+    first = q._ensure_snapshot(force_refresh=True)
+    doc_id = rag.corpus.doc_id(3)
+    rag.db._set(f"{q.COLLECTION_NAME}/{doc_id}", {"updated_at": "2031-01-01T00:00:00"}, merge=True)
+
+    second = q._ensure_snapshot(force_refresh=True)
+
+    assert second.index is not first.index
+    assert second.version == first.version + 1
+    assert len(second.index) == len(first.index)
+    assert second.docs[doc_id]["updated_at"] == "2031-01-01T00:00:00"
+
+
+def test_result_cache_survives_a_refresh_without_changes(rag):
+    q = rag.q
+    query = rag.corpus.queries(1, seed=5)[0]["query"]
+    q.search_documents(query)
+    q._ensure_snapshot(force_refresh=True)
+
+    before = q._result_cache.stats()
+    q.search_documents(query)
+    after = q._result_cache.stats()
+
+    assert after["hits"] == before["hits"] + 1
+    assert after["invalidations"] == before["invalidations"]
+
+
+def test_matrix_stays_memory_mapped_across_updates(rag, monkeypatch, tmp_path):
+    q = rag.q
+    monkeypatch.setattr(q, "SNAPSHOT_DIR", str(tmp_path))
+    first = q._ensure_snapshot(force_refresh=True)
+    assert isinstance(first.index.matrix, np.memmap)
+
+    # Sin cambios: mismo índice, sin copiar la matriz
+    assert q._ensure_snapshot(force_refresh=True).index is first.index
+
+    doc_id = rag.corpus.doc_id(5)
+    rag.db._set(f"{q.COLLECTION_NAME}/{doc_id}", {"updated_at": "2031-01-01T00:00:00"}, merge=True)
+    second = q._ensure_snapshot(force_refresh=True)
+    assert second.index is not first.index
+    assert isinstance(second.index.matrix, np.memmap)
+    # Las filas del documento recargado pasan al final: se comparan por chunk_id
+    order_first, order_second = np.argsort(first.index.chunk_ids), np.argsort(second.index.chunk_ids)
+    np.testing.assert_array_equal(second.index.matrix[order_second], first.index.matrix[order_first])
+
+
+def test_quantized_index_keeps_float32_on_disk_after_updates(rag, monkeypatch, tmp_path):
+    q = rag.q
+    monkeypatch.setattr(q, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(q, "INDEX_STORAGE", "int8")
+    first = q._ensure_snapshot(force_refresh=True).index
+
+    doc_id = rag.corpus.doc_id(7)
+    rag.db._set(f"{q.COLLECTION_NAME}/{doc_id}", {"updated_at": "2031-01-01T00:00:00"}, merge=True)
+    index = q._ensure_snapshot(force_refresh=True).index
+
+    assert index is not first and index.storage == "int8"
+    assert isinstance(index.matrix, np.memmap)
+    assert index.resident_bytes < index.matrix.nbytes / 3
+    # Los códigos reutilizados coinciden con los de cuantizar de nuevo toda la matriz
+    codes, scales = quantize_rows(index.matrix, "int8")
+    np.testing.assert_array_equal(index.codes, codes)
+    np.testing.assert_allclose(index.scales, scales)
@@ -0,0 +1,30 @@
+"""Actividades de un DOCX: cada fila de tabla queda en la dimensión del título que la precede."""
+from docx import Document
+
+from my_agent_utem.ingestion.activities import extract_activities
+from my_agent_utem.ingestion.parsers import parse_document
+
+
+def _add_table(document, rows):
+    table = document.add_table(rows=len(rows), cols=len(rows[0]))
+    for r, values in enumerate(rows):
+        for c, value in enumerate(values):
+            table.cell(r, c).text = value
+
+
+def test_docx_tables_keep_their_dimension(tmp_path):
+    document = Document()
+    document.add_paragraph("Dimensión N°I: Docencia y resultados del proceso de formación")
+    _add_table(document, [["Implementar metodología A+S en cursos de primer año", "06/2025", "Logrado", "ANEXO 5"]])
+    document.add_paragraph("Dimensión N°II: Gestión estratégica y recursos institucionales")
+    _add_table(document, [["Compra de servidores GPU para el laboratorio", "05/2025", "Pendiente", "ANEXO 7"]])
+    path = tmp_path / "informe.docx"
+    document.save(str(path))
+
+    parsed = parse_document(str(path))
+    assert "error" not in parsed
+    activities = extract_activities(parsed["text"])
+
+    assert [(a["dimension"], a["status"]) for a in activities] == [("dim1", "L"), ("dim2", "NL")]
+    assert activities[0]["text"].startswith("Implementar metodología")
+    assert activities[1]["annexes"] == ["ANEXO 7"]
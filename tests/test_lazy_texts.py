@@ -0,0 +1,45 @@
+"""Texto bajo demanda: el índice residente no guarda texto y se lee solo el de los ganadores."""
+from my_agent_utem.tools.rag_texts import ChunkTextCache
+
+
+def test_text_cache_is_bounded_by_characters():
+    cache = ChunkTextCache(max_chars=10)
+    cache.put_many({("d1", "c1"): "aaaa", ("d1", "c2"): "bbbb"})
+    cache.get_many([("d1", "c1")])  # c1 pasa a ser el más reciente
+    cache.put_many({("d2", "c1"): "cccc"})
+
+    assert set(cache.get_many([("d1", "c1"), ("d1", "c2"), ("d2", "c1")])) == {("d1", "c1"), ("d2", "c1")}
+    assert cache.stats()["chars"] == 8
+
+    cache.put_many({("d3", "c1"): "x" * 11})  # más largo que el límite: no se guarda
+    assert cache.get_many([("d3", "c1")]) == {}
+
+
+def test_text_cache_invalidates_documents():
+    cache = ChunkTextCache(max_chars=100)
+    cache.put_many({("d1", "c1"): "uno", ("d1", "c2"): "dos", ("d2", "c1"): "tres"})
+    cache.invalidate_docs(["d1"])
+    assert set(cache.get_many([("d1", "c1"), ("d1", "c2"), ("d2", "c1")])) == {("d2", "c1")}
+    assert cache.stats()["chars"] == 4
+
+
+def test_search_fetches_only_winner_texts_once(rag):
+    q = rag.q
+    row = 7
+    query = rag.corpus.text(row)
+
+    first = q.search_documents(query, mode="lexical", top_k=5, response_mode="full")
+    assert first["ok"] and first["contexts"]
+    index = q._snapshot.index
+    assert index.texts is None
+    assert index.lexical is not None
+    # El texto leído es el del chunk ganador
+    assert first["contexts"][0]["text"] == query
+    assert q._text_cache.stats()["entries"] == len(first["contexts"])
+
+    # Una segunda búsqueda sobre los mismos chunks no vuelve a Firestore
+    q._result_cache.clear()
+    rpcs = rag.db.rpcs
+    second = q.search_documents(query, mode="lexical", top_k=5, response_mode="full")
+    assert [c["text"] for c in second["contexts"]] == [c["text"] for c in first["contexts"]]
+    assert rag.db.rpcs == rpcs
@@ -0,0 +1,62 @@
+"""MetadataColumns: filtros de metadata como máscaras sobre las filas del índice."""
+import numpy as np
+import pytest
+
+from my_agent_utem.tools.rag_filters import MetadataColumns
+
+DOCS = {
+    "a": {"doc_name": "Informe_Avance_Ingenieria_Civil_2025.pdf", "file_type": "PDF", "carrera": "Ingeniería Civil"},
+    "b": {"doc_name": "Informe_2024_ICCD.pdf", "file_type": "PDF", "facultad": "Facultad de Ingeniería"},
+    "c": {"doc_name": "informe2023.pdf", "file_type": "PDF", "document_date": "2023-05-10"},
+    "d": {"doc_name": "PDC-ICCD-2025.docx", "file_type": "DOCX", "year": "2022"},
+    "e": {"doc_name": "Plan_12025.pdf", "file_type": "PDF"},
+}
+ROWS = np.asarray(["a", "a", "b", "c", "c", "c", "d", "e", "huerfano"], dtype=object)
+
+
+def test_year_comes_from_underscore_and_glued_file_names():
+    columns = MetadataColumns(DOCS, ROWS)
+    years = dict(zip(columns.doc_ids, columns.years.tolist()))
+
+    # El campo explícito manda sobre el nombre; un número más largo no es un año
+    assert years == {"a": 2025, "b": 2024, "c": 2023, "d": 2022, "e": 0}
+    assert columns.values()["year"] == [2022, 2023, 2024, 2025]
+
+
+def test_filters_expand_to_row_masks():
+    columns = MetadataColumns(DOCS, ROWS)
+
+    keep = columns.doc_selection({"year": 2025})
+    assert columns.selected_ids(keep) == ["a"]
+    assert columns.row_mask(keep).tolist() == [True, True, False, False, False, False, False, False, False]
+
+    keep = columns.doc_selection({"file_type": "pdf", "faculty": "ingenieria"})
+    assert columns.selected_ids(keep) == ["b"]
+
+    keep = columns.doc_selection({"career": "civil"}, doc_ids=["a", "b"])
+    assert columns.selected_ids(keep) == ["a"]
+    # Las filas de documentos que no están en la metadata nunca pasan un filtro
+    assert not columns.row_mask(columns.doc_selection({}))[-1]
+
+
+def test_date_range_includes_the_whole_last_day():
+    columns = MetadataColumns(DOCS, ROWS)
+
+    assert columns.selected_ids(columns.doc_selection({"date_from": "2023-05-01", "date_to": "2023-05-10"})) == ["c"]
+    assert columns.selected_ids(columns.doc_selection({"date_to": "2023-05-09"})) == []
+    with pytest.raises(ValueError):
+        columns.doc_selection({"date_from": "10/05/2023"})
+
+
+def test_year_filter_through_search(rag):
+    q = rag.q
+    doc_id = rag.corpus.doc_id(2)
+    rag.db._set(f"{q.COLLECTION_NAME}/{doc_id}", {"doc_name": "Informe_Avance_Quimica_2019.pdf"}, merge=True)
+    for key in ("year", "anio", "document_date", "created_at"):
+        rag.db._set(f"{q.COLLECTION_NAME}/{doc_id}", {key: None}, merge=True)
+
+    row = int(np.flatnonzero(rag.corpus.chunk_doc == 2)[0])
+    response = q.search_documents(rag.corpus.text(row), year=2019, top_k=5)
+
+    assert response["ok"], response
+    assert {s["doc_name"] for s in response["sources"]} == {"Informe_Avance_Quimica_2019.pdf"}
@@ -0,0 +1,53 @@
+"""Almacenamiento float16/int8: primera pasada cuantizada y re-evaluación exacta en float32."""
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_corpus import SyntheticCorpus
+from my_agent_utem.tools.embedding_service import HashEmbeddingBackend
+from my_agent_utem.tools.rag_index import quantize_rows
+
+
+@pytest.fixture(scope="module")
+def corpus_index():
+    corpus = SyntheticCorpus(6000, n_docs=60, dim=64, vocab_size=3000, n_topics=16)
+    queries = HashEmbeddingBackend(64).embed([item["query"] for item in corpus.queries(50)])
+    return corpus.chunk_index_direct(with_texts=False), np.asarray(queries, dtype=np.float32)
+
+
+def test_int8_codes_reconstruct_the_matrix():
+    matrix = np.random.default_rng(0).standard_normal((100, 32)).astype(np.float32)
+    codes, scales = quantize_rows(matrix, "int8")
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(codes * scales[:, None], matrix, atol=np.abs(matrix).max() / 127)
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_quantized_search_rescores_with_exact_scores(corpus_index, storage):
+    index, queries = corpus_index
+    exact = index.search_many(queries, 10, -1.0)
+    index.quantize(storage, rescore_factor=4)
+    try:
+        hits = index.search_many(queries, 10, -1.0)
+    finally:
+        index.quantize("float32")
+
+    for query, (rows, scores, _), (_, exact_scores, _) in zip(queries, hits, exact):
+        # Los scores retornados son los float32 exactos de esas filas
+        np.testing.assert_allclose(scores, index.matrix[rows] @ (query / np.linalg.norm(query)), atol=1e-5)
+        # y coinciden con el top-k exacto (salvo empates)
+        np.testing.assert_allclose(scores, exact_scores, atol=1e-5)
+
+
+def test_quantized_threshold_keeps_the_exact_cutoff(corpus_index):
+    index, queries = corpus_index
+    exact = index.search_many(queries, 50, 0.3)
+    index.quantize("int8", rescore_factor=4)
+    try:
+        hits = index.search_many(queries, 50, 0.3)
+    finally:
+        index.quantize("float32")
+
+    assert sum(len(rows) for rows, _, _ in exact)
+    for (_, scores, _), (_, exact_scores, _) in zip(hits, exact):
+        # El margen de la primera pasada evita perder filas justo sobre el umbral
+        np.testing.assert_allclose(scores, exact_scores, atol=1e-5)
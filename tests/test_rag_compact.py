@@ -0,0 +1,53 @@
+"""compact_contexts: presupuesto de tokens (con encabezados), duplicados y fusión de chunks contiguos."""
+import numpy as np
+
+from my_agent_utem.tools.rag_compact import compact_contexts, estimate_tokens
+
+
+def _entries(n, doc_name="Informe", text_words=30, doc_id="d1"):
+    return [
+        {
+            "doc_id": doc_id,
+            "doc_name": doc_name,
+            "chunk_index": i,
+            "text": " ".join(f"palabra{i}_{j}" for j in range(text_words)),
+            "score": 1.0 - i * 0.01,
+        }
+        for i in range(n)
+    ]
+
+
+def _orthogonal(n, dim=64):
+    return np.eye(n, dim, dtype=np.float32)
+
+
+def test_budget_counts_block_headers():
+    # Nombres largos y chunks separados: cada chunk abre su propio bloque
+    entries = _entries(20, doc_name="Informe de Avance Plan de Desarrollo de Carrera " * 3, text_words=4)
+    for i, entry in enumerate(entries):
+        entry["chunk_index"] = 2 * i
+    for max_tokens in (80, 200, 600):
+        text, sources, selected = compact_contexts(entries, _orthogonal(20), max_tokens)
+        assert selected
+        assert estimate_tokens(text) <= max_tokens
+        assert len(sources) == len(selected)
+
+
+def test_contiguous_chunks_are_merged_into_one_block():
+    entries = _entries(3)
+    text, sources, selected = compact_contexts(entries, _orthogonal(3), 10_000)
+    assert sorted(selected) == [0, 1, 2]
+    assert sources == [{"doc_name": "Informe", "chunks": "Chunks 0-2", "score": 1.0}]
+    assert text.count("📄") == 1
+
+
+def test_near_duplicates_are_dropped():
+    entries = _entries(3)
+    for i, entry in enumerate(entries):
+        entry["chunk_index"] = 10 * i
+    vectors = np.zeros((3, 8), dtype=np.float32)
+    vectors[0, 0] = vectors[1, 0] = 1.0
+    vectors[2, 1] = 1.0
+    _, sources, selected = compact_contexts(entries, vectors, 10_000)
+    assert sorted(selected) == [0, 2]
+    assert [s["chunks"] for s in sources] == ["Chunk 0", "Chunk 20"]
@@ -0,0 +1,66 @@
+"""ChunkIndex: top-k exacto, umbral, máscaras y búsqueda de varias consultas."""
+import numpy as np
+
+from my_agent_utem.tools.rag_index import ChunkIndex, normalize_rows, select_top_k
+
+
+def _index(rows=300, dim=16, n_docs=6, seed=0):
+    matrix = normalize_rows(np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32))
+    doc_ids = np.asarray([f"doc-{i * n_docs // rows}" for i in range(rows)], dtype=object)
+    return ChunkIndex(
+        matrix,
+        doc_ids,
+        np.asarray([f"c{i}" for i in range(rows)], dtype=object),
+        np.arange(rows, dtype=np.int32),
+        [f"texto {i}" for i in range(rows)],
+    )
+
+
+def test_select_top_k_orders_filters_and_counts():
+    scores = np.asarray([0.1, 0.9, 0.5, 0.7, 0.3, 0.8], dtype=np.float32)
+    rows, top, total = select_top_k(scores, 3, 0.4, None)
+    assert rows.tolist() == [1, 5, 3]
+    np.testing.assert_allclose(top, [0.9, 0.8, 0.7])
+    assert total == 4  # filas sobre el umbral, no solo las retornadas
+
+    mask = np.asarray([True, False, True, True, True, False])
+    rows, _, total = select_top_k(scores, 3, 0.4, mask)
+    assert rows.tolist() == [3, 2]
+    assert total == 2
+
+
+def test_search_matches_brute_force():
+    index = _index()
+    query = np.random.default_rng(1).standard_normal(index.dim)
+    expected = index.matrix @ (query / np.linalg.norm(query))
+
+    rows, scores, total = index.search(query, 10, 0.2)
+    assert rows.tolist() == np.argsort(-expected)[:10].tolist()
+    np.testing.assert_allclose(scores, expected[rows], rtol=1e-5)
+    assert total == int((expected >= 0.2).sum())
+
+
+def test_search_with_doc_mask_only_returns_those_documents():
+    index = _index()
+    mask = index.doc_mask(["doc-1", "doc-4"])
+    rows, _, _ = index.search(np.ones(index.dim), 20, -1.0, mask=mask)
+    assert len(rows) == 20
+    assert set(index.doc_ids[rows]) <= {"doc-1", "doc-4"}
+
+
+def test_search_many_equals_one_search_per_query():
+    index = _index()
+    queries = np.random.default_rng(2).standard_normal((5, index.dim))
+    mask = index.doc_mask(["doc-0", "doc-2", "doc-3"])
+
+    batched = index.search_many(queries, 7, 0.1, mask=mask)
+    for query, (rows, scores, total) in zip(queries, batched):
+        single_rows, single_scores, single_total = index.search(query, 7, 0.1, mask=mask)
+        assert rows.tolist() == single_rows.tolist()
+        np.testing.assert_allclose(scores, single_scores, rtol=1e-5)
+        assert total == single_total
+
+
+def test_empty_index_returns_no_rows():
+    rows, scores, total = ChunkIndex.empty(16).search(np.ones(16), 5, 0.0)
+    assert rows.size == scores.size == total == 0
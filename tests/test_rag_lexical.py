@@ -0,0 +1,61 @@
+"""BM25Index y fusión RRF."""
+import numpy as np
+
+from my_agent_utem.tools.rag_lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "Actividad lograda de vinculación con el medio",
+    "Plan de mejora de la docencia y actividades de docencia",
+    "Acreditación de la carrera: actividad no lograda",
+    "Informe de avance del Plan de Desarrollo de Carrera",
+    "Gestión estratégica y aseguramiento de la calidad",
+]
+
+
+def test_tokenize_removes_accents_and_case():
+    assert tokenize("Vinculación con el MEDIO, año 2024") == ["vinculacion", "con", "el", "medio", "ano", "2024"]
+
+
+def test_score_ranks_matching_rows_and_weights_rare_terms():
+    index = BM25Index.build(TEXTS)
+    scores = index.score("docencia")
+    assert int(np.argmax(scores)) == 1
+    assert np.count_nonzero(scores) == 1
+
+    scores = index.score("acreditacion carrera")
+    # "acreditacion" solo está en la fila 2; "carrera" también en la 3
+    assert int(np.argmax(scores)) == 2
+    assert scores[2] > scores[3] > 0
+
+
+def test_replace_rows_matches_a_full_build():
+    index = BM25Index.build(TEXTS)
+    keep = np.asarray([True, False, True, True, False])
+    added = ["Nueva actividad de investigación e innovación", "Docencia de pregrado"]
+
+    updated = index.replace_rows(keep, added)
+    full = BM25Index.build([t for t, k in zip(TEXTS, keep) if k] + added)
+
+    assert updated.n_rows == full.n_rows
+    assert set(updated.terms) == set(full.terms)
+    for query in ("actividad", "docencia pregrado", "carrera plan", "calidad"):
+        np.testing.assert_allclose(updated.score(query), full.score(query), rtol=1e-6)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    index = BM25Index.build(TEXTS)
+    index.save(str(tmp_path / "bm25"))
+    loaded = BM25Index.load(str(tmp_path / "bm25"))
+    np.testing.assert_allclose(loaded.score("plan de desarrollo"), index.score("plan de desarrollo"))
+
+
+def test_reciprocal_rank_fusion_rewards_rows_in_both_lists():
+    vector = np.asarray([7, 3, 5])
+    lexical = np.asarray([5, 9])
+    rows, scores = reciprocal_rank_fusion([vector, lexical], 4, k=60)
+
+    fused = dict(zip(rows.tolist(), scores.tolist()))
+    assert rows[:2].tolist() == [5, 7]
+    assert set(fused) == {3, 5, 7, 9}
+    np.testing.assert_allclose(fused[5], 1 / 63 + 1 / 61, rtol=1e-6)
+    np.testing.assert_allclose(fused[3], fused[9], rtol=1e-6)  # mismo rango en listas distintas
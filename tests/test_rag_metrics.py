@@ -0,0 +1,92 @@
+"""AccessMetricsWriter: chunks inexistentes, reintento de escrituras fallidas y escrituras después de stop."""
+from benchmarks.fake_firestore import FakeFirestore
+from my_agent_utem.tools import rag_metrics
+from my_agent_utem.tools.rag_metrics import AccessMetricsWriter
+
+COLLECTION = "col"
+
+
+class FlakyFirestore(FakeFirestore):
+    """Las primeras ``failures[path]`` escrituras de cada ruta fallan (UNAVAILABLE)."""
+
+    def __init__(self, failures=None):
+        super().__init__()
+        self.failures = dict(failures or {})
+
+    def _update(self, path, data):
+        if self.failures.get(path):
+            self.failures[path] -= 1
+            raise RuntimeError("unavailable")
+        super()._update(path, data)
+
+
+def _chunk(doc_id, chunk_id):
+    return f"{COLLECTION}/{doc_id}/chunks/{chunk_id}"
+
+
+def _db(chunks, failures=None):
+    db = FlakyFirestore({_chunk(*key): n for key, n in (failures or {}).items()})
+    for doc_id, chunk_id in chunks:
+        db._set(_chunk(doc_id, chunk_id), {"chunk_id": chunk_id})
+    return db
+
+
+def _count(db, doc_id, chunk_id):
+    return db.collections[f"{COLLECTION}/{doc_id}/chunks"][chunk_id].get("access_count")
+
+
+def _writer(db):
+    return AccessMetricsWriter(lambda: db, COLLECTION, flush_interval=3600)
+
+
+def test_missing_chunk_does_not_drop_the_others():
+    db = _db([("d1", "c1"), ("d1", "c3")])
+    writer = _writer(db)
+    writer.record([("d1", "c1"), ("d1", "c2"), ("d1", "c1"), ("d1", "c3")])
+
+    assert writer.flush() == 2
+    assert (_count(db, "d1", "c1"), _count(db, "d1", "c3")) == (2, 1)
+    stats = writer.stats()
+    assert stats["missing_chunks"] == 1
+    assert stats["pending_chunks"] == 0
+    assert stats["failed_flushes"] == 0
+    writer.stop()
+
+
+def test_failed_write_is_retried_on_next_flush():
+    db = _db([("d1", "c1"), ("d2", "c2")], failures={("d1", "c1"): 1})
+    writer = _writer(db)
+    writer.record([("d1", "c1"), ("d1", "c1"), ("d2", "c2")])
+
+    assert writer.flush() == 1
+    assert writer.stats()["pending_chunks"] == 1
+    writer.record([("d1", "c1")])
+    assert writer.flush() == 1
+    assert _count(db, "d1", "c1") == 3
+    assert writer.stats()["flushed_writes"] == 2
+    writer.stop()
+
+
+def test_increments_are_dropped_after_max_retries():
+    db = _db([("d1", "c1")], failures={("d1", "c1"): rag_metrics.MAX_FLUSH_RETRIES + 1})
+    writer = _writer(db)
+    writer.record([("d1", "c1")])
+
+    for _ in range(rag_metrics.MAX_FLUSH_RETRIES + 1):
+        writer.flush()
+    stats = writer.stats()
+    assert stats["pending_chunks"] == 0
+    assert stats["dropped_accesses"] == 1
+    assert _count(db, "d1", "c1") is None
+    writer.stop()
+
+
+def test_record_after_stop_writes_immediately():
+    db = _db([("d1", "c1"), ("d2", "c2")])
+    writer = _writer(db)
+    writer.record([("d1", "c1")])
+    writer.stop()
+    writer.record([("d2", "c2")])
+
+    assert (_count(db, "d1", "c1"), _count(db, "d2", "c2")) == (1, 1)
+    assert writer.stats()["pending_chunks"] == 0
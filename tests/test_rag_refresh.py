@@ -0,0 +1,45 @@
+"""RefreshCoordinator: recargas single-flight y cambios exclusivos."""
+import threading
+import time
+
+from my_agent_utem.tools.rag_refresh import RefreshCoordinator
+
+
+def test_run_exclusive_waits_for_a_running_refresh():
+    events = []
+    started = threading.Event()
+
+    def refresh():
+        started.set()
+        events.append("refresh-start")
+        time.sleep(0.1)
+        events.append("refresh-end")
+
+    coordinator = RefreshCoordinator(refresh, lambda: 0.0, ttl_seconds=60)
+    forced = threading.Thread(target=coordinator.ensure, kwargs={"force": True})
+    forced.start()
+    started.wait(5)
+    coordinator.run_exclusive(events.append, "delta")
+    forced.join(5)
+
+    assert events == ["refresh-start", "refresh-end", "delta"]
+
+
+def test_concurrent_forced_refreshes_are_coalesced():
+    calls = []
+    loaded = {"at": 0.0}
+
+    def refresh():
+        calls.append(1)
+        time.sleep(0.05)
+        loaded["at"] = time.time()
+
+    coordinator = RefreshCoordinator(refresh, lambda: loaded["at"], ttl_seconds=60)
+    threads = [threading.Thread(target=coordinator.ensure) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert coordinator.stats()["coalesced_waits"] == 7
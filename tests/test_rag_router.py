@@ -0,0 +1,76 @@
+"""DocumentRouter: ruteo por centroides de documento antes del scoring exacto."""
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_corpus import SyntheticCorpus
+from my_agent_utem.tools.embedding_service import HashEmbeddingBackend
+from my_agent_utem.tools.rag_index import normalize_rows
+from my_agent_utem.tools.rag_router import DocumentRouter
+
+
+@pytest.fixture(scope="module")
+def corpus_index():
+    corpus = SyntheticCorpus(6000, n_docs=60, dim=64, vocab_size=3000, n_topics=16)
+    queries = HashEmbeddingBackend(64).embed([item["query"] for item in corpus.queries(50)])
+    return corpus.chunk_index_direct(with_texts=False), np.asarray(queries, dtype=np.float32)
+
+
+def _recall(hits, exact, k):
+    # Por score y no por fila: el corpus sintético tiene empates exactos
+    return float(np.mean([(s >= e[k - 1] - 1e-5).sum() / k for (_, s, _), (_, e, _) in zip(hits, exact)]))
+
+
+def test_recall_grows_with_fanout(corpus_index):
+    index, queries = corpus_index
+    exact = index.search_many(queries, 10, -1.0)
+    index.router = DocumentRouter.build(index.matrix, index.doc_ids)
+    try:
+        recalls = [_recall(index.search_many(queries, 10, -1.0, fanout=f), exact, 10) for f in (5, 30, 60)]
+        # fanout=0 desactiva el ruteo
+        unrouted = index.search_many(queries, 10, -1.0, fanout=0)
+    finally:
+        index.router = None
+
+    assert recalls == sorted(recalls)
+    assert recalls[1] >= 0.75
+    assert recalls[2] == 1.0
+    assert _recall(unrouted, exact, 10) == 1.0
+
+
+def test_routed_search_only_scores_the_chosen_documents(corpus_index):
+    index, queries = corpus_index
+    router = DocumentRouter.build(index.matrix, index.doc_ids, fanout=5)
+    for query in queries[:10]:
+        chosen = set(router.doc_names[router.route(query)])
+        rows, _, _ = router.search(index.matrix, query, 20, -1.0)
+        assert len(chosen) == 5
+        assert set(index.doc_ids[rows]) <= chosen
+
+
+def test_mask_bypasses_the_router(corpus_index):
+    index, _ = corpus_index
+    index.router = DocumentRouter.build(index.matrix, index.doc_ids, fanout=5)
+    try:
+        assert index.routes()
+        assert not index.routes(mask=index.doc_mask(["doc-000001"]))
+    finally:
+        index.router = None
+
+
+def test_replace_documents_matches_a_full_build(corpus_index):
+    index, _ = corpus_index
+    router = DocumentRouter.build(index.matrix, index.doc_ids, per_doc=2)
+    keep = ~index.doc_mask(["doc-000003"])
+    # Mismo documento re-indexado con otros vectores
+    noise = np.random.default_rng(0).standard_normal((int((~keep).sum()), index.dim)).astype(np.float32)
+    changed = normalize_rows(index.matrix[~keep] + noise)
+    matrix = np.concatenate([index.matrix[keep], changed])
+    doc_ids = np.concatenate([index.doc_ids[keep], index.doc_ids[~keep]])
+
+    updated = router.replace_documents(matrix, doc_ids, ["doc-000003"])
+    full = DocumentRouter.build(matrix, doc_ids, per_doc=2)
+
+    np.testing.assert_array_equal(updated.doc_names, full.doc_names)
+    np.testing.assert_array_equal(updated.order, full.order)
+    np.testing.assert_allclose(updated.centroids, full.centroids, atol=1e-6)
+    assert not np.allclose(updated.centroids, router.centroids)
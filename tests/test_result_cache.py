@@ -0,0 +1,42 @@
+"""SemanticResultCache: aciertos por similitud y versiones del contenido."""
+import numpy as np
+
+from my_agent_utem.tools.rag_result_cache import SemanticResultCache
+
+
+def _vector(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_lexical_modes_need_the_same_terms():
+    cache, version = SemanticResultCache(1 << 20), 1
+    cache.put(version, "k", "anexo 3", _vector(1.0, 0.01), {"query": "anexo 3", "ok": True})
+
+    assert cache.get(version, "k", "anexo 4", _vector(1.0, 0.0), semantic=False) is None
+    hit = cache.get(version, "k", "Anexo   3", _vector(1.0, 0.0), semantic=False)
+    assert hit is not None and hit["query"] == "Anexo   3"
+    hit = cache.get(version, "k", "3 anexo", _vector(1.0, 0.0), semantic=False)
+    assert hit is not None and hit["query"] == "3 anexo"
+
+
+def test_vector_mode_allows_semantic_hits_and_rewrites_query():
+    cache, version = SemanticResultCache(1 << 20), 1
+    cache.put(version, "k", "actividades logradas", _vector(1.0, 0.01), {"query": "actividades logradas"})
+
+    hit = cache.get(version, "k", "cuáles actividades se lograron", _vector(1.0, 0.0), semantic=True)
+    assert hit == {"query": "cuáles actividades se lograron"}
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_put_with_a_stale_version_keeps_current_entries():
+    cache = SemanticResultCache(1 << 20)
+    old, new = 1, 2
+    assert cache.get(old, "k", "consulta lenta", None) is None
+    cache.put(new, "k", "otra", None, {"query": "otra"})  # se ignora: la versión vigente sigue siendo old
+    assert cache.get(new, "k", "otra", None) is None  # al consultar con new se descarta old
+
+    cache.put(new, "k", "otra", None, {"query": "otra"})
+    cache.put(old, "k", "consulta lenta", None, {"query": "consulta lenta"})
+    assert cache.get(new, "k", "otra", None) == {"query": "otra"}
+    assert cache.get(new, "k", "consulta lenta", None) is None
@@ -0,0 +1,37 @@
+"""search_documents_batch: mismo resultado que una search_documents por consulta."""
+import pytest
+
+# Las consultas sintéticas son de 3 a 6 términos: con el umbral por defecto casi no hay coincidencias
+THRESHOLD = 0.2
+
+
+@pytest.mark.parametrize("mode", ["hybrid", "vector", "lexical"])
+def test_batch_matches_individual_searches(rag, mode):
+    q = rag.q
+    queries = [item["query"] for item in rag.corpus.queries(4)]
+
+    batch = q.search_documents_batch(queries, top_k=5, similarity_threshold=THRESHOLD, mode=mode)
+    assert batch["ok"], batch
+    assert all(entry["sources"] for entry in batch["results"])
+    assert [entry["query"] for entry in batch["results"]] == queries
+
+    for query, entry in zip(queries, batch["results"]):
+        single = q.search_documents(query, top_k=5, similarity_threshold=THRESHOLD, mode=mode)
+        assert entry["sources"] == single["sources"]
+        assert entry["context"] == single["context"]
+
+
+def test_batch_applies_the_document_filter_to_every_query(rag):
+    q = rag.q
+    items = rag.corpus.queries(3)
+    document_name = items[0]["document_name"]
+
+    batch = q.search_documents_batch(
+        [item["query"] for item in items], document_name=document_name, top_k=5,
+        similarity_threshold=THRESHOLD,
+    )
+    assert batch["ok"], batch
+    assert batch["documents_searched"] == 1
+    assert batch["results"][0]["sources"]
+    for entry in batch["results"]:
+        assert {s["doc_name"] for s in entry["sources"]} <= {document_name}
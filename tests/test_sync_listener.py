@@ -0,0 +1,72 @@
+"""Modo listener: si el stream se cierra o el snapshot envejece se vuelve a la recarga por TTL."""
+import threading
+import time
+
+
+class FakeWatch:
+    def __init__(self, active=True):
+        self.is_active = active
+        self.unsubscribed = False
+
+    def unsubscribe(self):
+        self.unsubscribed = True
+
+
+class FakeChange:
+    def __init__(self, doc_id, doc_data):
+        self.type = type("ChangeType", (), {"name": "ADDED"})()
+        self.document = type("Doc", (), {"id": doc_id, "to_dict": lambda _self: dict(doc_data)})()
+
+
+def _listener_mode(q, monkeypatch, watch):
+    q._ensure_snapshot(force_refresh=True)
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr(q, "SYNC_MODE", "listener")
+    monkeypatch.setattr(q, "_sync_ready", ready)
+    monkeypatch.setattr(q, "_sync_watch", watch)
+    monkeypatch.setattr(q, "_sync_failed", False)
+    monkeypatch.setattr(q, "_sync_retry_at", 0.0)
+
+
+def test_closed_stream_falls_back_to_ttl(rag, monkeypatch):
+    q = rag.q
+    watch = FakeWatch(active=False)
+    _listener_mode(q, monkeypatch, watch)
+
+    snapshot = q._ensure_snapshot()
+
+    assert watch.unsubscribed and q._sync_watch is None
+    assert q._sync_retry_at > time.time()
+    assert snapshot.docs  # se siguió sirviendo el snapshot vigente
+
+
+def test_old_snapshot_is_refreshed_even_with_a_live_listener(rag, monkeypatch):
+    q = rag.q
+    _listener_mode(q, monkeypatch, FakeWatch(active=True))
+    monkeypatch.setattr(q, "SYNC_MAX_AGE_SECONDS", q.CACHE_TTL_SECONDS * 2)
+    old = q._snapshot
+    stale_at = time.time() - q.CACHE_TTL_SECONDS * 3
+    monkeypatch.setattr(q, "_snapshot", q.CacheSnapshot(old.docs, old.index, stale_at, old.version))
+
+    q._ensure_snapshot()
+    deadline = time.time() + 5
+    while q._snapshot.loaded_at == stale_at and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert q._snapshot.age() < q.CACHE_TTL_SECONDS
+    assert q._snapshot.index is old.index  # sin cambios en los datos
+
+
+def test_initial_listener_snapshot_drops_documents_deleted_meanwhile(rag, monkeypatch):
+    q = rag.q
+    first = q._ensure_snapshot(force_refresh=True)
+    monkeypatch.setattr(q, "_sync_ready", threading.Event())
+    kept = dict(list(first.docs.items())[1:])
+    gone = next(iter(first.docs))
+
+    q._on_collection_snapshot(None, [FakeChange(d, data) for d, data in kept.items()], None)
+
+    assert gone not in q._snapshot.docs
+    assert gone not in set(q._snapshot.index.doc_ids.tolist())
+    assert len(q._snapshot.docs) == len(first.docs) - 1